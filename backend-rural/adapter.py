@@ -1,5 +1,10 @@
 # backend/adapter.py
 
+import asyncio
+
+from prompt_profiles import profile_for
+from modules.llm_async import drop_unknown_kwargs
+
 class GeminiAdapter:
     """Wraps a function to provide a .generate_reply method."""
     
@@ -23,11 +28,41 @@ These rules override all other behaviors.
 """
     }
 
-    def __init__(self, llm_callable):
+    def __init__(self, llm_callable, async_llm_callable=None, async_stream_callable=None):
         if not callable(llm_callable):
             raise ValueError("llm_callable must be callable")
-        self._llm_callable = llm_callable
+        if async_llm_callable is not None and not callable(async_llm_callable):
+            raise ValueError("async_llm_callable must be callable")
+        if async_stream_callable is not None and not callable(async_stream_callable):
+            raise ValueError("async_stream_callable must be callable")
+        # A plain f(messages) callable still works: kwargs it does not declare are dropped
+        self._llm_callable = drop_unknown_kwargs(llm_callable)
+        self._async_llm_callable = drop_unknown_kwargs(async_llm_callable)
+        self._async_stream_callable = drop_unknown_kwargs(async_stream_callable)
+
+    def _with_rules(self, messages, call_site):
+        # Only call sites whose prompt profile asks for the nurse guardrail rules get them
+        if profile_for(call_site).adapter_rules:
+            return [self.GUARDRAIL_SYSTEM_PROMPT] + messages
+        return list(messages)
+
+    # kwargs (call_site, temperature, ...) are passed through to the LLM callable if it accepts them
+    def generate_reply(self, messages, **kwargs):
+        safe_messages = self._with_rules(messages, kwargs.get("call_site"))
+        return self._llm_callable(safe_messages, **kwargs)
+
+    async def agenerate_reply(self, messages, **kwargs):
+        """Awaitable .generate_reply; runs the sync callable in a thread if no async one was given."""
+        safe_messages = self._with_rules(messages, kwargs.get("call_site"))
+        if self._async_llm_callable:
+            return await self._async_llm_callable(safe_messages, **kwargs)
+        return await asyncio.to_thread(self._llm_callable, safe_messages, **kwargs)
 
-    def generate_reply(self, messages):
-        safe_messages = [self.GUARDRAIL_SYSTEM_PROMPT] + messages
-        return self._llm_callable(safe_messages)
+    async def agenerate_reply_stream(self, messages, **kwargs):
+        """Async generator of text chunks; yields the whole reply once if streaming is unavailable."""
+        safe_messages = self._with_rules(messages, kwargs.get("call_site"))
+        if self._async_stream_callable:
+            async for chunk in self._async_stream_callable(safe_messages, **kwargs):
+                yield chunk
+            return
+        yield await self.agenerate_reply(messages, **kwargs)
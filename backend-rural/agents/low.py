@@ -1,39 +1,54 @@
 # backend/agents/low.py
 from types import SimpleNamespace
 from agents_helper.simplify import GeminiSimplify
+from modules.llm_async import to_async, collect_stream
+from circuit_breaker import LLMUnavailableError
 
 class GeminiPCP:
     """Gemini-based Low Complexity Handler (PCP)"""
 
-    def __init__(self, llm_generate_callable):
+    def __init__(self, llm_generate_callable, allm_generate_callable=None, astream_generate_callable=None):
         if not callable(llm_generate_callable):
             raise ValueError("Provide a callable LLM wrapper")
         self.llm_generate = llm_generate_callable
+        self.allm_generate = allm_generate_callable or to_async(llm_generate_callable)
+        self.astream_generate = astream_generate_callable
 
         # Core agent
         self.agent = SimpleNamespace()
         self.agent.generate_reply = self._wrap_safe
+        self.agent.agenerate_reply = self._awrap_safe
 
         # Simplifier instance
-        self.simplifier = GeminiSimplify(llm_generate_callable)
+        self.simplifier = GeminiSimplify(llm_generate_callable, allm_generate_callable, astream_generate_callable)
 
-    def _wrap_safe(self, messages):
+    def _wrap_safe(self, messages, **kwargs):
         """Safely call Gemini LLM and handle errors gracefully."""
         try:
-            res = self.llm_generate(messages)
+            res = self.llm_generate(messages, **kwargs)
             return res.strip() if isinstance(res, str) else getattr(res, "text", "No response.")
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            return f"[PCP] LLM error: {e}"
+
+    async def _awrap_safe(self, messages, on_delta=None, **kwargs):
+        try:
+            if on_delta and self.astream_generate:
+                # Stream tokens to the caller as they arrive, return the full text
+                return (await collect_stream(self.astream_generate, messages, on_delta, **kwargs)).strip()
+            res = await self.allm_generate(messages, **kwargs)
+            return res.strip() if isinstance(res, str) else getattr(res, "text", "No response.")
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             return f"[PCP] LLM error: {e}"
 
     # -------------------------------------------------------
     # FINAL UPDATED PCP PROMPT (SAFE + OTC ONLY)
     # -------------------------------------------------------
-    def generate_reply(self, patient_text: str, simplify: bool = True):
-        """
-        Generate a structured, practical PCP-level plan.
-        """
-
-        prompt = (
+    def _prompt(self, patient_text: str) -> str:
+        return (
             f"You are a Primary Care Physician assisting a nurse in a rural clinic.\n"
             f"The patient reports the following symptoms: \"{patient_text}\"\n\n"
             "Write a complete PCP assessment even if symptoms are very few or unclear.\n"
@@ -66,8 +81,52 @@ class GeminiPCP:
  
         )
 
-        messages = [{"role": "user", "content": prompt}]
-        full_reply = self.agent.generate_reply(messages)
+    def generate_reply(self, patient_text: str, simplify: bool = True, **llm_kwargs):
+        """
+        Generate a structured, practical PCP-level plan.
+        llm_kwargs (e.g. max_tokens) are passed to the LLM call.
+        """
+        messages = [{"role": "user", "content": self._prompt(patient_text)}]
+        full_reply = self.agent.generate_reply(messages, call_site="pcp", **llm_kwargs)
+        return self._build_result(full_reply)
+
+    async def agenerate_reply(self, patient_text: str, simplify: bool = True, on_delta=None, **llm_kwargs):
+        """
+        Awaitable twin of generate_reply().
+        on_delta(text) receives streamed chunks when a streaming LLM is configured.
+        """
+        messages = [{"role": "user", "content": self._prompt(patient_text)}]
+        full_reply = await self.agent.agenerate_reply(messages, on_delta=on_delta, call_site="pcp", **llm_kwargs)
+        return self._build_result(full_reply)
+
+    # -------------------------------------------------------
+    # DEGRADED MODE (LLM unavailable) — static nurse checklist
+    # -------------------------------------------------------
+    OFFLINE_ADVICE = (
+        "CONDITION SUMMARY:\n"
+        "The AI clinical assistant is temporarily unavailable. This is a standard safety "
+        "checklist, not a case-specific assessment.\n\n"
+        "POSSIBLE CAUSES:\n"
+        "Cannot be assessed automatically right now — the case needs review by the supervising doctor.\n\n"
+        "NURSE ACTIONS:\n"
+        "- Record vitals: temperature, pulse, BP, SpO₂, respiratory rate.\n"
+        "- Keep the patient comfortable and hydrated (ORS if vomiting or loose stools and able to drink).\n"
+        "- Re-check vitals every 30–60 minutes while waiting.\n"
+        "- Share the case with the supervising doctor by phone or teleconsult.\n"
+        "- Retry the AI assessment once the service is back.\n\n"
+        "ESCALATION CRITERIA:\n"
+        "- Difficulty breathing or SpO₂ below 92%.\n"
+        "- Chest pain, confusion, fainting or seizures.\n"
+        "- Persistent vomiting, unable to drink, or signs of dehydration.\n"
+        "- Symptoms getting worse while waiting.\n\n"
+        "MEDICINES ADVISED:\n"
+    )
+
+    def offline_reply(self, patient_text: str = "") -> dict:
+        """Same shape as generate_reply(), without any LLM call."""
+        return {"advice": self.OFFLINE_ADVICE, "pcp_full": self.OFFLINE_ADVICE, "medicines": []}
+
+    def _build_result(self, full_reply: str) -> dict:
         print("PCP FULL REPLY:", full_reply)
 
         # Extract “MEDICINES ADVISED”
@@ -98,3 +157,7 @@ class GeminiPCP:
 
     def simplify_reply(self, text: str) -> str:
         return self.simplifier.simplify_text(text, mode="pcp")
+
+    async def asimplify_reply(self, text: str) -> str:
+        return await self.simplifier.asimplify_text(text, mode="pcp")
+
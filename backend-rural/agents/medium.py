@@ -13,8 +13,12 @@ from typing import List, Dict, Any, Tuple
 import time, re, datetime
 import heapq
 import random
+import asyncio
 
 from agents_helper.simplify import GeminiSimplify
+from modules.llm_async import to_async, collect_stream
+from tracing import TRACER
+from circuit_breaker import LLMUnavailableError
 
 SPECIALIST_POOL = [
     "gensurgeon","gastroenterologist","endocrinologist",
@@ -31,26 +35,50 @@ ANSI = {"reset":"\033[0m","mod":"\033[95m","specialist":"\033[94m",
         "question":"\033[93m","safety":"\033[91m","confidence":"\033[96m","info":"\033[90m"}
 
 class GeminiAgent(SimpleNamespace):
-    def __init__(self, name: str, generate_func):
+    def __init__(self, name: str, generate_func, agenerate_func=None, astream_func=None):
         super().__init__(name=name)
         self.generate_reply = self._wrap_safe(generate_func, name)
+        self.agenerate_reply = self._awrap_safe(agenerate_func or to_async(generate_func), name, astream_func)
+    @staticmethod
+    def _reply_text(res):
+        if isinstance(res, str) and res.strip(): return res.strip()
+        if hasattr(res,"text") and getattr(res,"text"): return getattr(res,"text").strip()
+        if hasattr(res,"candidates"):
+            cand = res.candidates[0]
+            parts = getattr(getattr(cand,"content",None),"parts",None)
+            if parts:
+                txt = " ".join(p.text for p in parts if hasattr(p,"text") and p.text)
+                if txt.strip(): return txt.strip()
+        return "No valid reply."
     def _wrap_safe(self, func, role_name):
         def wrapper(messages, **kwargs):
-            for _ in range(2):
-                try:
-                    res = func(messages)
-                    if isinstance(res, str) and res.strip(): return res.strip()
-                    if hasattr(res,"text") and getattr(res,"text"): return getattr(res,"text").strip()
-                    if hasattr(res,"candidates"):
-                        cand = res.candidates[0]
-                        parts = getattr(getattr(cand,"content",None),"parts",None)
-                        if parts:
-                            txt = " ".join(p.text for p in parts if hasattr(p,"text") and p.text)
-                            if txt.strip(): return txt.strip()
-                    return "No valid reply."
-                except Exception:
-                    time.sleep(0.4)
-            return f"[{role_name}] No valid reply."
+            with TRACER.span(f"agent.{role_name}", call_site=kwargs.get("call_site")) as span:
+                for attempt in range(2):
+                    try:
+                        return self._reply_text(func(messages, **kwargs))
+                    except LLMUnavailableError:
+                        raise
+                    except Exception as e:
+                        if span: span.set(last_error=str(e), attempts=attempt + 1)
+                        time.sleep(0.4)
+                return f"[{role_name}] No valid reply."
+        return wrapper
+    def _awrap_safe(self, afunc, role_name, astream_func=None):
+        async def wrapper(messages, on_delta=None, **kwargs):
+            with TRACER.span(f"agent.{role_name}", call_site=kwargs.get("call_site"),
+                             streamed=bool(on_delta and astream_func)) as span:
+                for attempt in range(2):
+                    try:
+                        # stream only on the first attempt so a retry never re-sends deltas
+                        if on_delta and astream_func and attempt == 0:
+                            return self._reply_text(await collect_stream(astream_func, messages, on_delta, **kwargs))
+                        return self._reply_text(await afunc(messages, **kwargs))
+                    except LLMUnavailableError:
+                        raise
+                    except Exception as e:
+                        if span: span.set(last_error=str(e), attempts=attempt + 1)
+                        await asyncio.sleep(0.4)
+                return f"[{role_name}] No valid reply."
         return wrapper
 
 class MDTAgentGroup:
@@ -72,9 +100,13 @@ class MDTAgentGroup:
         gen_func = llm_config.get("custom_generate_reply")
         if not gen_func:
             raise ValueError("MDTAgentGroup requires 'custom_generate_reply'")
-        self.agents = {sp: GeminiAgent(sp, gen_func) for sp in SPECIALIST_POOL}
-        self.moderator = GeminiAgent("moderator", gen_func)
-        self.simplifier = GeminiSimplify(gen_func)
+        # optional awaitable twin; falls back to running gen_func in a thread
+        agen_func = llm_config.get("custom_agenerate_reply")
+        # optional async chunk generator, used to stream the moderator summary
+        astream_func = llm_config.get("custom_astream_reply")
+        self.agents = {sp: GeminiAgent(sp, gen_func, agen_func) for sp in SPECIALIST_POOL}
+        self.moderator = GeminiAgent("moderator", gen_func, agen_func, astream_func)
+        self.simplifier = GeminiSimplify(gen_func, agen_func, astream_func)
         self._debug_transcript = ""
         self._debug_turn_log: List[Dict[str,Any]] = []
         self._debug_confidence: Dict[str,int] = {}
@@ -160,18 +192,31 @@ class MDTAgentGroup:
         return "\n".join(out)
 
     # helper to extract symptoms via moderator LLM call (kept)
-    def _extract_symptoms(self, text: str) -> List[str]:
+    def _extract_symptoms_messages(self, text: str) -> List[Dict[str,str]]:
         prompt = f"Extract key symptoms from:\n{text}\nReturn comma-separated only."
-        reply = self.moderator.generate_reply([{"role":"user","content":prompt}])
+        return [{"role":"user","content":prompt}]
+
+    def _parse_symptoms(self, reply: str) -> List[str]:
         return [s.strip() for s in (reply or "").split(",") if s.strip()]
 
-    def _auto_select_specialists(self, symptoms: List[str], max_specialists: int = 4) -> List[str]:
+    def _extract_symptoms(self, text: str) -> List[str]:
+        reply = self.moderator.generate_reply(self._extract_symptoms_messages(text), call_site="mdt_symptoms")
+        return self._parse_symptoms(reply)
+
+    def _select_specialists_messages(self, symptoms: List[str], max_specialists: int = 4) -> List[Dict[str,str]]:
         prompt = (f"Symptoms: {', '.join(symptoms)}.\nChoose up to {max_specialists} specialists from:\n"
                   f"{', '.join(SPECIALIST_POOL)}.\nReturn names only, comma-separated.")
-        reply = self.moderator.generate_reply([{"role":"user","content":prompt}])
+        return [{"role":"user","content":prompt}]
+
+    def _parse_specialists(self, reply: str, max_specialists: int = 4) -> List[str]:
         chosen = [s.strip() for s in (reply or "").split(",") if s.strip() in SPECIALIST_POOL]
         return chosen[:max_specialists] or SPECIALIST_POOL[:max_specialists]
 
+    def _auto_select_specialists(self, symptoms: List[str], max_specialists: int = 4) -> List[str]:
+        reply = self.moderator.generate_reply(self._select_specialists_messages(symptoms, max_specialists),
+                                              call_site="mdt_specialists")
+        return self._parse_specialists(reply, max_specialists)
+
     # scoring function to prioritize who should speak next
     def _priority_score(self, sp: str, symptoms: List[str], parsed_map: Dict[str,Dict[str,Any]], recent_content: str) -> float:
         """
@@ -239,20 +284,93 @@ class MDTAgentGroup:
                              max_turns: int = 6,
                              max_reentries: int = 2,
                              seed: int = None,
-                             live: bool = True) -> Dict[str,Any]:
+                             live: bool = True,
+                             symptoms: List[str] = None,
+                             summary: Dict[str,Any] = None,
+                             deadline=None) -> Dict[str,Any]:
         """
         Event-driven run:
          - patient_text: free text presenting case
          - max_turns: total exchanges allowed across the session
          - max_reentries: max times any single specialist can be re-queued (interrupt)
          - seed: optional deterministic seed for randomness
+         - symptoms / summary: symptoms already extracted upstream (list, or the
+           triage summary dict); when given, the moderator extraction call is skipped
+         - deadline: optional deadline.Deadline; turns, rebuttals and the summary
+           length shrink when the case budget runs low
+        """
+        steps = self._case_steps(patient_text, max_turns, max_reentries, seed, live,
+                                 self._known_symptoms(symptoms, summary), deadline)
+        try:
+            speaker, messages, stage = next(steps)
+            while True:
+                reply = self._agent_for(speaker).generate_reply(messages, call_site=f"mdt_{stage}",
+                                                                **self._output_limit(deadline, stage))
+                speaker, messages, stage = steps.send(reply)
+        except StopIteration as done:
+            return done.value
+
+    async def arun_interactive_case(self,
+                                    patient_text: str,
+                                    ask_user_callable=None,
+                                    max_turns: int = 6,
+                                    max_reentries: int = 2,
+                                    seed: int = None,
+                                    live: bool = True,
+                                    on_delta=None,
+                                    symptoms: List[str] = None,
+                                    summary: Dict[str,Any] = None,
+                                    deadline=None) -> Dict[str,Any]:
+        """
+        Awaitable twin of run_interactive_case(); same discussion, non-blocking LLM turns.
+        on_delta(text) receives the moderator summary as it streams.
+        """
+        steps = self._case_steps(patient_text, max_turns, max_reentries, seed, live,
+                                 self._known_symptoms(symptoms, summary), deadline)
+        try:
+            speaker, messages, stage = next(steps)
+            while True:
+                delta = on_delta if stage == "summary" else None
+                reply = await self._agent_for(speaker).agenerate_reply(messages, on_delta=delta,
+                                                                       call_site=f"mdt_{stage}",
+                                                                       **self._output_limit(deadline, stage))
+                speaker, messages, stage = steps.send(reply)
+        except StopIteration as done:
+            return done.value
+
+    def _agent_for(self, speaker: str) -> GeminiAgent:
+        return self.moderator if speaker == "moderator" else self.agents[speaker]
+
+    @staticmethod
+    def _output_limit(deadline, stage: str) -> Dict[str,Any]:
+        # only the moderator summary is long enough for max_tokens to matter
+        if deadline is None or stage != "summary": return {}
+        return deadline.output_limit("mdt_summary", "simplify")
+
+    @staticmethod
+    def _known_symptoms(symptoms, summary) -> List[str]:
+        if symptoms is None and summary:
+            symptoms = summary.get("symptoms")
+        return [str(s).strip() for s in (symptoms or []) if str(s).strip()] or None
+
+    def _case_steps(self, patient_text, max_turns, max_reentries, seed, live, symptoms=None, deadline=None):
+        """
+        The MDT discussion as a generator: every LLM turn is yielded as
+        (speaker, messages, stage) and the driver sends the reply back in.
+        stage is one of: symptoms, specialists, turn, summary.
+        The symptoms stage is skipped when the caller already has them.
+        With a deadline, the discussion ends early (after at least one turn)
+        once another turn would eat the time reserved for the summary and
+        simplification, and rebuttals stop being scheduled a turn earlier.
+        Lets the sync and async runners share one event loop implementation.
         """
         if seed is not None:
             random.seed(seed)
 
         collected = (patient_text or "").strip()
-        symptoms = self._extract_symptoms(collected)
-        specialists = self._auto_select_specialists(symptoms)
+        if not symptoms:
+            symptoms = self._parse_symptoms((yield ("moderator", self._extract_symptoms_messages(collected), "symptoms")))
+        specialists = self._parse_specialists((yield ("moderator", self._select_specialists_messages(symptoms), "specialists")))
         if live: print(ANSI["info"] + f"[INFO] Selected specialists: {specialists}" + ANSI["reset"])
 
         # Discussion artifacts
@@ -285,6 +403,10 @@ class MDTAgentGroup:
 
         # Main event loop: process events until queue exhausted or max_turns reached
         while event_heap and turns < max_turns:
+            # keep time for the moderator summary + simplification
+            if deadline and turns and not deadline.affords("mdt_turn", "mdt_summary", "simplify"):
+                deadline.degrade("mdt_turns_reduced")
+                break
             turns += 1
             _, _, event = heapq.heappop(event_heap)
             sp = event["speaker"]; target = event.get("target")
@@ -296,7 +418,7 @@ class MDTAgentGroup:
                 role_note = f"You are addressing or rebutting {target}."
             system_msg = self._specialist_system_prompt(sp, symptoms, prev_speakers, role_note=role_note)
             messages = [{"role":"system","content":system_msg},{"role":"user","content":self.USER_MDT_OVERRIDE}]
-            raw = self.agents[sp].generate_reply(messages)
+            raw = yield (sp, messages, "turn")
             entry = self._process_reply(sp, raw, rnd=turns, target=target)
             discussion_log.append(entry)
             discussion_output.append(f"[{sp.upper()}{(' → '+target.upper()) if target else ''}]: {entry['content']}")
@@ -318,6 +440,10 @@ class MDTAgentGroup:
             # Build a lightweight parsed_list to feed into disagreement calc
             parsed_list = [{"role":k,"parsed":(parsed_map.get(k) or {})} for k in specialists if parsed_map.get(k)]
             disagreement_map = self._detect_disagreements_map(parsed_list) if parsed_list else {}
+            # a rebuttal is an extra turn: only schedule it if one more still fits
+            if deadline and any(disagreement_map.values()) and not deadline.affords("mdt_turn", "mdt_turn", "mdt_summary", "simplify"):
+                deadline.degrade("mdt_rebuttals_skipped")
+                disagreement_map = {}
 
             # If this speaker has disagreements (they may want to rebut someone), schedule immediate rebuttals/interrupts
             # Also, if others disagree with this speaker, schedule those others to speak with higher priority
@@ -363,7 +489,7 @@ class MDTAgentGroup:
             "Never include dosage or frequency.\n\n"
             f"MDT DISCUSSION:\n{discussion_text}"
         )
-        moderator_reply = self.moderator.generate_reply([{"role":"user","content":moderator_prompt}])
+        moderator_reply = yield ("moderator", [{"role":"user","content":moderator_prompt}], "summary")
 
         # build debug artifacts (similar to previous layout)
         transcript = self._format_transcript(discussion_log)
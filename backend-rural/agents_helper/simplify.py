@@ -2,23 +2,28 @@
 
 import re
 
+from modules.llm_async import to_async, collect_stream
+
 class GeminiSimplify:
     """
     This class provides a uniform simplification interface for both PCP and MDT.
     It expects an external LLM generate function (adapter) passed during initialization.
     """
 
-    def __init__(self, llm_generate_fn):
+    def __init__(self, llm_generate_fn, allm_generate_fn=None, astream_generate_fn=None):
         """
         llm_generate_fn → a callable like adapter.generate_reply(messages)
+        allm_generate_fn → optional awaitable twin like adapter.agenerate_reply(messages)
+        astream_generate_fn → optional async chunk generator like adapter.agenerate_reply_stream(messages)
         """
         self.llm_generate = llm_generate_fn
+        self.allm_generate = allm_generate_fn or to_async(llm_generate_fn)
+        self.astream_generate = astream_generate_fn
 
     # ------------------------------------------------------------
     # Main method
     # ------------------------------------------------------------
-    def simplify_text(self, medical_text: str, mode: str = "pcp") -> str:
-
+    def _messages(self, medical_text: str, mode: str) -> list:
         if mode == "pcp":
             prompt = self._pcp_prompt(medical_text)
 
@@ -28,11 +33,20 @@ class GeminiSimplify:
         else:
             raise ValueError("Unknown simplify mode")
 
-        messages = [
+        return [
             {"role": "user", "content": prompt}
         ]
 
-        response = self.llm_generate(messages)
+    def simplify_text(self, medical_text: str, mode: str = "pcp") -> str:
+        response = self.llm_generate(self._messages(medical_text, mode), call_site="simplify")
+        return self._clean_response(response)
+
+    async def asimplify_text(self, medical_text: str, mode: str = "pcp", on_delta=None) -> str:
+        messages = self._messages(medical_text, mode)
+        if on_delta and self.astream_generate:
+            response = await collect_stream(self.astream_generate, messages, on_delta, call_site="simplify")
+        else:
+            response = await self.allm_generate(messages, call_site="simplify")
         return self._clean_response(response)
 
     # ------------------------------------------------------------
@@ -0,0 +1,94 @@
+# benchmarks/bench_start_case.py
+"""
+Start-case latency: the old serial flow (guardrail → first follow-up
+question) vs. the concurrent flow /api/start_case now uses.
+
+Runs offline against a simulated Gemini with configurable latency, so the
+numbers isolate orchestration cost from network variance.
+
+    python benchmarks/bench_start_case.py --runs 40 --latency-ms 900 --jitter-ms 250
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.symptom_collector import SymptomCollector
+from modules.speculative import run_speculative
+
+
+def make_simulated_llm(latency_ms: float, jitter_ms: float):
+    async def allm(messages, **kwargs):
+        delay = max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000.0
+        await asyncio.sleep(delay)
+        return "How many days have you had the fever and cough, and is it getting worse?"
+
+    def llm(messages, **kwargs):
+        raise RuntimeError("benchmark uses the async path only")
+
+    return llm, allm
+
+
+async def simulated_guardrail(allm, text):
+    await allm([{"role": "user", "content": text}])
+    return {"is_valid": True, "reason": "ok"}
+
+
+async def serial_start(collector, allm, text):
+    guard = await simulated_guardrail(allm, text)
+    if not guard["is_valid"]:
+        return guard, None
+    return guard, await collector.aclarification_loop_api(text, max_rounds=1)
+
+
+async def concurrent_start(collector, allm, text):
+    return await run_speculative(
+        simulated_guardrail(allm, text),
+        collector.aclarification_loop_api(text, max_rounds=1),
+        accept=lambda g: g["is_valid"],
+    )
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+    print(f"{name:<12} mean={statistics.mean(samples):7.1f} ms  "
+          f"p50={statistics.median(samples):7.1f} ms  p95={p95:7.1f} ms")
+    return statistics.median(samples)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=900.0)
+    parser.add_argument("--jitter-ms", type=float, default=250.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    llm, allm = make_simulated_llm(args.latency_ms, args.jitter_ms)
+    collector = SymptomCollector(llm, allm)
+    text = "fever and cough since 3 days with mild headache"
+
+    results = {}
+    for name, flow in (("serial", serial_start), ("concurrent", concurrent_start)):
+        samples = []
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            await flow(collector, allm, text)
+            samples.append((time.perf_counter() - t0) * 1000)
+        results[name] = summarize(name, samples)
+
+    saved = results["serial"] - results["concurrent"]
+    print(f"\np50 saved per start_case: {saved:.1f} ms "
+          f"({100 * saved / results['serial']:.0f}% of the serial flow)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
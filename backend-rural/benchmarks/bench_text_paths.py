@@ -0,0 +1,210 @@
+# benchmarks/bench_text_paths.py
+"""
+Microbenchmarks for the pure-Python text processing every case goes
+through: section splitting / medicine parsing / dosage sanitising
+(modules/sections.py), LLM JSON extraction (modules/llm_json.py) and the
+MDT helpers (_parse_structured_reply, _safety_filter,
+_detect_disagreements_map, _priority_score).
+
+Each function runs on a typical input and on long / pathological ones
+(e.g. a reply full of "{" with no closing brace, which makes the lazy
+DOTALL regex in safe_load_json backtrack quadratically).
+
+--record appends the run to benchmarks/results/bench_text_paths.jsonl
+(tracked in git); every run is compared against the last recorded one,
+so optimisations and regressions show up as a Δ column.
+
+    python benchmarks/bench_text_paths.py
+    python benchmarks/bench_text_paths.py --record
+    python benchmarks/bench_text_paths.py --only safe_load_json,split_into_sections
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import timeit
+import argparse
+import platform
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.sections import split_into_sections, medicines_list_from_section, sanitize_medicine_output
+from modules.llm_json import safe_load_json
+from agents.medium import MDTAgentGroup, SPECIALIST_POOL
+
+
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "bench_text_paths.jsonl")
+
+
+# -----------------------------------------------------------
+# Inputs
+# -----------------------------------------------------------
+ADVICE = (
+    "**CONDITION SUMMARY:**\nLikely viral fever with mild dehydration.\n\n"
+    "**POSSIBLE CAUSES:**\n- Viral infection\n- Dehydration\n\n"
+    "**NURSE ACTIONS:**\n- Record temperature and SpO₂ every 4 hours\n- Encourage oral fluids\n\n"
+    "**ESCALATION CRITERIA:**\n- SpO₂ below 92%\n- Persistent vomiting or confusion\n\n"
+    "**MEDICINES ADVISED:**\n- Paracetamol (for fever)\n- ORS solution, zinc tablets\n"
+)
+
+MEDICINES = "- Paracetamol (for fever)\n- ORS solution, zinc tablets\n• Cetirizine\n"
+
+SPECIALIST_REPLY = (
+    "IMPRESSION: likely viral hepatitis given jaundice and vomiting for a week.\n"
+    "POSSIBLE CAUSES: hepatitis A or E, early cholestasis, drug-induced liver injury.\n"
+    "NURSE ACTIONS: monitor vitals, oral fluids, avoid paracetamol overuse, check urine colour.\n"
+    "ESCALATION CRITERIA: confusion, bleeding, SpO₂ below 92%, persistent vomiting.\n"
+    "Confidence: 4/5"
+)
+
+IMPRESSIONS = [
+    "likely viral hepatitis given jaundice and vomiting",
+    "possible gallstone disease with obstructive jaundice",
+    "probable malaria with haemolysis causing jaundice",
+    "dehydration from gastroenteritis, jaundice needs evaluation",
+]
+
+PROSE = "The patient reports fever and body ache; vitals stable, eating less than usual. "
+
+
+def _parsed(role, impression):
+    return {"role": role, "parsed": {"impression": impression}}
+
+
+def make_cases(scale: int) -> dict:
+    """name -> list of (input label, zero-arg callable)."""
+    mdt = MDTAgentGroup({"custom_generate_reply": lambda messages, **kwargs: ""})
+    rng = random.Random(7)
+
+    long_advice = ADVICE * (40 * scale)
+    no_headings = PROSE * (1200 * scale)
+    long_meds = "\n".join(f"- Medicine {i}, Syrup {i % 50}" for i in range(2000 * scale))
+    json_tail = PROSE * (600 * scale) + '```json\n{"is_valid": true, "reason": "symptoms described"}\n```'
+    open_braces = "{ " * (1000 * scale) + "trailing prose without a closing brace"
+    long_reply = SPECIALIST_REPLY + "\n" + (SPECIALIST_REPLY.replace("IMPRESSION", "Note") + "\n") * (150 * scale)
+    banned_dense = ("avoid surgery; 500 mg twice; CT scan or MRI later; inject if needed. " * (300 * scale))
+
+    four = [_parsed(SPECIALIST_POOL[i], IMPRESSIONS[i]) for i in range(4)]
+    all_long = [_parsed(sp, " ".join(rng.choice(PROSE.split()) for _ in range(60 * scale)) + " " + IMPRESSIONS[i % 4])
+                for i, sp in enumerate(SPECIALIST_POOL)]
+    parsed_map = {p["role"]: p["parsed"] for p in four}
+    symptoms = ["jaundice", "vomiting", "fever", "abdominal", "pain"]
+    transcript = (SPECIALIST_REPLY + "\n") * (80 * scale)
+
+    return {
+        "split_into_sections": [
+            ("advice 5 sections", lambda: split_into_sections(ADVICE)),
+            (f"advice ×{40 * scale}", lambda: split_into_sections(long_advice)),
+            (f"no headings {len(no_headings) // 1000}k", lambda: split_into_sections(no_headings)),
+        ],
+        "medicines_list_from_section": [
+            ("4 items", lambda: medicines_list_from_section(MEDICINES)),
+            (f"{4000 * scale} items", lambda: medicines_list_from_section(long_meds)),
+        ],
+        "safe_load_json": [
+            ("plain object", lambda: safe_load_json('{"is_relevant": true, "reason": "answers it"}')),
+            (f"prose + fenced json {len(json_tail) // 1000}k", lambda: safe_load_json(json_tail)),
+            (f"{1000 * scale} unclosed '{{'", lambda: safe_load_json(open_braces)),
+        ],
+        "sanitize_medicine_output": [
+            ("clean advice", lambda: sanitize_medicine_output(ADVICE)),
+            ("dosage hit", lambda: sanitize_medicine_output("Paracetamol 500 mg twice a day")),
+            (f"clean {len(no_headings) // 1000}k", lambda: sanitize_medicine_output(no_headings)),
+        ],
+        "_parse_structured_reply": [
+            ("specialist reply", lambda: mdt._parse_structured_reply(SPECIALIST_REPLY)),
+            (f"reply {len(long_reply) // 1000}k", lambda: mdt._parse_structured_reply(long_reply)),
+        ],
+        "_safety_filter": [
+            ("specialist reply", lambda: mdt._safety_filter(SPECIALIST_REPLY)),
+            (f"banned-dense {len(banned_dense) // 1000}k", lambda: mdt._safety_filter(banned_dense)),
+        ],
+        "_detect_disagreements_map": [
+            ("4 specialists", lambda: mdt._detect_disagreements_map(four)),
+            (f"{len(all_long)} long impressions", lambda: mdt._detect_disagreements_map(all_long)),
+        ],
+        "_priority_score": [
+            ("short transcript", lambda: mdt._priority_score(SPECIALIST_POOL[0], symptoms, parsed_map, SPECIALIST_REPLY)),
+            (f"transcript {len(transcript) // 1000}k",
+             lambda: mdt._priority_score(SPECIALIST_POOL[0], symptoms, parsed_map, transcript)),
+        ],
+    }
+
+
+# -----------------------------------------------------------
+# Timing + history
+# -----------------------------------------------------------
+def bench(fn, min_time: float) -> float:
+    """Best-of-3 µs per call; the loop count is sized so each repeat takes >= min_time."""
+    number = 1
+    while True:
+        elapsed = timeit.timeit(fn, number=number)
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    return min([elapsed] + timeit.repeat(fn, number=number, repeat=2)) / number * 1e6
+
+
+def last_recorded() -> dict:
+    if not os.path.exists(HISTORY):
+        return {}
+    with open(HISTORY, encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else {}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(HISTORY), timeout=10).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1, help="multiplier for the long / pathological inputs")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing repeat")
+    parser.add_argument("--only", help="comma-separated function names")
+    parser.add_argument("--record", action="store_true", help=f"append this run to {os.path.relpath(HISTORY)}")
+    args = parser.parse_args()
+
+    cases = make_cases(args.scale)
+    if args.only:
+        wanted = set(args.only.split(","))
+        cases = {name: rows for name, rows in cases.items() if name in wanted}
+
+    previous = last_recorded()
+    baseline = previous.get("results", {}) if previous.get("scale") == args.scale else {}
+    if baseline:
+        print(f"Compared with {previous['commit']} ({previous['timestamp']})\n")
+
+    results = {}
+    print(f"{'function':<28}{'input':<30}{'µs/call':>12}{'prev µs':>12}{'Δ':>8}")
+    for name, rows in cases.items():
+        for label, fn in rows:
+            key = f"{name} | {label}"
+            us = results[key] = round(bench(fn, args.min_time), 3)
+            prev = baseline.get(key)
+            delta = f"{100 * (us - prev) / prev:+.0f}%" if prev else ""
+            print(f"{name:<28}{label:<30}{us:>12.2f}{prev if prev is not None else '':>12}{delta:>8}")
+
+    if args.record:
+        os.makedirs(os.path.dirname(HISTORY), exist_ok=True)
+        with open(HISTORY, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "scale": args.scale,
+                "results": results,
+            }, ensure_ascii=False) + "\n")
+        print(f"\n📝 Recorded in {os.path.relpath(HISTORY)}")
+
+
+if __name__ == "__main__":
+    main()
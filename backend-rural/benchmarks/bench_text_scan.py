@@ -0,0 +1,114 @@
+# benchmarks/bench_text_scan.py
+"""
+Per-call cost of lexicon scanning on growing case contexts: the previous
+per-keyword / re-tokenising helpers vs. the compiled scanners in
+modules/text_scan.py that SymptomCollector and server.py now use.
+
+    python benchmarks/bench_text_scan.py --repeat 2000 --sizes 200,2000,8000
+"""
+
+import os
+import re
+import sys
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.symptom_collector import SymptomCollector
+from modules.text_scan import KeywordScanner
+
+
+# Same lexicon as server.SYMPTOM_LEXICON (server.py needs FastAPI to import)
+SYMPTOM_LEXICON = {
+    "fever", "cough", "pain", "vomit", "vomiting", "nausea",
+    "breath", "breathing", "rash", "headache", "fatigue",
+    "weakness", "diarrhea", "cold"
+}
+
+SAMPLE_ROUND = (
+    " | How long have you had the fever and cough?: about 3 days, worse at night"
+    " | Is the headache getting better or worse?: same, mild pressure behind the eyes"
+    " | Any vomiting or loose stools since it started?: vomited twice yesterday"
+)
+QUESTION = "Has the chest pain and breathing difficulty been getting worse after meals?"
+
+
+# -----------------------------------------------------------
+# Previous implementations (kept here for comparison only)
+# -----------------------------------------------------------
+def old_extract_original_symptoms(text):
+    text_l = text.lower()
+    return {s for s in SYMPTOM_LEXICON if s in text_l}
+
+
+def old_extract_symptom_keywords(collector, text):
+    words = set(w.strip(".,:;!?()[]{}\"'").lower() for w in text.split())
+    return {w for w in words if w in collector._symptom_lexicon}
+
+
+def old_mentions_slot(collector, question):
+    q = question.lower()
+    return any(slot in q for slot in collector._slot_keywords)
+
+
+def old_contains_med_or_dose(collector, question):
+    return any(re.search(p, question.lower()) for p in collector._med_rx_patterns)
+
+
+def old_validate_candidates(collector, context, candidates):
+    # each candidate re-tokenised the whole context
+    for q in candidates:
+        ctx = old_extract_symptom_keywords(collector, context)
+        qwords = set(w.strip(".,:;!?()[]{}\"'").lower() for w in q.split())
+        _ = bool(qwords & ctx) or old_mentions_slot(collector, q)
+
+
+def new_validate_candidates(collector, context, candidates):
+    for q in candidates:
+        ctx = collector._context_symptom_keywords(context)
+        _ = collector._overlaps_context_symptoms(q, ctx) or collector._mentions_slot(q)
+
+
+def bench(fn, repeat):
+    return min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--sizes", default="200,2000,8000", help="context sizes in characters")
+    args = parser.parse_args()
+
+    collector = SymptomCollector(lambda messages, **kwargs: "")
+    scanner = KeywordScanner(SYMPTOM_LEXICON, boundary="start")
+    candidates = [QUESTION, "How many days has the fever lasted?", "Is the cough worse at night?"]
+
+    print(f"{'call':<28}{'chars':>7}{'old µs':>10}{'new µs':>10}{'speedup':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        context = ("fever and cough with headache" + SAMPLE_ROUND * (size // len(SAMPLE_ROUND) + 1))[:size]
+        rows = [
+            ("extract_original_symptoms",
+             lambda: old_extract_original_symptoms(context), lambda: scanner.find_all(context)),
+            ("_extract_symptom_keywords",
+             lambda: old_extract_symptom_keywords(collector, context),
+             lambda: collector._extract_symptom_keywords(context)),
+            ("validate 3 candidates",
+             lambda: old_validate_candidates(collector, context, candidates),
+             lambda: new_validate_candidates(collector, context, candidates)),
+        ]
+        for name, old, new in rows:
+            t_old, t_new = bench(old, args.repeat), bench(new, args.repeat)
+            print(f"{name:<28}{size:>7}{t_old:>10.2f}{t_new:>10.2f}{t_old / t_new:>8.1f}x")
+
+    for name, old, new in (
+        ("_mentions_slot", lambda: old_mentions_slot(collector, QUESTION), lambda: collector._mentions_slot(QUESTION)),
+        ("_contains_med_or_dose", lambda: old_contains_med_or_dose(collector, QUESTION),
+         lambda: collector._contains_med_or_dose(QUESTION)),
+    ):
+        t_old, t_new = bench(old, args.repeat), bench(new, args.repeat)
+        print(f"{name:<28}{len(QUESTION):>7}{t_old:>10.2f}{t_new:>10.2f}{t_old / t_new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
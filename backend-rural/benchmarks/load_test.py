@@ -0,0 +1,349 @@
+# benchmarks/load_test.py
+"""
+End-to-end load test of the interactive triage flow: each virtual nurse
+loops start_case → N × next_question → /ws/process_case over a low /
+medium / high case mix, for --duration seconds.
+
+By default the FastAPI app is driven in-process through its ASGI
+interface (no sockets, no client library) with LLM_TRANSPORT=synthetic,
+so only server.py orchestration and the local pipeline are measured.
+The synthetic LLM has per-call-site latency; scale it with
+--latency-scale, or replay recorded real traffic with
+LLM_TRANSPORT=replay LLM_CASSETTE=... (see llm_transport.py).
+
+--url targets a running server instead (needs httpx and websockets);
+event-loop lag is then the client's, not the server's.
+
+Reports sessions/s, p50/p95/p99 per endpoint, websocket time to first
+progress message and to the final result, and event-loop lag.
+
+    python benchmarks/load_test.py --users 20 --duration 60
+    python benchmarks/load_test.py --users 50 --rounds 2 --mix low=0.6,medium=0.3,high=0.1 --json load.json
+    python benchmarks/load_test.py --url http://localhost:8000 --users 10
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import contextlib
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+CASES = {
+    "low": [
+        "mild fever and runny nose since yesterday",
+        "sore throat and mild cough for 2 days, eating normally",
+        "itching rash on both arms since this morning",
+    ],
+    "medium": [
+        "fever, vomiting and yellow eyes for a week with loss of appetite",
+        "swelling of both legs and breathlessness on walking for 5 days",
+        "fever with chills, body ache, headache and burning urination for 4 days",
+    ],
+    "high": [
+        "patient had a seizure and is now unconscious",
+        "severe chest pain spreading to the left arm with sweating",
+        "child fainted after high fever, not responding properly",
+    ],
+}
+
+ANSWERS = [
+    "about 3 days, getting slightly worse",
+    "moderate, around 6 out of 10",
+    "worse in the evening and at night",
+    "nothing seems to relieve it",
+    "all over, mostly in the same place as before",
+]
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in CASES:
+            raise argparse.ArgumentTypeError(f"unknown case type {name!r} (low, medium, high)")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+# -----------------------------------------------------------
+# Clients: in-process ASGI (default) / remote server (--url)
+# -----------------------------------------------------------
+class AsgiClient:
+    """Minimal ASGI driver: one HTTP request or websocket session per call."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _scope(self, kind: str, path: str, method: str = "GET") -> dict:
+        scope = {
+            "type": kind, "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http" if kind == "http" else "ws",
+            "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+            "headers": [(b"host", b"loadtest"), (b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 50000), "server": ("loadtest", 80),
+        }
+        if kind == "http":
+            scope["method"] = method
+        return scope
+
+    async def post(self, path: str, payload: dict):
+        body = json.dumps(payload).encode()
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        response = {"status": 500, "body": b""}
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.Event().wait()  # a disconnect never comes
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+
+        await self.app(self._scope("http", path, "POST"), receive, send)
+        return response["status"], json.loads(response["body"] or b"null")
+
+    async def websocket(self, path: str, payload: dict, on_message):
+        inbox = asyncio.Queue()
+        inbox.put_nowait({"type": "websocket.connect"})
+        inbox.put_nowait({"type": "websocket.receive", "text": json.dumps(payload)})
+
+        async def send(message):
+            if message["type"] == "websocket.send":
+                on_message(json.loads(message.get("text") or message.get("bytes")))
+            elif message["type"] == "websocket.close":
+                inbox.put_nowait({"type": "websocket.disconnect", "code": message.get("code", 1000)})
+
+        await self.app(self._scope("websocket", path), inbox.get, send)
+
+    async def close(self):
+        pass
+
+
+class RemoteClient:
+    def __init__(self, url: str):
+        import httpx
+        self.url = url.rstrip("/")
+        self.http = httpx.AsyncClient(base_url=self.url, timeout=300)
+
+    async def post(self, path: str, payload: dict):
+        response = await self.http.post(path, json=payload)
+        return response.status_code, response.json()
+
+    async def websocket(self, path: str, payload: dict, on_message):
+        import websockets
+        async with websockets.connect(self.url.replace("http", "ws", 1) + path, max_size=None) as ws:
+            await ws.send(json.dumps(payload))
+            async for raw in ws:
+                on_message(json.loads(raw))
+
+    async def close(self):
+        await self.http.aclose()
+
+
+# -----------------------------------------------------------
+# Measurements
+# -----------------------------------------------------------
+class Stats:
+    def __init__(self):
+        self.samples = defaultdict(list)   # name -> seconds
+        self.errors = defaultdict(int)     # name -> count
+        self.sessions = defaultdict(int)   # case type -> completed sessions
+
+    def add(self, name: str, seconds: float):
+        self.samples[name].append(seconds)
+
+    def error(self, name: str, detail=None):
+        self.errors[name] += 1
+        if detail and self.errors[name] <= 3:
+            print(f"⚠️ {name}: {detail}", file=sys.stderr)
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(samples) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+async def monitor_loop_lag(stats: Stats, stop: asyncio.Event, interval: float = 0.05):
+    """How late a sleep(interval) wakes up = how long something held the event loop."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        stats.add("event_loop_lag", max(0.0, time.perf_counter() - started - interval))
+
+
+# -----------------------------------------------------------
+# One virtual nurse
+# -----------------------------------------------------------
+async def timed_post(client, stats: Stats, name: str, path: str, payload: dict):
+    started = time.perf_counter()
+    try:
+        status, body = await client.post(path, payload)
+    except Exception as e:
+        stats.error(name, e)
+        return None
+    stats.add(name, time.perf_counter() - started)
+    if status != 200:
+        stats.error(name, f"HTTP {status}: {body}")
+        return None
+    return body
+
+
+async def run_session(client, stats: Stats, rng: random.Random, case_type: str, args):
+    start = await timed_post(client, stats, "start_case", "/api/start_case",
+                             {"patient_input": rng.choice(CASES[case_type])})
+    if not start:
+        return
+    case_id = start["case_id"]
+    question = start.get("first_follow_up_question")
+
+    for round_no in range(args.rounds):
+        if not question:
+            break
+        await asyncio.sleep(args.think)
+        reply = await timed_post(client, stats, "next_question", "/api/next_question",
+                                 {"case_id": case_id, "answers": {question: ANSWERS[round_no % len(ANSWERS)]}})
+        if not reply or reply.get("done"):
+            break
+        question = reply.get("next_question")
+
+    await asyncio.sleep(args.think)
+    started = time.perf_counter()
+    seen = {}
+
+    def on_message(msg):
+        kind = msg.get("type")
+        if kind not in seen:
+            seen[kind] = time.perf_counter() - started
+        if kind == "error":
+            stats.error("ws_process_case", msg.get("message"))
+
+    try:
+        await client.websocket("/ws/process_case", {"case_id": case_id, "answers": {}}, on_message)
+    except Exception as e:
+        stats.error("ws_process_case", e)
+        return
+    if "final" not in seen:
+        if "error" not in seen:
+            stats.error("ws_process_case", "closed without a final result")
+        return
+    if "progress" in seen:
+        stats.add("ws_first_progress", seen["progress"])
+    stats.add("ws_process_case", seen["final"])
+    stats.sessions[case_type] += 1
+
+
+async def virtual_nurse(client, stats: Stats, rng: random.Random, args, stop_at: float):
+    kinds, weights = zip(*args.mix.items())
+    while time.perf_counter() < stop_at:
+        await run_session(client, stats, rng, rng.choices(kinds, weights)[0], args)
+
+
+# -----------------------------------------------------------
+# Main
+# -----------------------------------------------------------
+def quiet(args):
+    """The server prints every case; that console I/O is not what is being measured."""
+    return contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def make_client(args):
+    if args.url:
+        return RemoteClient(args.url), None
+    # Before server.py is imported: the wrappers read the transport config at init
+    os.environ.setdefault("LLM_TRANSPORT", "synthetic")
+    os.environ.setdefault("LLM_SYNTH_SEED", str(args.seed))
+    os.environ["LLM_SYNTH_LATENCY_SCALE"] = str(args.latency_scale)
+    with quiet(args):
+        import server
+    if server.router is None:
+        sys.exit("❌ server.py failed to initialise its LLM router")
+    return AsgiClient(server.app), server
+
+
+def report(stats: Stats, elapsed: float, args, server) -> dict:
+    endpoints = ("start_case", "next_question", "ws_first_progress", "ws_process_case")
+    result = {
+        "users": args.users,
+        "duration_s": round(elapsed, 1),
+        "target": args.url or f"in-process ({os.environ.get('LLM_TRANSPORT')})",
+        "sessions": dict(stats.sessions),
+        "sessions_per_s": round(sum(stats.sessions.values()) / elapsed, 2),
+        "requests_per_s": round(sum(len(stats.samples[e]) for e in ("start_case", "next_question", "ws_process_case"))
+                                / elapsed, 2),
+        "endpoints": {e: summarize(stats.samples[e]) for e in endpoints if stats.samples[e]},
+        "errors": dict(stats.errors),
+    }
+    if stats.samples["event_loop_lag"]:
+        result["event_loop_lag"] = summarize(stats.samples["event_loop_lag"])
+    if server is not None:
+        result["llm_scheduler"] = server.LLM_SCHEDULER.stats()
+
+    print(f"\n{result['target']} — {args.users} users, {elapsed:.0f}s, "
+          f"{sum(stats.sessions.values())} sessions ({result['sessions_per_s']}/s), "
+          f"{result['requests_per_s']} req/s")
+    print(f"{'':<20}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    for name, s in list(result["endpoints"].items()) + [("event_loop_lag", result.get("event_loop_lag"))]:
+        if s:
+            print(f"{name:<20}{s['count']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}"
+                  f"{stats.errors.get(name, 0):>8}")
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual nurses")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to start new sessions for")
+    parser.add_argument("--rounds", type=int, default=3, help="follow-up questions answered per case")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds a nurse pauses before each answer")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("low=0.5,medium=0.35,high=0.15"))
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="synthetic LLM latency multiplier")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--url", help="load a running server instead of the in-process app")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's console output")
+    args = parser.parse_args()
+
+    client, server = make_client(args)
+    stats = Stats()
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(stats, stop))
+
+    started = time.perf_counter()
+    with quiet(args):
+        await asyncio.gather(*(
+            virtual_nurse(client, stats, random.Random(args.seed + i), args, started + args.duration)
+            for i in range(args.users)
+        ))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await lag_task
+    await client.close()
+
+    result = report(stats, elapsed, args, server)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+# benchmarks/prompt_tokens_report.py
+"""
+Input tokens per LLM call site for one sample case: the old layout (full
+guardrail preamble + adapter rules in front of every prompt) vs. the
+prompt profiles in prompt_profiles.py (per-site system instruction, adapter
+rules only where the profile asks for them).
+
+Runs the real prompt builders (collector, triage, complexity, PCP, MDT,
+simplifier) against a recording stand-in LLM. Tokens are estimated as
+chars / 4 unless --live is given, which asks Gemini's count_tokens
+(needs GEMINI_API_KEY and google-generativeai).
+
+    python benchmarks/prompt_tokens_report.py
+    python benchmarks/prompt_tokens_report.py --live
+"""
+
+import os
+import sys
+import argparse
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adapter import GeminiAdapter
+from prompt_profiles import GUARDRAIL_PREAMBLE, profile_for
+from modules.symptom_collector import SymptomCollector
+from modules.symptom_shortlister import SymptomShortlister
+from modules.complexity import ComplexityAssessor
+from modules.triage_analysis import TriageAnalyzer
+from agents.low import GeminiPCP
+from agents.medium import MDTAgentGroup
+from agents_helper.simplify import GeminiSimplify
+
+
+CASE = (
+    "fever and dry cough since 4 days with body ache and mild headache"
+    " | How many days have you had the fever and cough?: 4 days, worse at night"
+    " | Is the fever continuous or does it come and go?: comes and goes, highest in the evening"
+)
+
+CANNED = {
+    "followup": "Is the cough getting better or worse over the last 2 days?",
+    "triage": '{"symptoms": ["fever", "dry cough", "body ache", "headache"], '
+              '"possible_diseases": ["viral fever"], "complexity": "medium"}',
+    "shortlist": "fever, dry cough, body ache, headache",
+    "complexity": "medium",
+    "mdt_specialists": "General Physician, Pulmonologist",
+}
+
+
+def render(messages) -> str:
+    """Same text layout as GeminiLLMWrapper._build_prompt (minus the preamble)."""
+    prompt = ""
+    for m in messages:
+        role, content = m.get("role", "user"), m.get("content", "")
+        if not content:
+            continue
+        if role == "user":
+            prompt += f"User: {content}\n"
+        elif role == "assistant":
+            prompt += f"Assistant: {content}\n"
+        else:
+            prompt += f"{role.capitalize()}: {content}\n"
+    return prompt
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []  # (call_site, messages as sent after the adapter)
+
+    def __call__(self, messages, call_site=None, **kwargs):
+        self.calls.append((call_site, list(messages)))
+        if call_site == "pcp":
+            return ("CONDITION SUMMARY: likely viral fever.\nNURSE ACTIONS: fluids, rest, monitor temperature.\n"
+                    "MEDICINES ADVISED: Paracetamol")
+        return CANNED.get(call_site, "Impression: likely viral upper respiratory infection; monitor.")
+
+
+def run_sample_case(llm) -> None:
+    collector = SymptomCollector(llm)
+    collector.generate_single_followup(CASE, ["How many days have you had the fever and cough?"])
+
+    shortlister = SymptomShortlister(llm)
+    complexity = ComplexityAssessor(llm)
+    triage = TriageAnalyzer(llm, shortlister=shortlister, complexity=complexity)
+    summary = triage.analyze(CASE)
+    shortlister.shortlist(CASE)
+    complexity.assess(summary)
+
+    GeminiPCP(llm).generate_reply(CASE)
+    mdt = MDTAgentGroup({"custom_generate_reply": llm}, src_lang="eng")
+    result = mdt.run_interactive_case(CASE, max_turns=3, seed=1, live=False)
+    GeminiSimplify(llm).simplify_text(result.get("mdt_summary_raw") or "summary", mode="mdt")
+
+
+def make_counter(live: bool):
+    if not live:
+        return lambda system, prompt: (len(system or "") + len(prompt)) // 4
+
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"))
+    models = {}
+
+    def count(system, prompt):
+        model = models.get(system)
+        if model is None:
+            model = models[system] = genai.GenerativeModel("gemini-2.5-flash", system_instruction=system or None)
+        return model.count_tokens(prompt).total_tokens
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="use Gemini count_tokens instead of chars/4")
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    adapter = GeminiAdapter(recorder)
+    # Silence the modules' own progress prints
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        run_sample_case(adapter.generate_reply)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    count = make_counter(args.live)
+    rules = GeminiAdapter.GUARDRAIL_SYSTEM_PROMPT
+    by_site = defaultdict(lambda: [0, 0, 0])
+    by_profile = defaultdict(lambda: [0, 0, 0])
+
+    for call_site, messages in recorder.calls:
+        profile = profile_for(call_site)
+        original = [m for m in messages if m is not rules]
+        legacy = count(None, GUARDRAIL_PREAMBLE + render([rules] + original))
+        new = count(profile.system_instruction, render(messages))
+        for bucket in (by_site[call_site], by_profile[profile.name]):
+            bucket[0] += 1
+            bucket[1] += legacy
+            bucket[2] += new
+
+    unit = "tokens" if args.live else "~tokens"
+    print(f"{'call site':<18}{'profile':<11}{'calls':>6}{'before/call':>13}{'after/call':>12}{'saved':>8}")
+    for site, (calls, legacy, new) in sorted(by_site.items(), key=lambda kv: str(kv[0])):
+        print(f"{str(site):<18}{profile_for(site).name:<11}{calls:>6}"
+              f"{legacy // calls:>13}{new // calls:>12}{100 * (legacy - new) / legacy:>7.0f}%")
+
+    print(f"\n{'profile':<12}{'calls':>6}{'before':>10}{'after':>10}{'saved':>8}   ({unit}, whole sample case)")
+    total_legacy = total_new = 0
+    for name, (calls, legacy, new) in sorted(by_profile.items()):
+        total_legacy += legacy
+        total_new += new
+        print(f"{name:<12}{calls:>6}{legacy:>10}{new:>10}{100 * (legacy - new) / legacy:>7.0f}%")
+    print(f"{'total':<12}{len(recorder.calls):>6}{total_legacy:>10}{total_new:>10}"
+          f"{100 * (total_legacy - total_new) / total_legacy:>7.0f}%")
+    print("\nServer guardrail calls (guardrail_first / guardrail_answer / fused_intake) keep the full"
+          " guardrail profile; they now send it as a system instruction instead of prompt text.")
+
+
+if __name__ == "__main__":
+    main()
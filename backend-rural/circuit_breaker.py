@@ -0,0 +1,153 @@
+# circuit_breaker.py
+# Fail-fast guard around the Gemini client (closed → open → half-open)
+
+import os
+import time
+import threading
+from collections import deque
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    Raised by the Gemini wrappers instead of returning a placeholder reply:
+    the circuit is open, or every attempt failed. Callers switch to their
+    local fallbacks (keyword complexity, HighCaseHandler, static advice).
+    """
+
+
+class LLMStreamInterruptedError(LLMUnavailableError):
+    """
+    A streamed reply broke off after some chunks were already forwarded.
+    The partial text is kept on .partial; it is never cached or returned
+    as if it were the whole reply.
+    """
+
+    def __init__(self, message: str, partial: str = ""):
+        super().__init__(message)
+        self.partial = partial
+
+
+class CircuitBreaker:
+    """
+    Rolling window over the last `window` attempts.
+
+    Trips (→ open) once at least `min_calls` attempts are in the window and
+    either the failure rate reaches `failure_rate` or the share of attempts
+    slower than `slow_seconds` reaches `slow_rate`. While open every call
+    fails fast for `open_seconds`; then up to `half_open_probes` trial
+    calls are let through — a success closes the circuit, a failure
+    re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str = "gemini", window: int = 20, min_calls: int = 5,
+                 failure_rate: float = 0.5, slow_seconds: float = 15.0, slow_rate: float = 0.8,
+                 open_seconds: float = 30.0, half_open_probes: int = 1, enabled: bool = True):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.enabled = enabled
+
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)  # (ok, slow)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """True if a call may go out now (counts a half-open probe)."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state, self._probes = self.HALF_OPEN, 0
+                self._opened_at = time.monotonic()
+                print(f"🟡 Circuit '{self.name}' half-open — probing LLM")
+
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    # a probe that never reported back (cancelled) must not wedge the circuit
+                    if time.monotonic() - self._opened_at < self.open_seconds:
+                        self.rejected += 1
+                        return False
+                    self._probes, self._opened_at = 0, time.monotonic()
+                self._probes += 1
+            return True
+
+    def record(self, ok: bool, seconds: float):
+        if not self.enabled:
+            return
+        slow = seconds >= self.slow_seconds
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if ok and not slow:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    print(f"🟢 Circuit '{self.name}' closed — LLM healthy again")
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append((ok, slow))
+            if self.state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                n = len(self._outcomes)
+                failures = sum(1 for o, _ in self._outcomes if not o)
+                slow_calls = sum(1 for _, s in self._outcomes if s)
+                if failures / n >= self.failure_rate or slow_calls / n >= self.slow_rate:
+                    self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.times_opened += 1
+        print(f"🔴 Circuit '{self.name}' open — failing fast for {self.open_seconds:.0f}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "enabled": self.enabled,
+                "state": self.state,
+                "window_calls": len(self._outcomes),
+                "window_failures": sum(1 for o, _ in self._outcomes if not o),
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+            }
+
+
+def create_llm_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        name="gemini",
+        window=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+        min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "5")),
+        failure_rate=float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5")),
+        slow_seconds=float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "15")),
+        slow_rate=float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8")),
+        open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30")),
+        enabled=os.getenv("LLM_BREAKER", "1") == "1",
+    )
+
+
+_default_breaker = None
+_default_lock = threading.Lock()
+
+
+def get_default_breaker() -> CircuitBreaker:
+    """One breaker per process: both Gemini wrappers talk to the same upstream."""
+    global _default_breaker
+    with _default_lock:
+        if _default_breaker is None:
+            _default_breaker = create_llm_breaker()
+        return _default_breaker
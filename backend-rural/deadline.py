@@ -0,0 +1,79 @@
+# deadline.py
+# Per-case time budget: stages shrink their work instead of running past it
+
+import os
+import time
+
+from metrics import LLM_METRICS
+from tracing import TRACER
+
+
+# What a nurse will wait for once the final answers are submitted
+CASE_DEADLINE_SECONDS = float(os.getenv("CASE_DEADLINE_SECONDS", "60"))
+
+# Until the process has seen real calls, assume these per-call latencies
+DEFAULT_STAGE_SECONDS = {
+    "pcp": 8.0,
+    "mdt_turn": 4.0,
+    "mdt_summary": 8.0,
+    "simplify": 6.0,
+}
+
+# Output limit (tokens) for calls made while the budget is short
+SHORT_OUTPUT_TOKENS = 768
+
+
+class Deadline:
+    """
+    Created when final processing of a case starts and handed to every
+    stage. Stages ask affords(...) before optional work and call
+    degrade(name) when they cut something; the names end up in the
+    response's `degradations` field.
+
+    Stage cost = mean observed LLM latency for that call site (metrics
+    histogram), or DEFAULT_STAGE_SECONDS before any call was seen.
+    """
+
+    def __init__(self, seconds: float = None):
+        self.seconds = CASE_DEADLINE_SECONDS if seconds is None else seconds
+        self.started = time.monotonic()
+        self.applied = []
+
+    def remaining(self) -> float:
+        return self.seconds - (time.monotonic() - self.started)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @staticmethod
+    def estimate(call_site: str) -> float:
+        observed = LLM_METRICS.latency.mean(call_site=call_site)
+        return observed if observed is not None else DEFAULT_STAGE_SECONDS.get(call_site, 5.0)
+
+    def affords(self, *call_sites) -> bool:
+        """True if one call to each of `call_sites` still fits in the budget."""
+        return self.remaining() >= sum(self.estimate(s) for s in call_sites)
+
+    def output_limit(self, *call_sites) -> dict:
+        """
+        LLM kwargs for the next call: a shorter max_tokens when that call
+        plus `call_sites` after it no longer fit comfortably.
+        """
+        if self.affords(*call_sites):
+            return {}
+        self.degrade("short_output")
+        return {"max_tokens": SHORT_OUTPUT_TOKENS}
+
+    def degrade(self, name: str):
+        if name in self.applied:
+            return
+        self.applied.append(name)
+        print(f"⏱️ Deadline: {name} ({self.remaining():.1f}s left)")
+        TRACER.annotate(**{f"degraded.{name}": True})
+
+    def merge_into(self, result: dict) -> dict:
+        """Append the applied degradations to result['degradations']."""
+        if self.applied:
+            existing = result.get("degradations") or []
+            result["degradations"] = existing + [d for d in self.applied if d not in existing]
+        return result
@@ -2,131 +2,75 @@
 # ✅ Stable Gemini Wrapper for IMAS MDT Simulation (with safety + retry)
 
 import time
+import asyncio
+import contextlib
 import google.generativeai as genai
 from google.api_core.exceptions import GoogleAPIError
 
+from llm_cache import get_default_cache, request_key
+from circuit_breaker import LLMUnavailableError, LLMStreamInterruptedError, get_default_breaker
+from hedging import get_default_hedger
+from llm_scheduler import LLMOverloadedError, get_default_scheduler
+from llm_transport import configure, create_model, requires_api_key
+from metrics import LLM_METRICS
+from tracing import TRACER, traced_llm_call
+
+
+# ✅ Guardrail preamble + per-call-site profiles live in prompt_profiles.py
+from prompt_profiles import GUARDRAIL_PREAMBLE, profile_for
+
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
 
 class GeminiLLMWrapper:
     """A clean wrapper around Google Gemini for chat-like use cases."""
 
-    def __init__(self, api_key: str, model: str = "gemini-2.5-flash"):
-        """Initialize Gemini client and model."""
+    RETRY_DELAY = 1.5
+
+    def __init__(self, api_key: str, model: str = "gemini-2.5-flash", cache=None, breaker=None, hedger=None,
+                 scheduler=None):
+        """
+        Initialize Gemini client and model. cache=False turns the response
+        cache off; breaker=False disables the shared circuit breaker;
+        hedger=False disables hedged requests (opt-in via LLM_HEDGE=1);
+        scheduler=False bypasses the shared LLM scheduler (async calls only).
+        """
         try:
-            genai.configure(api_key=api_key)
+            # LLM_TRANSPORT picks live Gemini, record, replay or synthetic replies
+            configure(api_key)
             self.client = genai
-            self.model = genai.GenerativeModel(model)
+            self.model = create_model(model)
+            self.model_name = model
+            # One GenerativeModel per prompt profile: the static preamble is
+            # its system_instruction, so prompts carry only the per-call text
+            self._profile_models = {}
+            self.cache = get_default_cache() if cache is None else (cache or None)
+            self.breaker = get_default_breaker() if breaker is None else (breaker or None)
+            self.hedger = get_default_hedger() if hedger is None else (hedger or None)
+            self.scheduler = get_default_scheduler() if scheduler is None else (scheduler or None)
             print(f"✅ Gemini LLM Wrapper initialized with model: {model}")
         except Exception as e:
             print(f"❌ Failed to initialize Gemini: {e}")
             raise
 
-    def generate_reply(self, messages: list, retries: int = 2, **kwargs) -> str:
-        """
-        Generates a text reply from Gemini.
-        Expects messages as a list of dicts like:
-        [{"role": "user", "content": "text"}, {"role": "assistant", "content": "text"}]
-        Retries automatically if Gemini returns empty / finish_reason=2.
-        """
-
-        # ✅ UPDATED GUARDRAILS SYSTEM PROMPT
-        prompt = """
-You are AyuSahayak, an AI-powered medical triage assistant.
-You MUST strictly follow the clinical workflow and enforce guardrails. 
-Guardrails are RULES, not examples, and are not to be reused in clinical summaries.
-
-===========================================================
-PHASE 1 — Initial Patient Input (Strict Intake)
-===========================================================
-• Accept only full descriptive symptoms.
-• Reject irrelevant inputs immediately.
-• If the user gives ANY unrelated statement (foods, greetings, jokes, chit-chat, tasks), reply with:
-  "⚠️ Please continue answering the medical questions. You can ask other things after the assessment."
-
-• Allowed answers contain:
-  - Symptom descriptions
-  - Duration
-  - Severity
-  - Time pattern
-  - Triggers
-  - Progression
-
-• DO NOT move to the next question if the incoming answer is irrelevant.
-
-===========================================================
-PHASE 2 — Follow-up Clarification (Controlled Free-Text)
-===========================================================
-User may answer in normal language, but:
-✅ Allowed examples:
-  "3 days", "severe", "while walking", "after meals", "only at night"
-
-❌ NOT allowed (must be blocked with a warning):
-  - Greetings ("hi", "hello", "ok", "lol")
-  - Food ("I ate biryani")
-  - Social talk
-  - Random conversation
-  - Restart attempts ("start", "restart")
-  - Adding NEW symptoms not in Phase 1
-
-• If user introduces NEW symptoms not originally stated, reply:
-  "⚠️ New symptoms can only be added at the beginning. Please answer the current question."
-
-• If user tries to restart:
-  "⚠️ Please complete the current case before starting a new one."
-
-• If user gives irrelevant text:
-  "⚠️ Please answer the medical question first."
-
-• DO NOT automatically move ahead if the answer is irrelevant.
-
-===========================================================
-PHASE 3 — MDT SUMMARY (Final Output)
-===========================================================
-In Phase 3 you ONLY output the required sections:
-  • Symptoms
-  • Possible Diseases
-  • Moderator Summary
-  • Patient Advice
-
-Rules:
-❌ DO NOT output guardrail warnings in Phase 3.
-❌ DO NOT copy any Phase 1/2 warning lines.
-❌ NEVER insert warnings inside symptoms, moderator summary, diseases, or advice.
-✅ These warnings must NEVER appear in Phase 3:
-   - "⚠️ Please continue answering the medical questions."
-   - "⚠️ Please answer the medical question first."
-   - "⚠️ New symptoms can only be added at the beginning."
-   - "⚠️ I need more information to answer safely."
-
-===========================================================
-MEDICINE RULES (Strict)
-===========================================================
-✅ Allowed:
-• Mention ONLY medicine names (paracetamol, ORS, IV saline)
-
-❌ Not Allowed:
-• Dosages (mg, ml, mg/kg)
-• Frequency (2 times a day, every 6 hours)
-• Phrases indicating prescription (take, consume, use, buy)
-
-→ If dosage slips through, replace entire line with:
-  "Seek a clinical evaluation for safe medication use."
-
-===========================================================
-SAFETY RULES
-===========================================================
-• If user answer is unclear:
-  "⚠️ I need more information to answer safely."
-• If answer is irrelevant:
-  Use the appropriate PHASE 1/2 guardrail line.
-• These rules override all other behaviors.
-
-===========================================================
-ABSOLUTE PRIORITY
-===========================================================
-• Guardrails ALWAYS override normal conversation.
-• Gemini MUST block irrelevant or off-topic answers.
-• Gemini MUST ONLY proceed when the answer is medically relevant.
-"""
+    # -------------------------------------------------------
+    # Prompt / response helpers (shared by sync + async paths)
+    # -------------------------------------------------------
+    def _model_for(self, profile):
+        if not profile.system_instruction:
+            return self.model
+        model = self._profile_models.get(profile.name)
+        if model is None:
+            model = create_model(self.model_name, system_instruction=profile.system_instruction)
+            self._profile_models[profile.name] = model
+        return model
+
+    def _build_prompt(self, messages: list) -> str:
+        prompt = ""
 
         # ✅ Append incoming conversation messages
         for message in messages:
@@ -140,71 +84,333 @@ ABSOLUTE PRIORITY
                 prompt += f"Assistant: {content}\n"
             else:
                 prompt += f"{role.capitalize()}: {content}\n"
+        return prompt
+
+    def _generation_config(self, kwargs: dict):
+        return genai.GenerationConfig(
+            temperature=kwargs.get("temperature", 0.6),
+            max_output_tokens=kwargs.get("max_tokens", 2048),
+        )
+
+    def _cache_key(self, messages: list, call_site, profile, kwargs: dict):
+        # Only opted-in call sites are cached
+        return request_key(
+            self.cache, self.model_name, messages, call_site,
+            profile=profile.name,
+            temperature=kwargs.get("temperature", 0.6),
+            max_tokens=kwargs.get("max_tokens", 2048),
+        )
+
+    def _cached(self, key):
+        return self.cache.get(key) if key else None
+
+    def _store(self, key, reply: str):
+        if key:
+            self.cache.put(key, reply)
+
+    def _check_circuit(self, call_site):
+        if self.breaker and not self.breaker.allow():
+            LLM_METRICS.short_circuited(call_site)
+            TRACER.annotate(circuit_open=True)
+            raise LLMUnavailableError("Gemini circuit open — failing fast")
+
+    def _retry_allowed(self) -> bool:
+        return not self.breaker or self.breaker.allow()
+
+    def _record_attempt(self, attempt_started: float, error=None):
+        if self.breaker:
+            # An empty / filtered reply (ValueError) still means Gemini is up
+            ok = error is None or isinstance(error, ValueError)
+            self.breaker.record(ok, time.perf_counter() - attempt_started)
+
+    def _slot(self, call_site):
+        return self.scheduler.slot(call_site) if self.scheduler else contextlib.nullcontext()
+
+    def _scheduled(self, call_site, make_call, granted: list):
+        """
+        make_call wrapped so every upstream request — a hedged backup too —
+        holds its own scheduler slot and rate-limit token. Slot grant
+        times go to `granted` (queueing is not upstream latency).
+        """
+        async def request():
+            async with self._slot(call_site):
+                granted.append(time.perf_counter())
+                return await make_call()
+        return request
+
+    async def _send(self, call_site, request):
+        if not self.hedger:
+            return await request()
+        # No backup while the scheduler is saturated: it would only queue behind other calls
+        return await self.hedger.run(call_site, request,
+                                     can_hedge=self.scheduler.has_capacity if self.scheduler else None)
+
+    def _extract_text(self, response) -> str:
+        # ✅ Check for valid candidate parts
+        if not hasattr(response, "candidates") or not response.candidates:
+            raise ValueError("No candidates returned by Gemini (possibly filtered).")
+
+        has_valid_part = False
+        combined_text = []
+
+        for cand in response.candidates:
+            if hasattr(cand, "content") and hasattr(cand.content, "parts"):
+                for part in cand.content.parts:
+                    if hasattr(part, "text") and part.text:
+                        combined_text.append(part.text.strip())
+                        has_valid_part = True
+
+        # ✅ Prefer .text accessor
+        if hasattr(response, "text") and response.text and response.text.strip():
+            return response.text.strip()
+
+        # ✅ Return candidate parts
+        if has_valid_part and combined_text:
+            return " ".join(combined_text).strip()
+
+        raise ValueError("Empty Gemini response or finish_reason=2")
+
+    # -------------------------------------------------------
+    # Blocking call (CLI / scripts)
+    # -------------------------------------------------------
+    @traced_llm_call
+    def generate_reply(self, messages: list, retries: int = 2, **kwargs) -> str:
+        """
+        Generates a text reply from Gemini.
+        Expects messages as a list of dicts like:
+        [{"role": "user", "content": "text"}, {"role": "assistant", "content": "text"}]
+        Retries automatically if Gemini returns empty / finish_reason=2.
+        Pass call_site="..." to let opted-in call sites reuse cached replies.
+        Raises LLMUnavailableError when the circuit is open or every attempt failed.
+        """
+        call_site = kwargs.pop("call_site", None)
+        profile = profile_for(call_site)
+        key = self._cache_key(messages, call_site, profile, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            LLM_METRICS.cached(call_site)
+            TRACER.annotate(cached=True)
+            return cached
+
+        self._check_circuit(call_site)
+        started = time.perf_counter()
+        prompt = self._build_prompt(messages)
 
         attempt = 0
         while attempt <= retries:
+            attempt_started = time.perf_counter()
             try:
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config=genai.GenerationConfig(
-                        temperature=kwargs.get("temperature", 0.6),
-                        max_output_tokens=kwargs.get("max_tokens", 2048),
-                    ),
-                    safety_settings=[
-                        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-                    ],
-                )
-
-                # ✅ Check for valid candidate parts
-                if not hasattr(response, "candidates") or not response.candidates:
-                    raise ValueError("No candidates returned by Gemini (possibly filtered).")
-
-                has_valid_part = False
-                combined_text = []
+                with TRACER.span("llm.attempt", attempt=attempt + 1, prompt_chars=len(prompt)):
+                    response = self._model_for(profile).generate_content(
+                        prompt,
+                        generation_config=self._generation_config(kwargs),
+                        safety_settings=SAFETY_SETTINGS,
+                    )
+                    reply = self._extract_text(response)
+                self._record_attempt(attempt_started)
+                self._store(key, reply)
+                LLM_METRICS.success(call_site, started, prompt, reply, response)
+                return reply
 
-                for cand in response.candidates:
-                    if hasattr(cand, "content") and hasattr(cand.content, "parts"):
-                        for part in cand.content.parts:
-                            if hasattr(part, "text") and part.text:
-                                combined_text.append(part.text.strip())
-                                has_valid_part = True
-
-                # ✅ Prefer .text accessor
-                if hasattr(response, "text") and response.text and response.text.strip():
-                    return response.text.strip()
+            except (GoogleAPIError, ValueError, Exception) as e:
+                self._record_attempt(attempt_started, e)
+                attempt += 1
+                print(f"⚠️ Gemini attempt {attempt} failed: {e}")
+                if attempt <= retries and self._retry_allowed():
+                    LLM_METRICS.retry(call_site)
+                    time.sleep(self.RETRY_DELAY)
+                    print("🔁 Retrying Gemini request...")
+                    continue
 
-                # ✅ Return candidate parts
-                if has_valid_part and combined_text:
-                    return " ".join(combined_text).strip()
+                # ✅ Callers fall back to their local logic
+                print("❌ Gemini failed all attempts — LLM unavailable.")
+                LLM_METRICS.failure(call_site, started, prompt)
+                TRACER.annotate(fallback=True)
+                raise LLMUnavailableError(f"Gemini failed after {attempt} attempt(s): {e}") from e
+
+    # -------------------------------------------------------
+    # Non-blocking call (FastAPI endpoints)
+    # -------------------------------------------------------
+    @traced_llm_call
+    async def agenerate_reply(self, messages: list, retries: int = 2, **kwargs) -> str:
+        """
+        Awaitable twin of generate_reply().
+        Uses Gemini's async client and asyncio.sleep between retries so a slow
+        or failing call never blocks the event loop for other cases. Attempts
+        at hedged call sites may race a duplicate request (hedging.py).
+        """
+        call_site = kwargs.pop("call_site", None)
+        profile = profile_for(call_site)
+        key = self._cache_key(messages, call_site, profile, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            LLM_METRICS.cached(call_site)
+            TRACER.annotate(cached=True)
+            return cached
+
+        self._check_circuit(call_site)
+        started = time.perf_counter()
+        prompt = self._build_prompt(messages)
 
-                raise ValueError("Empty Gemini response or finish_reason=2")
+        attempt = 0
+        while attempt <= retries:
+            attempt_started = time.perf_counter()
+            granted = []
+            try:
+                with TRACER.span("llm.attempt", attempt=attempt + 1, prompt_chars=len(prompt)):
+                    model = self._model_for(profile)
+                    request = self._scheduled(call_site, lambda: model.generate_content_async(
+                        prompt,
+                        generation_config=self._generation_config(kwargs),
+                        safety_settings=SAFETY_SETTINGS,
+                    ), granted)
+                    response = await self._send(call_site, request)
+                    reply = self._extract_text(response)
+                self._record_attempt(granted[0])
+                self._store(key, reply)
+                LLM_METRICS.success(call_site, started, prompt, reply, response)
+                return reply
+
+            except LLMOverloadedError:
+                TRACER.annotate(shed=True)
+                raise
 
             except (GoogleAPIError, ValueError, Exception) as e:
+                self._record_attempt(granted[0] if granted else attempt_started, e)
                 attempt += 1
-                print(f"⚠️ Gemini attempt {attempt} failed: {e}")
-                if attempt <= retries:
-                    time.sleep(1.5)
+                print(f"⚠️ Gemini async attempt {attempt} failed: {e}")
+                if attempt <= retries and self._retry_allowed():
+                    LLM_METRICS.retry(call_site)
+                    await asyncio.sleep(self.RETRY_DELAY)
                     print("🔁 Retrying Gemini request...")
                     continue
 
-                # ✅ Fallback message on full failure
-                print("❌ Gemini failed all attempts — returning fallback response.")
-                return (
-                    "⚠️ Unable to generate an AI response at this moment. "
-                    "Please review manually or retry later."
-                )
+                print("❌ Gemini failed all attempts — LLM unavailable.")
+                LLM_METRICS.failure(call_site, started, prompt)
+                TRACER.annotate(fallback=True)
+                raise LLMUnavailableError(f"Gemini failed after {attempt} attempt(s): {e}") from e
+
+    # -------------------------------------------------------
+    # Token streaming (PCP advice, MDT moderator, simplifier)
+    # -------------------------------------------------------
+    def _chunk_text(self, chunk) -> str:
+        try:
+            return chunk.text or ""
+        except (ValueError, AttributeError):
+            # chunk with no text part (e.g. final safety/usage chunk)
+            return ""
 
-        return "⚠️ Gemini returned empty response after multiple retries."
+    def generate_reply_stream(self, messages: list, **kwargs):
+        """
+        Yields text chunks as Gemini produces them.
+        If the stream fails before anything was produced, falls back to
+        generate_reply() (with its retries) and yields the full text once.
+        If it fails after chunks were yielded, raises
+        LLMStreamInterruptedError so the caller can drop the partial text.
+        A cached reply is yielded as a single chunk.
+        """
+        call_site = kwargs.pop("call_site", None)
+        profile = profile_for(call_site)
+        key = self._cache_key(messages, call_site, profile, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            LLM_METRICS.cached(call_site)
+            TRACER.annotate(cached=True)
+            yield cached
+            return
+
+        self._check_circuit(call_site)
+        started = time.perf_counter()
+        prompt = self._build_prompt(messages)
+        pieces = []
+        with TRACER.span("llm.stream", activate=False, call_site=call_site or "unlabelled",
+                         model=self.model_name) as span:
+            try:
+                response = self._model_for(profile).generate_content(
+                    prompt,
+                    generation_config=self._generation_config(kwargs),
+                    safety_settings=SAFETY_SETTINGS,
+                    stream=True,
+                )
+                for chunk in response:
+                    text = self._chunk_text(chunk)
+                    if text:
+                        pieces.append(text)
+                        yield text
+                reply = "".join(pieces).strip()
+                self._record_attempt(started)
+                self._store(key, reply)
+                LLM_METRICS.success(call_site, started, prompt, reply, response)
+            except Exception as e:
+                print(f"⚠️ Gemini stream failed: {e}")
+                if span:
+                    span.fail(e)
+                self._record_attempt(started, e)
+                if pieces:
+                    LLM_METRICS.failure(call_site, started, prompt, outcome="partial")
+                    TRACER.annotate(fallback=True, partial_stream=True)
+                    raise LLMStreamInterruptedError(
+                        f"Gemini stream interrupted after {len(pieces)} chunk(s): {e}", "".join(pieces)) from e
+                LLM_METRICS.retry(call_site)
+        if not pieces:
+            yield self.generate_reply(messages, call_site=call_site, **kwargs)
+
+    async def agenerate_reply_stream(self, messages: list, **kwargs):
+        """Async generator twin of generate_reply_stream()."""
+        call_site = kwargs.pop("call_site", None)
+        profile = profile_for(call_site)
+        key = self._cache_key(messages, call_site, profile, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            LLM_METRICS.cached(call_site)
+            TRACER.annotate(cached=True)
+            yield cached
+            return
+
+        self._check_circuit(call_site)
+        started = time.perf_counter()
+        prompt = self._build_prompt(messages)
+        pieces = []
+        with TRACER.span("llm.stream", activate=False, call_site=call_site or "unlabelled",
+                         model=self.model_name) as span:
+            async with self._slot(call_site):
+                attempt_started = time.perf_counter()
+                try:
+                    response = await self._model_for(profile).generate_content_async(
+                        prompt,
+                        generation_config=self._generation_config(kwargs),
+                        safety_settings=SAFETY_SETTINGS,
+                        stream=True,
+                    )
+                    async for chunk in response:
+                        text = self._chunk_text(chunk)
+                        if text:
+                            pieces.append(text)
+                            yield text
+                    reply = "".join(pieces).strip()
+                    self._record_attempt(attempt_started)
+                    self._store(key, reply)
+                    LLM_METRICS.success(call_site, started, prompt, reply, response)
+                except Exception as e:
+                    print(f"⚠️ Gemini async stream failed: {e}")
+                    if span:
+                        span.fail(e)
+                    self._record_attempt(attempt_started, e)
+                    if pieces:
+                        LLM_METRICS.failure(call_site, started, prompt, outcome="partial")
+                        TRACER.annotate(fallback=True, partial_stream=True)
+                        raise LLMStreamInterruptedError(
+                            f"Gemini stream interrupted after {len(pieces)} chunk(s): {e}", "".join(pieces)) from e
+                    LLM_METRICS.retry(call_site)
+        if not pieces:
+            yield await self.agenerate_reply(messages, call_site=call_site, **kwargs)
 
 
 # ✅ Test standalone before running MDT
 if __name__ == "__main__":
     import os
 
-    api_key = os.getenv("GOOGLE_API_KEY") or input("Enter your Gemini API key: ")
+    api_key = os.getenv("GOOGLE_API_KEY") or (input("Enter your Gemini API key: ") if requires_api_key() else "")
     gemini = GeminiLLMWrapper(api_key)
 
     print("\nTesting Gemini Response...\n")
@@ -3,25 +3,63 @@
 
 
 import time
+import asyncio
+import contextlib
 import google.generativeai as genai
 from google.api_core.exceptions import GoogleAPIError
 
+from llm_cache import get_default_cache, request_key
+from circuit_breaker import LLMUnavailableError, get_default_breaker
+from hedging import get_default_hedger
+from llm_scheduler import LLMOverloadedError, get_default_scheduler
+from llm_transport import configure, create_model
+from metrics import LLM_METRICS
+from tracing import TRACER, traced_llm_call
+
 
 class GeminiMDTWrapper:
     """Wrapper for MDT-only responses without triage behaviour."""
 
-    def __init__(self, api_key: str, model: str = "gemini-2.5-flash"):
+    def __init__(self, api_key: str, model: str = "gemini-2.5-flash", cache=None, breaker=None, hedger=None,
+                 scheduler=None):
         try:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel(model)
+            configure(api_key)
+            self.model = create_model(model)
+            self.model_name = model
+            # MDT turns pass no call_site (or a non opted-in one) and bypass it
+            self.cache = get_default_cache() if cache is None else (cache or None)
+            # Shared with GeminiLLMWrapper — same upstream
+            self.breaker = get_default_breaker() if breaker is None else (breaker or None)
+            self.hedger = get_default_hedger() if hedger is None else (hedger or None)
+            self.scheduler = get_default_scheduler() if scheduler is None else (scheduler or None)
             print(f"✅ Gemini MDT Wrapper initialized: {model}")
         except Exception as e:
             print(f"❌ Gemini MDT init failed: {e}")
             raise
 
-    def generate_reply(self, messages: list, retries: int = 2, **kwargs) -> str:
-        """Generate a clean reply for MDT roundtable discussions."""
+    def _slot(self, call_site):
+        return self.scheduler.slot(call_site) if self.scheduler else contextlib.nullcontext()
+
+    def _scheduled(self, call_site, make_call, granted: list):
+        """
+        make_call wrapped so every upstream request — a hedged backup too —
+        holds its own scheduler slot and rate-limit token. Slot grant
+        times go to `granted` (queueing is not upstream latency).
+        """
+        async def request():
+            async with self._slot(call_site):
+                granted.append(time.perf_counter())
+                return await make_call()
+        return request
 
+    async def _send(self, call_site, request):
+        if not self.hedger:
+            return await request()
+        # No backup while the scheduler is saturated: it would only queue behind other calls
+        return await self.hedger.run(call_site, request,
+                                     can_hedge=self.scheduler.has_capacity if self.scheduler else None)
+
+    def _build_prompt(self, messages: list) -> str:
         # Build a simple chat-like prompt (NO guardrails)
         prompt = ""
         for msg in messages:
@@ -33,42 +71,143 @@ class GeminiMDTWrapper:
                 prompt += f"Assistant: {content}\n"
             else:
                 prompt += f"User: {content}\n"
+        return prompt
+
+    def _request_kwargs(self, kwargs: dict) -> dict:
+        return {
+            "generation_config": genai.GenerationConfig(
+                temperature=kwargs.get("temperature", 0.4),
+                max_output_tokens=kwargs.get("max_tokens", 2048),
+            ),
+            "safety_settings": [
+                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
+            ],
+        }
+
+    def _cache_key(self, messages: list, call_site, kwargs: dict):
+        return request_key(
+            self.cache, self.model_name, messages, call_site,
+            wrapper="mdt",
+            temperature=kwargs.get("temperature", 0.4),
+            max_tokens=kwargs.get("max_tokens", 2048),
+        )
+
+    def _check_circuit(self, call_site):
+        if self.breaker and not self.breaker.allow():
+            LLM_METRICS.short_circuited(call_site)
+            raise LLMUnavailableError("Gemini circuit open — failing fast")
+
+    def _record_attempt(self, attempt_started: float, error=None):
+        if self.breaker:
+            ok = error is None or isinstance(error, ValueError)
+            self.breaker.record(ok, time.perf_counter() - attempt_started)
+
+    def _extract_text(self, response) -> str:
+        # Prefer clean .text
+        if hasattr(response, "text") and response.text:
+            return response.text.strip()
+
+        # Fallback: read candidate parts
+        if hasattr(response, "candidates") and response.candidates:
+            cand = response.candidates[0]
+            if hasattr(cand, "content") and hasattr(cand.content, "parts"):
+                parts = cand.content.parts
+                combined = " ".join([p.text for p in parts if hasattr(p, "text")])
+                if combined.strip():
+                    return combined.strip()
+
+        raise ValueError("Empty MDT response")
+
+    @traced_llm_call
+    def generate_reply(self, messages: list, retries: int = 2, **kwargs) -> str:
+        """Generate a clean reply for MDT roundtable discussions."""
+        call_site = kwargs.pop("call_site", None)
+        key = self._cache_key(messages, call_site, kwargs)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                LLM_METRICS.cached(call_site)
+                TRACER.annotate(cached=True)
+                return cached
+
+        self._check_circuit(call_site)
+        started = time.perf_counter()
+        prompt = self._build_prompt(messages)
 
         attempt = 0
         while attempt <= retries:
+            attempt_started = time.perf_counter()
             try:
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config=genai.GenerationConfig(
-                        temperature=kwargs.get("temperature", 0.4),
-                        max_output_tokens=kwargs.get("max_tokens", 2048),
-                    ),
-                    safety_settings=[
-                        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
-                    ],
-                )
-
-                # Prefer clean .text
-                if hasattr(response, "text") and response.text:
-                    return response.text.strip()
-
-                # Fallback: read candidate parts
-                if hasattr(response, "candidates") and response.candidates:
-                    cand = response.candidates[0]
-                    if hasattr(cand, "content") and hasattr(cand.content, "parts"):
-                        parts = cand.content.parts
-                        combined = " ".join([p.text for p in parts if hasattr(p, "text")])
-                        if combined.strip():
-                            return combined.strip()
-
-                raise ValueError("Empty MDT response")
+                with TRACER.span("llm.attempt", attempt=attempt + 1, prompt_chars=len(prompt)):
+                    response = self.model.generate_content(prompt, **self._request_kwargs(kwargs))
+                    reply = self._extract_text(response)
+                self._record_attempt(attempt_started)
+                if key:
+                    self.cache.put(key, reply)
+                LLM_METRICS.success(call_site, started, prompt, reply, response)
+                return reply
 
             except Exception as e:
+                self._record_attempt(attempt_started, e)
                 attempt += 1
                 print(f"⚠️ MDT Gemini attempt {attempt} failed: {e}")
-                if attempt <= retries:
+                if attempt <= retries and (not self.breaker or self.breaker.allow()):
+                    LLM_METRICS.retry(call_site)
                     time.sleep(0.5)
                 else:
-                    return "[MDT] Unable to produce response."
+                    LLM_METRICS.failure(call_site, started, prompt)
+                    TRACER.annotate(fallback=True)
+                    raise LLMUnavailableError(f"MDT Gemini failed after {attempt} attempt(s): {e}") from e
+
+        return "[MDT] No valid response."
+
+    @traced_llm_call
+    async def agenerate_reply(self, messages: list, retries: int = 2, **kwargs) -> str:
+        """Awaitable twin of generate_reply() for the async FastAPI path."""
+        call_site = kwargs.pop("call_site", None)
+        key = self._cache_key(messages, call_site, kwargs)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                LLM_METRICS.cached(call_site)
+                TRACER.annotate(cached=True)
+                return cached
+
+        self._check_circuit(call_site)
+        started = time.perf_counter()
+        prompt = self._build_prompt(messages)
+
+        attempt = 0
+        while attempt <= retries:
+            attempt_started = time.perf_counter()
+            granted = []
+            try:
+                with TRACER.span("llm.attempt", attempt=attempt + 1, prompt_chars=len(prompt)):
+                    request = self._scheduled(
+                        call_site, lambda: self.model.generate_content_async(prompt, **self._request_kwargs(kwargs)),
+                        granted)
+                    response = await self._send(call_site, request)
+                    reply = self._extract_text(response)
+                self._record_attempt(granted[0])
+                if key:
+                    self.cache.put(key, reply)
+                LLM_METRICS.success(call_site, started, prompt, reply, response)
+                return reply
+
+            except LLMOverloadedError:
+                TRACER.annotate(shed=True)
+                raise
+
+            except Exception as e:
+                self._record_attempt(granted[0] if granted else attempt_started, e)
+                attempt += 1
+                print(f"⚠️ MDT Gemini async attempt {attempt} failed: {e}")
+                if attempt <= retries and (not self.breaker or self.breaker.allow()):
+                    LLM_METRICS.retry(call_site)
+                    await asyncio.sleep(0.5)
+                else:
+                    LLM_METRICS.failure(call_site, started, prompt)
+                    TRACER.annotate(fallback=True)
+                    raise LLMUnavailableError(f"MDT Gemini failed after {attempt} attempt(s): {e}") from e
 
         return "[MDT] No valid response."
@@ -0,0 +1,189 @@
+# hedging.py
+# Hedged LLM requests: fire a duplicate when a call outlives its call site's p90
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+
+from metrics import LLM_METRICS
+from tracing import TRACER
+
+
+# Short, idempotent calls: a duplicate costs little and the first answer is as good as the second
+DEFAULT_HEDGE_SITES = "guardrail_first,guardrail_answer,complexity,shortlist,triage"
+
+
+class _SiteStats:
+    __slots__ = ("latencies", "delay", "since_refresh", "tokens", "requests", "hedges", "hedge_wins")
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.delay = None          # cached hedge delay (seconds), refreshed every few samples
+        self.since_refresh = 0
+        self.tokens = 0.0          # hedge budget
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+
+class RequestHedger:
+    """
+    run(call_site, make_call) awaits make_call(); if it has not finished
+    after the call site's recent `quantile` latency, a second identical
+    request is started and the first one to succeed wins (the other is
+    cancelled).
+
+    - Only `sites` are hedged, and only after `min_samples` latencies
+      were seen for that site.
+    - Budget: every request earns `max_ratio` hedge tokens (capped at
+      `burst`); a hedge spends one — hedges stay ≈ max_ratio of traffic.
+    """
+
+    def __init__(self, sites: str = DEFAULT_HEDGE_SITES, quantile: float = 0.9,
+                 max_ratio: float = 0.05, burst: float = 2.0, min_samples: int = 20,
+                 window: int = 200, min_delay: float = 0.2, enabled: bool = True):
+        self.sites = {s.strip() for s in (sites or "").split(",") if s.strip()}
+        self.quantile = quantile
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay = min_delay
+        self.enabled = enabled
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, call_site) -> _SiteStats:
+        stats = self._sites.get(call_site)
+        if stats is None:
+            stats = self._sites[call_site] = _SiteStats(self.window)
+        return stats
+
+    def _observe(self, call_site, seconds: float):
+        with self._lock:
+            stats = self._stats(call_site)
+            stats.latencies.append(seconds)
+            stats.since_refresh += 1
+            # Sorting 200 floats is cheap, but not on every call
+            if stats.delay is None or stats.since_refresh >= 10:
+                stats.since_refresh = 0
+                if len(stats.latencies) >= self.min_samples:
+                    ordered = sorted(stats.latencies)
+                    stats.delay = max(self.min_delay, ordered[int(self.quantile * (len(ordered) - 1))])
+
+    def _admit(self, call_site):
+        """Returns the hedge delay for this request, or None to run it plainly."""
+        with self._lock:
+            stats = self._stats(call_site)
+            stats.requests += 1
+            stats.tokens = min(self.burst, stats.tokens + self.max_ratio)
+            return stats.delay
+
+    def _take_token(self, call_site) -> bool:
+        with self._lock:
+            stats = self._stats(call_site)
+            if stats.tokens < 1:
+                return False
+            stats.tokens -= 1
+            stats.hedges += 1
+            return True
+
+    async def run(self, call_site, make_call, can_hedge=None):
+        """can_hedge() -> False vetoes the backup (e.g. the LLM scheduler has no free slot)."""
+        if not self.enabled or call_site not in self.sites:
+            return await make_call()
+
+        delay = self._admit(call_site)
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(make_call())
+        if delay is None:
+            result = await primary
+            self._observe(call_site, time.perf_counter() - started)
+            return result
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or (can_hedge and not can_hedge()) or not self._take_token(call_site):
+                result = await primary
+                self._observe(call_site, time.perf_counter() - started)
+                return result
+
+            LLM_METRICS.hedges.inc(call_site=call_site, outcome="fired")
+            TRACER.annotate(hedged=True, hedge_delay_ms=round(delay * 1000))
+            backup = asyncio.ensure_future(make_call())
+            result, winner = await self._first_success(primary, backup)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+
+        # Latency as the caller saw it (the loser's true latency is unknown)
+        self._observe(call_site, time.perf_counter() - started)
+        if winner is backup:
+            with self._lock:
+                self._stats(call_site).hedge_wins += 1
+            LLM_METRICS.hedges.inc(call_site=call_site, outcome="won")
+            TRACER.annotate(hedge_won=True)
+        return result
+
+    @staticmethod
+    async def _first_success(primary, backup):
+        pending = {primary, backup}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        return task.result(), task
+                    error = task.exception()
+            raise error or asyncio.CancelledError()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sites": sorted(self.sites),
+                "quantile": self.quantile,
+                "max_ratio": self.max_ratio,
+                "per_site": {
+                    site: {
+                        "samples": len(s.latencies),
+                        "hedge_delay_seconds": round(s.delay, 3) if s.delay is not None else None,
+                        "requests": s.requests,
+                        "hedges": s.hedges,
+                        "hedge_wins": s.hedge_wins,
+                    }
+                    for site, s in self._sites.items()
+                },
+            }
+
+
+def create_hedger() -> RequestHedger:
+    return RequestHedger(
+        sites=os.getenv("LLM_HEDGE_SITES", DEFAULT_HEDGE_SITES),
+        quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.9")),
+        max_ratio=float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.05")),
+        min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.2")),
+        enabled=os.getenv("LLM_HEDGE", "0") == "1",
+    )
+
+
+_default_hedger = None
+_default_lock = threading.Lock()
+
+
+def get_default_hedger() -> RequestHedger:
+    """One hedger per process so latency history is shared by both Gemini wrappers."""
+    global _default_hedger
+    with _default_lock:
+        if _default_hedger is None:
+            _default_hedger = create_hedger()
+        return _default_hedger
@@ -0,0 +1,228 @@
+# llm_cache.py
+# Content-addressed cache for Gemini replies (memory LRU/TTL + optional SQLite tier)
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+# Call sites whose prompts are deterministic enough to reuse a reply.
+# MDT turns / follow-up questions are creative and stay uncached.
+DEFAULT_CACHE_SITES = (
+    "triage,shortlist,complexity,simplify,"
+    "guardrail_first,guardrail_answer,fused_intake,"
+    "mdt_symptoms,mdt_specialists"
+)
+
+
+def _normalize_messages(messages) -> list:
+    if isinstance(messages, str):
+        return [["user", " ".join(messages.split())]]
+    out = []
+    for m in messages or []:
+        content = " ".join(str(m.get("content", "")).split())
+        if content:
+            out.append([str(m.get("role", "user")).lower(), content])
+    return out
+
+
+class LLMResponseCache:
+    """
+    Maps sha256(model, normalized messages, generation config) -> reply text.
+
+    - Memory tier: OrderedDict LRU with an absolute TTL per entry.
+    - Disk tier (optional): SQLite in WAL mode, so hits survive a restart
+      and are shared by every worker on the machine.
+    - Only call sites listed in `sites` are cached ("*" = all); a call
+      with no call_site is never cached.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 6 * 60 * 60,
+                 sites: str = DEFAULT_CACHE_SITES, disk_path: str = None,
+                 disk_max_entries: int = 20000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sites = {s.strip() for s in (sites or "").split(",") if s.strip()}
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+
+        # key -> (reply, stored_at); order = recency
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._disk = None
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, timeout=10, check_same_thread=False, isolation_level=None)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("PRAGMA synchronous=NORMAL")
+            self._disk.execute("PRAGMA busy_timeout=5000")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " reply TEXT NOT NULL,"
+                " stored_at REAL NOT NULL)"
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_stored_at ON llm_cache(stored_at)")
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypassed = 0
+        self.evicted = 0
+
+    # ------------------------------------
+    # Public API
+    # ------------------------------------
+    def enabled_for(self, call_site) -> bool:
+        if call_site and ("*" in self.sites or call_site in self.sites):
+            return True
+        self.bypassed += 1
+        return False
+
+    @staticmethod
+    def make_key(model: str, messages, config: dict = None) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": _normalize_messages(messages), "config": config or {}},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                reply, stored_at = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits_memory += 1
+                    return reply
+                del self._entries[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT reply, stored_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    # Promote into memory, keeping the original timestamp
+                    self._remember(key, row[0], row[1])
+                    self.hits_disk += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, reply: str):
+        if not isinstance(reply, str) or not reply.strip():
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, reply, now)
+            self.stores += 1
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, reply, stored_at) VALUES (?, ?, ?)",
+                    (key, reply, now),
+                )
+                # Trim the disk tier every so often rather than on every write
+                if self.stores % 100 == 0:
+                    self._trim_disk(now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            disk_entries = None
+            if self._disk is not None:
+                disk_entries = self._disk.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "sites": sorted(self.sites),
+                "disk_path": self.disk_path,
+                "disk_entries": disk_entries,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "stores": self.stores,
+                "bypassed": self.bypassed,
+                "evicted": self.evicted,
+            }
+
+    # ------------------------------------
+    # Helpers (lock must be held)
+    # ------------------------------------
+    def _remember(self, key, reply, stored_at):
+        self._entries[key] = (reply, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def _trim_disk(self, now):
+        self._disk.execute("DELETE FROM llm_cache WHERE stored_at < ?", (now - self.ttl,))
+        count = self._disk.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        overflow = count - self.disk_max_entries
+        if overflow > 0:
+            self._disk.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY stored_at ASC LIMIT ?)",
+                (overflow,),
+            )
+
+
+def request_key(cache, model: str, messages, call_site, **config):
+    """
+    Cache key for one wrapper request, or None when there is no cache or
+    the call site has not opted in.
+    """
+    if not cache or not cache.enabled_for(call_site):
+        return None
+    return cache.make_key(model, messages, config)
+
+
+# ===========================================================
+# Process-wide default (shared by both Gemini wrappers)
+# ===========================================================
+_DEFAULT_CACHE = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def create_llm_cache():
+    """
+    LLM_CACHE=0 disables caching entirely.
+    LLM_CACHE_SITES, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS tune the memory tier;
+    LLM_CACHE_SQLITE_PATH turns on the shared disk tier.
+    """
+    if os.getenv("LLM_CACHE", "1").strip().lower() in ("0", "false", "no", "off"):
+        print("ℹ️ LLM response cache disabled")
+        return None
+
+    disk_path = os.getenv("LLM_CACHE_SQLITE_PATH") or None
+    cache = LLMResponseCache(
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+        ttl=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(6 * 60 * 60))),
+        sites=os.getenv("LLM_CACHE_SITES", DEFAULT_CACHE_SITES),
+        disk_path=disk_path,
+        disk_max_entries=int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "20000")),
+    )
+    print(f"✅ LLM response cache enabled{' (disk: ' + disk_path + ')' if disk_path else ''}")
+    return cache
+
+
+def get_default_cache():
+    global _DEFAULT_CACHE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_CACHE is None:
+            _DEFAULT_CACHE = create_llm_cache() or False
+    return _DEFAULT_CACHE or None
@@ -0,0 +1,276 @@
+# llm_scheduler.py
+# Priority-aware admission control + client-side rate limiting for Gemini calls
+
+import os
+import math
+import time
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from circuit_breaker import LLMUnavailableError
+from metrics import REGISTRY, LLM_METRICS, site_label
+
+
+EMERGENCY, INTERACTIVE, BACKGROUND = "emergency", "interactive", "background"
+LANES = (EMERGENCY, INTERACTIVE, BACKGROUND)  # highest priority first
+
+# Intake (the nurse is waiting on each of these) vs. long case work
+CALL_SITE_LANES = {
+    "guardrail_first": INTERACTIVE,
+    "guardrail_answer": INTERACTIVE,
+    "fused_intake": INTERACTIVE,
+    "followup": INTERACTIVE,
+    "triage": INTERACTIVE,
+    "shortlist": INTERACTIVE,
+    "complexity": INTERACTIVE,
+}
+
+# Share of max_queue a lane may find queued before new work in it is shed
+SHED_AT = {EMERGENCY: None, INTERACTIVE: 1.0, BACKGROUND: 0.5}
+
+# Lane of the case being processed (set by the server for red-flag / high cases)
+_case_lane = contextvars.ContextVar("ayu_llm_case_lane", default=None)
+
+
+class LLMOverloadedError(LLMUnavailableError):
+    """
+    No scheduler slot within max_wait (or the queue is full). Subclass of
+    LLMUnavailableError so in-flight cases use their local fallbacks;
+    requests that have not started yet are turned away with a 503.
+    """
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """
+    One per process, shared by both Gemini wrappers (async paths).
+
+    - At most `max_concurrency` upstream calls in flight.
+    - Token bucket: `rate_per_minute` calls/min with `burst` (0 = no limit),
+      so the Gemini quota is spent smoothly instead of ending in 429s.
+    - Waiting calls queue per lane; a free slot always goes to the
+      highest-priority lane (emergency > interactive > background), FIFO
+      within a lane.
+    - overloaded(lane) is the admission check for new HTTP work: lower
+      lanes are shed first (background at half the queue, interactive
+      when it is full, emergency never).
+    """
+
+    def __init__(self, max_concurrency: int = 16, rate_per_minute: float = 0, burst: int = 10,
+                 max_queue: int = 64, max_wait: float = 30.0, enabled: bool = True):
+        self.max_concurrency = max_concurrency
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.enabled = enabled
+
+        self.active = 0
+        self._queues = {lane: deque() for lane in LANES}
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._timer = None
+        self._hold_seconds = 2.0  # EWMA of slot hold time, for Retry-After
+
+        self.granted = {lane: 0 for lane in LANES}
+        self.shed = {lane: 0 for lane in LANES}
+
+    # -------------------------------------------------------
+    # Lanes
+    # -------------------------------------------------------
+    def lane_for(self, call_site) -> str:
+        lane = CALL_SITE_LANES.get(call_site, BACKGROUND)
+        case_lane = _case_lane.get()
+        if case_lane and LANES.index(case_lane) < LANES.index(lane):
+            return case_lane
+        return lane
+
+    @contextmanager
+    def case_lane(self, lane):
+        """Raise the priority of every LLM call made inside (None = leave as is)."""
+        token = _case_lane.set(lane)
+        try:
+            yield
+        finally:
+            _case_lane.reset(token)
+
+    def escalate(self, lane):
+        """Raise the lane for the rest of the enclosing case_lane() block (e.g. once triage says high)."""
+        _case_lane.set(lane)
+
+    # -------------------------------------------------------
+    # Admission
+    # -------------------------------------------------------
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def retry_after(self) -> int:
+        backlog = self.queued() + self.active
+        return max(1, math.ceil(backlog / self.max_concurrency * self._hold_seconds))
+
+    def has_capacity(self) -> bool:
+        """A new call would start now (free slot + rate token, nobody waiting)."""
+        return not self.enabled or (self.queued() == 0 and self._can_start())
+
+    def overloaded(self, lane: str):
+        """Seconds to put in Retry-After if new work in `lane` should be shed, else None."""
+        share = SHED_AT.get(lane)
+        if not self.enabled or share is None or self.queued() < self.max_queue * share:
+            return None
+        self.shed[lane] += 1
+        SHED_REQUESTS.inc(lane=lane)
+        return self.retry_after()
+
+    # -------------------------------------------------------
+    # Slots
+    # -------------------------------------------------------
+    @asynccontextmanager
+    async def slot(self, call_site=None):
+        if not self.enabled:
+            yield
+            return
+
+        lane = self.lane_for(call_site)
+        await self._acquire(lane, call_site)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * (time.monotonic() - started)
+            self.active -= 1
+            self._dispatch()
+
+    def _refill(self):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _can_start(self) -> bool:
+        if self.active >= self.max_concurrency:
+            return False
+        self._refill()
+        return not self.rate or self._tokens >= 1
+
+    def _start(self, lane: str):
+        self.active += 1
+        if self.rate:
+            self._tokens -= 1
+        self.granted[lane] += 1
+
+    async def _acquire(self, lane: str, call_site):
+        if self.queued() == 0 and self._can_start():
+            self._start(lane)
+            return
+
+        if self.queued() >= self.max_queue and lane != EMERGENCY:
+            self._reject(lane, call_site, "queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[lane].append(waiter)
+        self._dispatch()
+        QUEUE_DEPTH.set(self.queued())
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return  # granted just as the timer fired
+            self._abandon(lane, waiter)
+            self._reject(lane, call_site, f"no slot within {self.max_wait:g}s")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # slot was handed to us but the caller went away — pass it on
+                self.active -= 1
+                self._dispatch()
+            else:
+                self._abandon(lane, waiter)
+            raise
+        finally:
+            QUEUE_DEPTH.set(self.queued())
+
+    def _abandon(self, lane: str, waiter):
+        waiter.cancel()
+        try:
+            self._queues[lane].remove(waiter)
+        except ValueError:
+            pass
+
+    def _reject(self, lane: str, call_site, reason: str):
+        self.shed[lane] += 1
+        SHED_REQUESTS.inc(lane=lane)
+        LLM_METRICS.requests.inc(call_site=site_label(call_site), outcome="shed")
+        raise LLMOverloadedError(f"LLM scheduler overloaded ({reason})", self.retry_after())
+
+    def _next_waiter(self):
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    return lane, waiter
+        return None, None
+
+    def _dispatch(self):
+        """Hand free slots to the highest-priority waiters."""
+        while self.queued() and self._can_start():
+            lane, waiter = self._next_waiter()
+            if waiter is None:
+                break
+            self._start(lane)
+            waiter.set_result(None)
+
+        # Rate-limited with waiters left: wake up when the next token is due
+        if self.rate and self.queued() and self.active < self.max_concurrency and self._timer is None:
+            delay = max(0.0, (1 - self._tokens) / self.rate)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "enabled": self.enabled,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": {lane: len(q) for lane, q in self._queues.items()},
+            "rate_per_minute": round(self.rate * 60, 1),
+            "tokens": round(self._tokens, 2) if self.rate else None,
+            "granted": dict(self.granted),
+            "shed": dict(self.shed),
+            "retry_after_seconds": self.retry_after(),
+        }
+
+
+QUEUE_DEPTH = REGISTRY.gauge("llm_scheduler_queued", "LLM calls waiting for a scheduler slot.")
+SHED_REQUESTS = REGISTRY.counter(
+    "llm_scheduler_shed_total", "Requests / LLM calls turned away by the LLM scheduler, by lane.", ("lane",))
+
+
+def create_llm_scheduler() -> LLMScheduler:
+    return LLMScheduler(
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+        rate_per_minute=float(os.getenv("LLM_RATE_PER_MINUTE", "0")),
+        burst=int(os.getenv("LLM_RATE_BURST", "10")),
+        max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+        max_wait=float(os.getenv("LLM_MAX_WAIT_SECONDS", "30")),
+        enabled=os.getenv("LLM_SCHEDULER", "1") == "1",
+    )
+
+
+_default_scheduler = None
+
+
+def get_default_scheduler() -> LLMScheduler:
+    """One scheduler per process: every wrapper shares the same slots and quota."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = create_llm_scheduler()
+    return _default_scheduler
@@ -0,0 +1,563 @@
+# llm_transport.py
+# Pluggable transport under the Gemini wrappers: live, record, replay, synthetic
+#
+#   LLM_TRANSPORT=live        real Gemini (default)
+#   LLM_TRANSPORT=record      real Gemini, every reply appended to LLM_CASSETTE
+#   LLM_TRANSPORT=replay      replies served from LLM_CASSETTE, no network
+#   LLM_TRANSPORT=synthetic   rule-based fake replies with sampled latency, no network
+#
+# Stdlib only (google.generativeai is imported for live / record). The two
+# services deploy separately, so this file exists twice —
+# backend-rural/llm_transport.py and sw-backend/python/llm_transport.py —
+# and the copies must stay identical (tests/test_llm_transport_copy.py).
+
+import os
+import sys
+import json
+import time
+import math
+import random
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+
+
+DEFAULT_CASSETTE = os.path.join("cassettes", "default.jsonl")
+
+
+class CassetteMissError(RuntimeError):
+    """Replay mode: no recorded reply for this request."""
+
+
+class SyntheticLLMError(RuntimeError):
+    """Injected failure (LLM_SYNTH_ERROR_RATE)."""
+
+
+# -----------------------------------------------------------
+# Request helpers
+# -----------------------------------------------------------
+def _config_value(config, name, default=None):
+    if config is None:
+        return default
+    if isinstance(config, dict):
+        return config.get(name, default)
+    return getattr(config, name, default)
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    return json.dumps(contents, default=str, ensure_ascii=False, sort_keys=True)
+
+
+def request_fingerprint(model_name, system_instruction, contents, generation_config) -> str:
+    payload = json.dumps([
+        model_name,
+        system_instruction or "",
+        _prompt_text(contents),
+        _config_value(generation_config, "temperature"),
+        _config_value(generation_config, "max_output_tokens"),
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# -----------------------------------------------------------
+# Response objects (the parts of GenerateContentResponse the callers read)
+# -----------------------------------------------------------
+class TransportResponse:
+    def __init__(self, text: str, prompt_tokens: int = 0):
+        self.text = text
+        self.candidates = [SimpleNamespace(
+            content=SimpleNamespace(parts=[SimpleNamespace(text=text)]),
+            finish_reason=1,
+        )]
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=len(text) // 4,
+            total_token_count=prompt_tokens + len(text) // 4,
+        )
+        self.prompt_feedback = None
+
+
+class _StreamResponse:
+    """
+    stream=True result: iterable (sync) / async-iterable of chunk
+    responses, with usage_metadata of the whole reply like Gemini's.
+    """
+
+    def __init__(self, chunks, delays, prompt_tokens: int):
+        self._chunks = chunks
+        self._delays = delays
+        self.text = "".join(chunks)
+        self.usage_metadata = TransportResponse(self.text, prompt_tokens).usage_metadata
+
+    def __iter__(self):
+        for chunk, delay in zip(self._chunks, self._delays):
+            if delay:
+                time.sleep(delay)
+            yield TransportResponse(chunk)
+
+    async def __aiter__(self):
+        for chunk, delay in zip(self._chunks, self._delays):
+            if delay:
+                await asyncio.sleep(delay)
+            yield TransportResponse(chunk)
+
+
+def _split_chunks(text: str, size: int = 40) -> list:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def _stream_delays(latency: float, n: int) -> list:
+    """First chunk after ~35% of the latency (time to first token), the rest spread evenly."""
+    if n <= 1:
+        return [latency]
+    first = 0.35 * latency
+    return [first] + [(latency - first) / (n - 1)] * (n - 1)
+
+
+# -----------------------------------------------------------
+# Latency distributions: "lognormal:median,sigma", "normal:mean,sd",
+# "uniform:low,high", "const:seconds"
+# -----------------------------------------------------------
+class LatencyModel:
+    def __init__(self, spec: str):
+        kind, _, args = (spec or "const:0").partition(":")
+        self.kind = kind.strip().lower()
+        self.args = [float(a) for a in args.split(",") if a.strip()]
+        if self.kind not in ("lognormal", "normal", "uniform", "const"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        a = self.args
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(a[0]), a[1] if len(a) > 1 else 0.5)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(a[0], a[1] if len(a) > 1 else 0.0))
+        if self.kind == "uniform":
+            return rng.uniform(a[0], a[1])
+        return a[0] if a else 0.0
+
+
+# -----------------------------------------------------------
+# Synthetic replies: one rule per prompt family, shaped so the real
+# parsers accept them (JSON guardrails, 5-section advice, MDT replies)
+# -----------------------------------------------------------
+_SYMPTOM_WORDS = (
+    "fever", "cough", "headache", "body ache", "vomiting", "diarrhea", "nausea", "rash", "itching",
+    "chest pain", "breathlessness", "shortness of breath", "abdominal pain", "stomach pain", "dizziness",
+    "fatigue", "weakness", "sore throat", "runny nose", "jaundice", "swelling", "back pain", "joint pain",
+    "burning urination", "seizure", "unconscious", "bleeding", "wound", "chills", "loss of appetite",
+)
+_HIGH_WORDS = ("unconscious", "seizure", "chest pain", "not breathing", "severe bleeding", "fainted")
+_MEDIUM_WORDS = ("week", "jaundice", "swelling", "breathlessness", "shortness of breath", "blood", "vomiting")
+_SLOT_QUESTIONS = (
+    "How many days have you had these symptoms?",
+    "How severe are these symptoms on a scale of 1 to 10?",
+    "At what time of day are these symptoms worst?",
+    "Are these symptoms getting better, worse or staying the same?",
+    "Does anything trigger or relieve these symptoms?",
+    "Where exactly do you feel these symptoms?",
+)
+_SPECIALISTS = ("infectious_disease_specialist", "pulmonologist", "gastroenterologist",
+                "cardiologist", "neurologist", "dermatologist")
+_IMPRESSIONS = ("likely viral infection", "possible bacterial infection", "probable inflammatory cause")
+
+
+def _patient_text(prompt: str) -> str:
+    """The quoted case text inside a prompt (the criteria blocks also mention symptoms)."""
+    for label in ("description (vitals, initial and adaptive symptoms): '", "description: '",
+                  "Patient text: '", 'USER_INPUT: "', "Context: '''", "Extract key symptoms from:\n"):
+        start = prompt.find(label)
+        if start != -1:
+            start += len(label)
+            end = prompt.find("\n", start) if label.endswith("\n") else prompt.find(label[-1] + "\n", start)
+            return prompt[start:end if end != -1 else None]
+    return prompt
+
+
+def _symptoms(text: str) -> list:
+    low = text.lower()
+    return [w for w in _SYMPTOM_WORDS if w in low] or ["general discomfort"]
+
+
+def _complexity(text: str) -> str:
+    low = text.lower()
+    if any(w in low for w in _HIGH_WORDS):
+        return "high"
+    if any(w in low for w in _MEDIUM_WORDS) or len(_symptoms(low)) >= 4:
+        return "medium"
+    return "low"
+
+
+def _intake_verdict(prompt: str) -> dict:
+    text = _patient_text(prompt).lower()
+    if any(w in text for w in _SYMPTOM_WORDS) or len(text.split()) >= 4:
+        return {"is_valid": True, "reason": "symptoms described"}
+    return {"is_valid": False, "reason": "no clinical symptoms described"}
+
+
+def _sections(summary: str, medicines: str) -> str:
+    return (
+        f"CONDITION SUMMARY:\n{summary}\n\n"
+        "POSSIBLE CAUSES:\n- Viral infection\n- Dehydration\n\n"
+        "NURSE ACTIONS:\n- Record vitals every 4 hours\n- Encourage oral fluids and rest\n- Keep the patient comfortable\n\n"
+        "ESCALATION CRITERIA:\n- SpO₂ below 92% or breathing difficulty\n- Confusion or persistent vomiting\n\n"
+        f"MEDICINES ADVISED:\n{medicines}\n"
+    )
+
+
+def _followup(prompt, rng):
+    asked = prompt.rsplit("Previously asked:", 1)[-1].lower()
+    for q in _SLOT_QUESTIONS:
+        if q.lower().rstrip("?") not in asked:
+            return q
+    return "no further questions."
+
+
+def _specialist_turn(prompt, rng):
+    return (
+        f"IMPRESSION: {rng.choice(_IMPRESSIONS)} given the reported symptoms.\n"
+        "POSSIBLE CAUSES: viral illness, early bacterial infection.\n"
+        "NURSE ACTIONS: monitor temperature and SpO₂, oral fluids, rest.\n"
+        "ESCALATION CRITERIA: SpO₂ below 92%, altered sensorium, persistent high fever.\n"
+        f"Confidence: {rng.randint(2, 5)}/5"
+    )
+
+
+def _triage(prompt, rng):
+    text = _patient_text(prompt)
+    return json.dumps({"symptoms": _symptoms(text), "possible_diseases": ["viral fever", "upper respiratory infection"],
+                       "complexity": _complexity(text)})
+
+
+SYNTHETIC_RULES = [
+    # (marker in prompt, name, reply(prompt, rng), default latency)
+    ("STEP 2 — Only if is_valid", "fused_intake",
+     lambda p, rng: json.dumps(dict(_intake_verdict(p), questions=list(_SLOT_QUESTIONS[:3]))),
+     "lognormal:0.9,0.35"),
+    ("medical intake guardrail AI", "guardrail_first",
+     lambda p, rng: json.dumps(_intake_verdict(p)), "lognormal:0.6,0.35"),
+    ("strict medical triage guardrail AI", "guardrail_answer",
+     lambda p, rng: json.dumps({"is_relevant": True, "introduces_new_symptom": False, "reason": "answers the question"}),
+     "lognormal:0.6,0.35"),
+    ("Ask ONE follow-up question", "followup", _followup, "lognormal:0.8,0.35"),
+    ('"possible_diseases"', "triage", _triage, "lognormal:1.2,0.4"),
+    ("classifies patient cases into one of three levels", "complexity",
+     lambda p, rng: _complexity(_patient_text(p)), "lognormal:0.9,0.4"),
+    ("Extract ONLY the symptoms", "shortlist",
+     lambda p, rng: ", ".join(_symptoms(_patient_text(p))), "lognormal:0.8,0.35"),
+    ("Extract key symptoms from", "mdt_symptoms",
+     lambda p, rng: ", ".join(_symptoms(_patient_text(p))), "lognormal:0.8,0.35"),
+    ("Return names only, comma-separated", "mdt_specialists",
+     lambda p, rng: ", ".join(rng.sample(_SPECIALISTS, 3)), "lognormal:0.8,0.35"),
+    ("an MDT specialist", "mdt_turn", _specialist_turn, "lognormal:2.5,0.4"),
+    ("Summarize this MDT discussion", "mdt_summary",
+     lambda p, rng: _sections("- Likely viral infection; specialists agree on supportive care.",
+                              "- Paracetamol (for fever)\n- ORS solution"), "lognormal:4.0,0.4"),
+    ("Primary Care Physician", "pcp",
+     lambda p, rng: _sections("Mild, self-limiting illness.", "- Doctor may consider Paracetamol\n- ORS solution"),
+     "lognormal:4.0,0.4"),
+    ("clinical simplification AI", "simplify",
+     lambda p, rng: _sections("Mild illness, likely to improve.", "- Paracetamol\n- ORS solution"), "lognormal:3.0,0.4"),
+    ("Rewrite the following MDT content", "simplify",
+     lambda p, rng: _sections("Likely viral infection.", "- Paracetamol\n- ORS solution"), "lognormal:3.0,0.4"),
+    ("numbered, patient-friendly questions", "stage_questions",
+     lambda p, rng: "Q1. How long have you had this?\nQ2. Is it itchy or painful?\nQ3. Has it spread to other areas?",
+     "lognormal:1.5,0.4"),
+    ("diagnostic questions", "stage_questions",
+     lambda p, rng: "Q1. How did the wound happen?\nQ2. Is there any discharge or bad smell?\nQ3. How painful is it from 1 to 10?",
+     "lognormal:1.5,0.4"),
+    ("structured medical report", "stage_report",
+     lambda p, rng: "1. Most Likely Diagnosis: mild eczema\n2. Clinical Reasoning: dry itchy patches\n"
+                    "3. Recommended Action: moisturise, avoid irritants\n4. Red Flags: spreading redness, fever\n"
+                    "5. Disclaimer: AI-generated, confirm clinically\n6. Medicines: moisturiser twice daily", "lognormal:3.0,0.4"),
+    ("wound-care report", "stage_report",
+     lambda p, rng: "1. Final Wound Diagnosis: superficial abrasion\n2. Clinical Reasoning: clean shallow wound\n"
+                    "3. Care & Dressing Instructions: saline wash, clean dressing daily\n4. Red Flags: pus, spreading redness, fever\n"
+                    "5. Disclaimer: AI-generated, confirm clinically\n6. Medicines: povidone-iodine for minor local use",
+     "lognormal:3.0,0.4"),
+]
+
+
+class SyntheticResponder:
+    """Picks the first rule whose marker is in the prompt; unknown prompts get a short generic reply."""
+
+    def __init__(self, rng: random.Random, latency_override: str = None, scale: float = 1.0):
+        self.rng = rng
+        self.override = LatencyModel(latency_override) if latency_override else None
+        self.scale = scale
+        self._latency = {}
+
+    def respond(self, prompt: str):
+        for marker, name, reply, latency in SYNTHETIC_RULES:
+            if marker in prompt:
+                return reply(prompt, self.rng), self._sample(name, latency)
+        return "Noted.", self._sample("default", "lognormal:1.0,0.4")
+
+    def _sample(self, name, spec) -> float:
+        model = self.override or self._latency.get(name)
+        if model is None:
+            model = self._latency[name] = LatencyModel(spec)
+        return model.sample(self.rng) * self.scale
+
+
+# -----------------------------------------------------------
+# Cassettes (JSONL, one recorded reply per line)
+# -----------------------------------------------------------
+class Cassette:
+    """
+    Replies are keyed by request_fingerprint(). The same request asked
+    several times is replayed in recorded order (and then repeats the
+    last reply), so a replayed run is deterministic.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries = {}
+        self._served = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+
+    def __len__(self):
+        return sum(len(v) for v in self._entries.values())
+
+    def next(self, key: str):
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            i = self._served.get(key, 0)
+            self._served[key] = i + 1
+            return entries[min(i, len(entries) - 1)]
+
+    def append(self, entry: dict):
+        with self._lock:
+            self._entries.setdefault(entry["key"], []).append(entry)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+# -----------------------------------------------------------
+# Models: same calls as genai.GenerativeModel
+# -----------------------------------------------------------
+class _OfflineModel:
+    """Base for replay / synthetic: subclasses implement _reply(prompt, key) -> (text, chunks, latency)."""
+
+    def __init__(self, transport, model_name: str, system_instruction=None):
+        self.transport = transport
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def _prepare(self, contents, generation_config, stream):
+        prompt = _prompt_text(contents)
+        key = request_fingerprint(self.model_name, self.system_instruction, contents, generation_config)
+        text, chunks, latency = self._reply(prompt, key)
+        prompt_tokens = (len(prompt) + len(self.system_instruction or "")) // 4
+        if stream:
+            chunks = chunks or _split_chunks(text)
+            return latency, _StreamResponse(chunks, _stream_delays(latency, len(chunks)), prompt_tokens)
+        return latency, TransportResponse(text, prompt_tokens)
+
+    def generate_content(self, contents, generation_config=None, safety_settings=None, stream=False, **kwargs):
+        latency, response = self._prepare(contents, generation_config, stream)
+        if not stream and latency:
+            time.sleep(latency)
+        return response
+
+    async def generate_content_async(self, contents, generation_config=None, safety_settings=None, stream=False, **kwargs):
+        latency, response = self._prepare(contents, generation_config, stream)
+        if not stream and latency:
+            await asyncio.sleep(latency)
+        return response
+
+
+class SyntheticModel(_OfflineModel):
+    def _reply(self, prompt, key):
+        return self.transport.synthesize(prompt)
+
+
+class ReplayModel(_OfflineModel):
+    def _reply(self, prompt, key):
+        t = self.transport
+        entry = t.cassette.next(key)
+        if entry is not None:
+            return entry["text"], entry.get("chunks"), entry.get("latency", 0.0) * t.speed
+        if t.replay_miss == "synthetic":
+            return t.synthesize(prompt)
+        raise CassetteMissError(f"No recorded reply in {t.cassette.path} for: {prompt[:80]!r}")
+
+
+class _RecordedStream:
+    """Passes a live stream through and writes it to the cassette once it is fully read."""
+
+    def __init__(self, response, on_done):
+        self._response = response
+        self._on_done = on_done
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        try:
+            return chunk.text or ""
+        except (ValueError, AttributeError):
+            return ""
+
+    def __iter__(self):
+        chunks = []
+        for chunk in self._response:
+            chunks.append(self._chunk_text(chunk))
+            yield chunk
+        self._on_done(chunks)
+
+    async def __aiter__(self):
+        chunks = []
+        async for chunk in self._response:
+            chunks.append(self._chunk_text(chunk))
+            yield chunk
+        self._on_done(chunks)
+
+
+class RecordingModel:
+    def __init__(self, transport, model_name: str, system_instruction=None):
+        import google.generativeai as genai
+        self.transport = transport
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self._model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+    def _save(self, contents, generation_config, started, text, chunks=None):
+        self.transport.cassette.append({
+            "key": request_fingerprint(self.model_name, self.system_instruction, contents, generation_config),
+            "model": self.model_name,
+            "prompt_preview": _prompt_text(contents)[:160],
+            "text": text,
+            "chunks": chunks,
+            "latency": round(time.perf_counter() - started, 3),
+        })
+
+    def _finish(self, contents, generation_config, stream, started, response):
+        if stream:
+            return _RecordedStream(response, lambda chunks: self._save(
+                contents, generation_config, started, "".join(chunks), chunks))
+        try:
+            text = response.text
+        except ValueError:
+            return response  # blocked / empty reply: nothing worth replaying
+        self._save(contents, generation_config, started, text)
+        return response
+
+    def generate_content(self, contents, generation_config=None, safety_settings=None, stream=False, **kwargs):
+        started = time.perf_counter()
+        response = self._model.generate_content(contents, generation_config=generation_config,
+                                                safety_settings=safety_settings, stream=stream, **kwargs)
+        return self._finish(contents, generation_config, stream, started, response)
+
+    async def generate_content_async(self, contents, generation_config=None, safety_settings=None, stream=False, **kwargs):
+        started = time.perf_counter()
+        response = await self._model.generate_content_async(contents, generation_config=generation_config,
+                                                            safety_settings=safety_settings, stream=stream, **kwargs)
+        return self._finish(contents, generation_config, stream, started, response)
+
+
+# -----------------------------------------------------------
+# Transport (one per process, from env)
+# -----------------------------------------------------------
+class LLMTransport:
+    MODES = ("live", "record", "replay", "synthetic")
+
+    def __init__(self, mode: str = "live", cassette_path: str = DEFAULT_CASSETTE, replay_miss: str = "error",
+                 replay_speed: float = 0.0, latency: str = None, latency_scale: float = 1.0,
+                 seed: int = None, error_rate: float = 0.0):
+        if mode not in self.MODES:
+            raise ValueError(f"LLM_TRANSPORT must be one of {self.MODES}, got {mode!r}")
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.error_rate = error_rate
+        self.responder = SyntheticResponder(self.rng, latency, latency_scale)
+        self.cassette = Cassette(cassette_path) if mode in ("record", "replay") else None
+        self.speed = replay_speed
+        self.replay_miss = replay_miss
+        if mode != "live":
+            # stderr: the sw-backend stage scripts answer with JSON on stdout
+            print(f"🧪 LLM transport: {mode}" + (f" ({cassette_path}, {len(self.cassette)} recorded)" if self.cassette is not None else ""),
+                  file=sys.stderr)
+
+    def synthesize(self, prompt: str):
+        """(text, chunks, latency) for a synthetic reply; may raise an injected failure."""
+        with self.lock:
+            text, latency = self.responder.respond(prompt)
+            failed = self.error_rate and self.rng.random() < self.error_rate
+        if failed:
+            raise SyntheticLLMError("Synthetic LLM failure (LLM_SYNTH_ERROR_RATE)")
+        return text, None, latency
+
+    @property
+    def needs_api_key(self) -> bool:
+        return self.mode in ("live", "record")
+
+    def configure(self, api_key: str):
+        if self.needs_api_key:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+
+    def model(self, model_name: str, system_instruction=None):
+        if self.mode == "live":
+            import google.generativeai as genai
+            return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        if self.mode == "record":
+            return RecordingModel(self, model_name, system_instruction)
+        if self.mode == "replay":
+            return ReplayModel(self, model_name, system_instruction)
+        return SyntheticModel(self, model_name, system_instruction)
+
+
+def create_transport() -> LLMTransport:
+    seed = os.getenv("LLM_SYNTH_SEED")
+    return LLMTransport(
+        mode=os.getenv("LLM_TRANSPORT", "live").strip().lower(),
+        cassette_path=os.getenv("LLM_CASSETTE", DEFAULT_CASSETTE),
+        replay_miss=os.getenv("LLM_REPLAY_MISS", "error"),
+        replay_speed=float(os.getenv("LLM_REPLAY_SPEED", "0")),
+        latency=os.getenv("LLM_SYNTH_LATENCY") or None,
+        latency_scale=float(os.getenv("LLM_SYNTH_LATENCY_SCALE", "1.0")),
+        seed=int(seed) if seed else None,
+        error_rate=float(os.getenv("LLM_SYNTH_ERROR_RATE", "0")),
+    )
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_transport() -> LLMTransport:
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = create_transport()
+        return _default_transport
+
+
+def create_model(model_name: str, system_instruction=None):
+    """Drop-in for genai.GenerativeModel(model_name, system_instruction=...)."""
+    return get_transport().model(model_name, system_instruction)
+
+
+def configure(api_key: str):
+    """Drop-in for genai.configure(api_key=...); a no-op offline."""
+    get_transport().configure(api_key)
+
+
+def requires_api_key() -> bool:
+    """False for replay / synthetic runs, which never reach Gemini."""
+    return get_transport().needs_api_key
@@ -0,0 +1,269 @@
+# metrics.py
+# In-process Prometheus-style metrics (text exposition format, no client library needed)
+
+import time
+import bisect
+import threading
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+SIZE_BUCKETS = (100, 300, 1000, 3000, 10000, 30000, 100000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base: one lock-protected dict of label-values tuple -> state."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items
+        ]
+
+
+class Gauge(Counter):
+    """
+    Settable value. With `collect`, the value is read at scrape time
+    instead (e.g. circuit breaker state), so nothing is paid per request.
+    Keep collect cheap: it runs on every scrape.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels=(), collect=None):
+        super().__init__(name, help_text, labels)
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> list:
+        if self.collect is not None:
+            try:
+                self.set(self.collect())
+            except Exception as e:
+                print(f"⚠️ metrics: could not collect {self.name}: {e}")
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts + [sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), [0.0, 0]]
+            state[0][i] += 1
+            state[1][0] += value
+            state[1][1] += 1
+
+    def mean(self, **labels):
+        """Average observed value for these labels (None before the first sample)."""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[1][0] / state[1][1] if state else None
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((k, (list(s[0]), list(s[1]))) for k, s in self._values.items())
+        lines = self._header()
+        bounds = self.buckets + (float("inf"),)
+        for key, (counts, (total, count)) in items:
+            running = 0
+            for bound, c in zip(bounds, counts):
+                running += c
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "ayu_"):
+        self.prefix = prefix
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(self.prefix + name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), collect=None):
+        return self._add(Gauge(self.prefix + name, help_text, labels, collect))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self.prefix + name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# -----------------------------------------------------------
+# LLM call instrumentation (shared by both Gemini wrappers)
+# -----------------------------------------------------------
+def site_label(call_site) -> str:
+    return call_site or "unlabelled"
+
+
+class LLMMetrics:
+    """
+    One object per process, labelled by call_site
+    (guardrail_first, followup, shortlist, complexity, pcp, mdt_turn, ...).
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        labels = ("call_site",)
+        self.requests = registry.counter(
+            "llm_requests_total", "LLM calls by call site and outcome (ok, fallback, cached, circuit_open, shed, partial).",
+            ("call_site", "outcome"))
+        self.retries = registry.counter(
+            "llm_retries_total", "Failed LLM attempts that were retried.", labels)
+        self.failures = registry.counter(
+            "llm_failures_total", "LLM calls that exhausted every attempt.", labels)
+        self.latency = registry.histogram(
+            "llm_latency_seconds", "Wall time of an LLM call including retries.", labels)
+        self.prompt_chars = registry.histogram(
+            "llm_prompt_chars", "Prompt size in characters.", labels, SIZE_BUCKETS)
+        self.output_chars = registry.histogram(
+            "llm_output_chars", "Reply size in characters.", labels, SIZE_BUCKETS)
+        self.prompt_tokens = registry.counter(
+            "llm_prompt_tokens_total", "Prompt tokens reported by Gemini usage metadata.", labels)
+        self.output_tokens = registry.counter(
+            "llm_output_tokens_total", "Output tokens reported by Gemini usage metadata.", labels)
+        self.hedges = registry.counter(
+            "llm_hedges_total", "Hedged LLM requests by call site (fired, won = duplicate answered first).",
+            ("call_site", "outcome"))
+
+    def cached(self, call_site):
+        self.requests.inc(call_site=site_label(call_site), outcome="cached")
+
+    def short_circuited(self, call_site):
+        self.requests.inc(call_site=site_label(call_site), outcome="circuit_open")
+
+    def retry(self, call_site):
+        self.retries.inc(call_site=site_label(call_site))
+
+    def success(self, call_site, started: float, prompt: str, reply: str, response=None):
+        site = site_label(call_site)
+        self.requests.inc(call_site=site, outcome="ok")
+        self.latency.observe(time.perf_counter() - started, call_site=site)
+        self.prompt_chars.observe(len(prompt), call_site=site)
+        self.output_chars.observe(len(reply), call_site=site)
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.prompt_tokens.inc(getattr(usage, "prompt_token_count", 0) or 0, call_site=site)
+            self.output_tokens.inc(getattr(usage, "candidates_token_count", 0) or 0, call_site=site)
+
+    def failure(self, call_site, started: float, prompt: str, outcome: str = "fallback"):
+        site = site_label(call_site)
+        self.requests.inc(call_site=site, outcome=outcome)
+        self.failures.inc(call_site=site)
+        self.latency.observe(time.perf_counter() - started, call_site=site)
+        self.prompt_chars.observe(len(prompt), call_site=site)
+
+
+# -----------------------------------------------------------
+# HTTP instrumentation (pure ASGI: no per-request task/queue)
+# -----------------------------------------------------------
+class MetricsMiddleware:
+    """
+    Records request latency per route template ("/api/next_question"),
+    method and status. Paths that match no route are folded into
+    "unmatched" so random URLs cannot blow up label cardinality.
+    Websockets are tracked by the handlers (active cases gauge).
+    """
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.histogram.observe(
+                time.perf_counter() - started,
+                method=scope.get("method", ""),
+                path=getattr(route, "path", "unmatched"),
+                status=status["code"],
+            )
+
+
+REGISTRY = MetricsRegistry()
+LLM_METRICS = LLMMetrics(REGISTRY)
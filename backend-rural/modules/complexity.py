@@ -1,97 +1,154 @@
 # modules/complexity.py
 
+from modules.llm_async import to_async
+from modules.red_flags import RedFlagEngine
+
+
+# Age-stratified low / medium / high criteria, shared with the fused
+# triage-analysis prompt (modules/triage_analysis.py)
+COMPLEXITY_CRITERIA = (
+    "1. Low Complexity\n"
+    "- Mild, self-limiting, or common symptoms.\n"
+    "- Normal or near-normal vitals.\n"
+    "- Can be managed by a general practitioner or teleconsultation.\n"
+    "- Examples: Mild fever, sore throat, cold, mild headache, diarrhea without dehydration, minor rash.\n\n"
+
+    "2. Medium Complexity\n"
+    "- Requires multidisciplinary review or diagnostic clarification.\n"
+    "- Symptoms overlap between multiple body systems or indicate involvement of different specialists "
+    "(e.g., cardiologist + gastroenterologist).\n"
+    "- Moderate vital abnormalities but patient stable.\n"
+    "- Duration prolonged (e.g., fever > 5 days).\n"
+    "- Examples: Fever with mild shortness of breath and abdominal pain; persistent cough with fatigue and loss of appetite; "
+    "suspected infection, autoimmune, or metabolic disorder requiring investigations.\n\n"
+
+    "3. High Complexity\n"
+    "- Potentially life-threatening or emergency cases requiring immediate referral or hospital care.\n"
+    "- Triggered by severely abnormal vitals or critical symptoms (see age-group specifics below).\n\n"
+
+    " For Children (0-14 years)\n"
+    "- Neonatal disorders: difficulty breathing (grunting, flaring nostrils, chest retractions), poor feeding/not waking for feeds, "
+    "fever > 100.4°F (38°C) or low temp < 97.5°F (36.5°C), lethargy/floppiness, skin color changes (jaundice, pale, blue/gray).\n"
+    "- Diarrhea / LRI: frequent watery stools (≥3/day), signs of dehydration (sunken eyes/fontanelle, dry mouth, few wet diapers), "
+    "lower respiratory infection signs (fast/shallow breathing, wheezing, persistent cough, chest retractions).\n\n"
+
+    " For Young Adults (15 - 39 years)\n"
+    "- Cardiovascular red flags: chest pain (pressure/squeezing/tightness), pain radiating to arm/jaw/neck/back/upper stomach, "
+    "sudden shortness of breath, dizziness/fainting, cold sweat, extreme unexplained fatigue.\n\n"
+
+    " For Adults (40 - 69 years)\n"
+    "- Higher cardiovascular risk: presentations as above, including atypical symptoms.\n"
+    "- Cancer red flags: persistent cough, hemoptysis, unexplained weight loss, lumps/ulcers > 3 weeks, abnormal bleeding.\n"
+    "- Chronic respiratory disease: chronic cough with mucus, exertional dyspnea, recurrent chest infections, wheezing.\n\n"
+
+    " For Seniors (70+ years)\n"
+    "- Cardiovascular: atypical or “silent” heart attacks (fatigue, dyspnea, indigestion, jaw/back/shoulder pain, dizziness).\n"
+    "- Chronic respiratory disease: progressive cough, dyspnea, wheezing (often severe).\n"
+    "- Neurological emergencies: stroke (F.A.S.T. — facial droop, arm drift, slurred speech) and acute confusion/delirium.\n\n"
+
+    "Guidelines:\n"
+    "- Base reasoning strictly on provided symptoms and vitals — do not invent data.\n"
+    "- Consider overlaps: if symptoms indicate multiple systems or specialists → choose Medium.\n"
+    "- If severe, red-flag, or emergency features as listed → choose High.\n"
+    "- When uncertain, always choose the higher category.\n\n"
+)
+
+
 class ComplexityAssessor:
     """
     Dynamically assesses case complexity using Gemini LLM + fallback logic.
     """
 
-    def __init__(self, llm_generate_reply=None):
+    def __init__(self, llm_generate_reply=None, allm_generate_reply=None, red_flags=None):
         self.llm_generate_reply = llm_generate_reply
+        self.allm_generate_reply = allm_generate_reply or to_async(llm_generate_reply)
+        # Unambiguous emergencies are classified locally, before any LLM call
+        self.red_flags = red_flags or RedFlagEngine()
 
-    def assess(self, symptom_summary: dict) -> str:
-        patient_text = symptom_summary.get("raw_text", "").lower()
-        symptoms = symptom_summary.get("symptoms", [])
-
-        print("final symptoms went to complexity assessor:")
-        print(patient_text)
-
-        # --- Step 1: Try Gemini AI-based reasoning ---
-        if self.llm_generate_reply:
-            prompt = (
+    def _prompt(self, patient_text: str) -> str:
+        return (
             "Role:\n"
             "You are a clinical triage AI assistant that classifies patient cases into one of three levels of complexity "
             "based on vitals, symptoms, and nurse observations.\n\n"
-        
+
             "Input Provided:\n"
             "- Vitals: Temperature, Pulse, Blood Pressure, SpO₂, Respiratory Rate, etc.\n"
             "- Initial and adaptive symptoms from the nurse.\n"
             "- Patient's age group (Child, Young Adult, Adult, or Senior).\n"
             f"- Free-text patient/nurse description: '{patient_text}'\n\n"
-        
+
             "Your Task:\n"
             "Analyze the details carefully and classify the case into one of these categories: low, medium, or high.\n\n"
-        
-            "1. Low Complexity\n"
-            "- Mild, self-limiting, or common symptoms.\n"
-            "- Normal or near-normal vitals.\n"
-            "- Can be managed by a general practitioner or teleconsultation.\n"
-            "- Examples: Mild fever, sore throat, cold, mild headache, diarrhea without dehydration, minor rash.\n\n"
-        
-            "2. Medium Complexity\n"
-            "- Requires multidisciplinary review or diagnostic clarification.\n"
-            "- Symptoms overlap between multiple body systems or indicate involvement of different specialists "
-            "(e.g., cardiologist + gastroenterologist).\n"
-            "- Moderate vital abnormalities but patient stable.\n"
-            "- Duration prolonged (e.g., fever > 5 days).\n"
-            "- Examples: Fever with mild shortness of breath and abdominal pain; persistent cough with fatigue and loss of appetite; "
-            "suspected infection, autoimmune, or metabolic disorder requiring investigations.\n\n"
-        
-            "3. High Complexity\n"
-            "- Potentially life-threatening or emergency cases requiring immediate referral or hospital care.\n"
-            "- Triggered by severely abnormal vitals or critical symptoms (see age-group specifics below).\n\n"
-        
-            " For Children (0-14 years)\n"
-            "- Neonatal disorders: difficulty breathing (grunting, flaring nostrils, chest retractions), poor feeding/not waking for feeds, "
-            "fever > 100.4°F (38°C) or low temp < 97.5°F (36.5°C), lethargy/floppiness, skin color changes (jaundice, pale, blue/gray).\n"
-            "- Diarrhea / LRI: frequent watery stools (≥3/day), signs of dehydration (sunken eyes/fontanelle, dry mouth, few wet diapers), "
-            "lower respiratory infection signs (fast/shallow breathing, wheezing, persistent cough, chest retractions).\n\n"
-        
-            " For Young Adults (15 - 39 years)\n"
-            "- Cardiovascular red flags: chest pain (pressure/squeezing/tightness), pain radiating to arm/jaw/neck/back/upper stomach, "
-            "sudden shortness of breath, dizziness/fainting, cold sweat, extreme unexplained fatigue.\n\n"
-        
-            " For Adults (40 - 69 years)\n"
-            "- Higher cardiovascular risk: presentations as above, including atypical symptoms.\n"
-            "- Cancer red flags: persistent cough, hemoptysis, unexplained weight loss, lumps/ulcers > 3 weeks, abnormal bleeding.\n"
-            "- Chronic respiratory disease: chronic cough with mucus, exertional dyspnea, recurrent chest infections, wheezing.\n\n"
-        
-            " For Seniors (70+ years)\n"
-            "- Cardiovascular: atypical or “silent” heart attacks (fatigue, dyspnea, indigestion, jaw/back/shoulder pain, dizziness).\n"
-            "- Chronic respiratory disease: progressive cough, dyspnea, wheezing (often severe).\n"
-            "- Neurological emergencies: stroke (F.A.S.T. — facial droop, arm drift, slurred speech) and acute confusion/delirium.\n\n"
-        
-            "Guidelines:\n"
-            "- Base reasoning strictly on provided symptoms and vitals — do not invent data.\n"
-            "- Consider overlaps: if symptoms indicate multiple systems or specialists → choose Medium.\n"
-            "- If severe, red-flag, or emergency features as listed → choose High.\n"
-            "- When uncertain, always choose the higher category.\n\n"
-        
+
+            f"{COMPLEXITY_CRITERIA}"
+
             "Finally, classify the overall case complexity as one of the following:\n"
             "- low: mild/common, manageable by a general doctor\n"
             "- medium: moderate, chronic, or multi-symptom cases\n"
             "- high: severe, emergency, or life-threatening cases\n\n"
             "IMPORTANT: respond with only one word: low, medium, or high."
-            )
+        )
+
+    def _parse_reply(self, reply):
+        reply = reply.strip().lower() if isinstance(reply, str) else str(reply).strip().lower()
+        if reply in ["low", "medium", "high"]:
+            print(f"(Gemini classified complexity as: {reply})")
+            return reply
+        return None
 
+    def red_flag_level(self, patient_text: str):
+        flags = self.red_flags.detect(patient_text)
+        if flags:
+            print(f"🚨 Red flags: {', '.join(f['name'] for f in flags)} — complexity high (no LLM call)")
+            return "high"
+        return None
+
+    def assess(self, symptom_summary: dict) -> str:
+        patient_text = symptom_summary.get("raw_text", "").lower()
+
+        print("final symptoms went to complexity assessor:")
+        print(patient_text)
+
+        # --- Step 0: Local red-flag rules ---
+        level = self.red_flag_level(patient_text)
+        if level:
+            return level
+
+        # --- Step 1: Try Gemini AI-based reasoning ---
+        if self.llm_generate_reply:
             try:
-                reply = self.llm_generate_reply([{"role": "user", "content": prompt}])
-                reply = reply.strip().lower() if isinstance(reply, str) else str(reply).strip().lower()
-                if reply in ["low", "medium", "high"]:
-                    print(f"(Gemini classified complexity as: {reply})")
-                    return reply
+                reply = self.llm_generate_reply([{"role": "user", "content": self._prompt(patient_text)}], call_site="complexity")
+                level = self._parse_reply(reply)
+                if level:
+                    return level
             except Exception as e:
                 print(f"⚠️ Gemini complexity reasoning failed: {e}")
 
+        return self.fallback_assess(patient_text)
+
+    async def aassess(self, symptom_summary: dict) -> str:
+        """Awaitable twin of assess()."""
+        patient_text = symptom_summary.get("raw_text", "").lower()
+
+        print("final symptoms went to complexity assessor:")
+        print(patient_text)
+
+        level = self.red_flag_level(patient_text)
+        if level:
+            return level
+
+        if self.allm_generate_reply:
+            try:
+                reply = await self.allm_generate_reply([{"role": "user", "content": self._prompt(patient_text)}], call_site="complexity")
+                level = self._parse_reply(reply)
+                if level:
+                    return level
+            except Exception as e:
+                print(f"⚠️ Gemini complexity reasoning failed: {e}")
+
+        return self.fallback_assess(patient_text)
+
+    def fallback_assess(self, patient_text: str) -> str:
         # --- Step 2: Improved fallback logic ---
 
         emergency_terms = ["severe", "bleeding", "unconscious", "stroke", "heart attack", "seizure", "collapsed"]
@@ -0,0 +1,71 @@
+# modules/llm_async.py
+import asyncio
+import inspect
+
+
+def to_async(llm_generate_reply):
+    """
+    Turn a blocking generate_reply(messages) callable into an awaitable one.
+    The call runs in a worker thread so the event loop keeps serving other cases.
+    """
+    if llm_generate_reply is None:
+        return None
+
+    async def _run(messages, **kwargs):
+        return await asyncio.to_thread(llm_generate_reply, messages, **kwargs)
+
+    return _run
+
+
+async def collect_stream(astream_generate, messages, on_delta=None, **kwargs):
+    """
+    Drain an async chunk generator, forwarding each chunk to on_delta
+    (sync or async) and returning the full text.
+    """
+    pieces = []
+    async for chunk in astream_generate(messages, **kwargs):
+        if not chunk:
+            continue
+        pieces.append(chunk)
+        if on_delta:
+            res = on_delta(chunk)
+            if asyncio.iscoroutine(res):
+                await res
+    return "".join(pieces)
+
+
+def drop_unknown_kwargs(llm_callable):
+    """
+    Adapt an externally supplied LLM callable (plain f(messages), async
+    def, or async generator) to the kwargs the pipeline passes
+    (call_site, max_output_tokens, ...): keyword arguments it does not
+    declare are dropped instead of raising TypeError. The signature is
+    inspected once; callables taking **kwargs are returned unchanged.
+    """
+    if llm_callable is None:
+        return None
+    try:
+        params = inspect.signature(llm_callable).parameters.values()
+    except (TypeError, ValueError):
+        return llm_callable
+    if any(p.kind is p.VAR_KEYWORD for p in params):
+        return llm_callable
+    accepted = {p.name for p in params if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)}
+
+    def _filter(kwargs):
+        return {k: v for k, v in kwargs.items() if k in accepted}
+
+    if inspect.isasyncgenfunction(llm_callable):
+        async def _stream(messages, **kwargs):
+            async for chunk in llm_callable(messages, **_filter(kwargs)):
+                yield chunk
+        return _stream
+
+    if inspect.iscoroutinefunction(llm_callable):
+        async def _run(messages, **kwargs):
+            return await llm_callable(messages, **_filter(kwargs))
+        return _run
+
+    def _call(messages, **kwargs):
+        return llm_callable(messages, **_filter(kwargs))
+    return _call
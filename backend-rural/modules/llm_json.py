@@ -0,0 +1,23 @@
+# modules/llm_json.py
+import re
+import json
+
+
+# ✅ Robust JSON extractor for Gemini responses
+def safe_load_json(raw) -> dict:
+    if not isinstance(raw, str):
+        raw = getattr(raw, "text", None) or str(raw)
+
+    cleaned = raw.strip().strip("`").strip()
+    m = re.search(r"\{.*?\}\s*$", cleaned, flags=re.DOTALL)
+    candidate = m.group(0) if m else cleaned
+    try:
+        return json.loads(candidate)
+    except:
+        m2 = re.search(r"\{.*?\}", cleaned, flags=re.DOTALL)
+        if m2:
+            try:
+                return json.loads(m2.group(0))
+            except:
+                pass
+    return {}
@@ -0,0 +1,194 @@
+# modules/red_flags.py
+"""
+Local red-flag rules taken from the age-stratified criteria in
+modules/complexity.py (COMPLEXITY_CRITERIA).
+
+When an unambiguous emergency pattern is present the case is "high"
+without asking Gemini; everything else (the grey zone) still goes to the
+LLM classifier. Rules only look at what the patient / nurse said: the
+follow-up questions stored in the collected text are stripped first, and
+a match preceded by a negation in the same clause ("no chest pain") is
+ignored. Stroke and seizure rules also skip history / controlled mentions
+("history of stroke 5 years ago", "seizures well controlled"), and a bare
+"stroke" only counts with an acute qualifier ("sudden stroke", "stroke
+this morning") — "heat stroke" or "stroke of luck" is not a stroke.
+
+"Acute" means within the last day: "a seizure an hour ago" or "1 day
+ago" fires, "2 days ago" / "3 weeks ago" / "last month" is
+left to the LLM classifier like any other history.
+"""
+
+import re
+
+
+_NEGATION_RE = re.compile(r"\b(no|not|denies|denied|without|never|nil|absent)\b")
+_CLAUSE_BREAK_RE = re.compile(r"[.;,!?|]|\bbut\b")
+
+_SPO2_RE = re.compile(
+    r"\b(?:spo2|sp02|spo₂|o2 sat(?:uration)?|oxygen(?: saturation)?|saturation|sats?)"
+    r"\s*(?:is|of|was|at|:|=|-)?\s*(\d{2,3})\s*%?"
+)
+_BP_RE = re.compile(r"\b(?:bp|blood pressure)\s*(?:is|of|was|:|=|-)?\s*(\d{2,3})\s*/\s*(\d{2,3})")
+
+SPO2_HIGH_THRESHOLD = 92
+SYSTOLIC_HIGH_THRESHOLD = 90
+
+STROKE = r"stroke\b(?! of\b)"   # not "stroke of luck"
+ACUTE_STROKE = (rf"(?:sudden|new|acute|ongoing|suspected|having an?|just had an?) {STROKE}"
+                rf"|{STROKE} (?:now|today|tonight|this morning|just now|right now"
+                r"|(?:an?|\d+) (?:hours?|minutes?|mins?) ago|since (?:morning|last night|\d+ (?:hours?|minutes?|mins?)))")
+
+# More than a day ago → history, not an emergency
+_COUNT = r"(?:\d+|an?|one|two|three|four|five|six|seven|eight|nine|ten|few|a few|several|many)"
+_AGO_PAST = (rf"{_COUNT} (?:weeks?|wks?|months?|years?|yrs?) ago|last (?:week|month|year)"
+             rf"|(?:[2-9]|\d{{2,}}|two|three|four|five|six|seven|eight|nine|ten|few|a few|several|many) days ago")
+
+# In the same clause as a stroke / seizure match: a past or managed condition
+CHRONIC = (r"\b(?:(?:past |family )?history of|h/o|known (?:case of |epileptic)|previous(?:ly)?|residual"
+           rf"|{_AGO_PAST}|well[- ]controlled|controlled (?:on|with)|under control)\b")
+
+CHEST = (r"chest (?:pain|pressure|tightness|heaviness|discomfort)"
+         r"|(?:pain|pressure|tightness|heaviness) (?:in|on) (?:the |my |his |her )?chest")
+
+
+def patient_statements(collected_text: str) -> str:
+    """
+    Collected text is "<initial> | <question>?: <answer> | ...".
+    Keep the initial description and the answers; drop the questions,
+    which mention red flags by design ("Does the pain spread to your arm?").
+    """
+    segments = (collected_text or "").lower().split(" | ")
+    kept = [segments[0]]
+    for seg in segments[1:]:
+        if "?:" in seg:
+            seg = seg.rsplit("?:", 1)[1]
+        elif ": " in seg:
+            seg = seg.split(": ", 1)[1]
+        kept.append(seg)
+    return " | ".join(kept)
+
+
+def _negated(text: str, start: int) -> bool:
+    window = text[max(0, start - 40):start]
+    clause = _CLAUSE_BREAK_RE.split(window)[-1]
+    return bool(_NEGATION_RE.search(clause))
+
+
+def _clause(text: str, m) -> str:
+    before = _CLAUSE_BREAK_RE.split(text[max(0, m.start() - 60):m.start()])[-1]
+    after = _CLAUSE_BREAK_RE.split(text[m.end():m.end() + 60], 1)[0]
+    return before + m.group(0) + after
+
+
+class RedFlagRule:
+    """
+    All patterns must match (un-negated) for the rule to fire. With
+    `exclude`, a match whose clause also matches it is skipped too.
+    """
+
+    __slots__ = ("name", "condition", "patterns", "exclude")
+
+    def __init__(self, name: str, condition: str, *patterns: str, exclude: str = None):
+        self.name = name
+        self.condition = condition
+        self.patterns = [re.compile(p) for p in patterns]
+        self.exclude = re.compile(exclude) if exclude else None
+
+    def _counts(self, text: str, m) -> bool:
+        if _negated(text, m.start()):
+            return False
+        return self.exclude is None or not self.exclude.search(_clause(text, m))
+
+    def match(self, text: str):
+        evidence = []
+        for pattern in self.patterns:
+            hit = next((m for m in pattern.finditer(text) if self._counts(text, m)), None)
+            if hit is None:
+                return None
+            evidence.append(hit.group(0))
+        return " + ".join(evidence)
+
+
+RED_FLAG_RULES = [
+    # Cardiovascular (young adults / adults / seniors)
+    RedFlagRule(
+        "cardiac_radiating", "Possible acute coronary syndrome",
+        CHEST,
+        r"(?:radiat\w*|spread\w*|going|moving|shoot\w*) (?:to|into|down|towards|up to) "
+        r"(?:the |my |his |her |left |right |both )*(?:arms?|jaw|neck|back|shoulders?)",
+    ),
+    RedFlagRule(
+        "cardiac_autonomic", "Possible acute coronary syndrome",
+        CHEST,
+        r"cold sweat\w*|sweating|diaphoresis|clammy|faint\w*|breathless\w*|shortness of breath",
+    ),
+    # Neurological (F.A.S.T.)
+    RedFlagRule(
+        "stroke_fast", "Possible stroke",
+        r"(?:facial|face) (?:droop\w*|deviat\w*)|droop\w* (?:of )?(?:the )?(?:face|mouth)|arm drift"
+        r"|weakness (?:of|in|on) (?:one|the left|the right|left|right) (?:side|arm|leg)"
+        r"|one[- ]sided weakness|slurr\w* (?:of )?speech|speech (?:is )?slurr\w*"
+        r"|(?:can'?t|cannot|unable to) speak|hemipar\w*|" + ACUTE_STROKE,
+        exclude=CHRONIC,
+    ),
+    # Children: neonatal danger signs
+    RedFlagRule(
+        "neonatal_danger", "Neonatal danger signs",
+        r"new-?born|neonat\w*|\b\d{1,2}[- ](?:day|days|week|weeks)[- ]old\b|infant|\bbaby\b",
+        r"grunting|nasal flaring|flaring nostrils|chest (?:retraction|indrawing)\w*"
+        r"|not (?:feeding|sucking|waking)|poor feeding|unable to feed|refus\w* (?:to )?feed"
+        r"|letharg\w*|floppy|convuls\w*|\bfits\b|bluish|\bblue\b|cyanos\w*|cold to touch",
+    ),
+    # Children: diarrhoea with dehydration
+    RedFlagRule(
+        "severe_dehydration", "Severe dehydration",
+        r"diarrh\w*|loose (?:stools?|motions?)|watery stools?|vomit\w*",
+        r"sunken (?:eyes|fontanelle)|no urine|not passing urine|no wet diapers?|few wet diapers?"
+        r"|very dry mouth|skin pinch goes back slowly|(?:unable|not able) to drink",
+    ),
+    # Any age
+    RedFlagRule(
+        "altered_consciousness", "Altered consciousness / seizure",
+        r"unconscious|unresponsive|not responding|collapsed|seiz(?:ure|ing)\w*|convuls\w*"
+        r"|(?:sudden|acute) confusion|delirium",
+        exclude=CHRONIC,
+    ),
+    RedFlagRule(
+        "haemorrhage", "Major bleeding",
+        r"cough\w* (?:up )?blood|blood in (?:the )?(?:cough|sputum)|vomit\w* blood"
+        r"|ha?emoptysis|ha?ematemesis|(?:heavy|severe|profuse|uncontrolled) bleeding",
+    ),
+]
+
+
+class RedFlagEngine:
+    """
+    detect(collected_text) → list of {"name", "condition", "evidence"}.
+    An empty list means "no unambiguous emergency" (not "low risk").
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules or RED_FLAG_RULES
+
+    def _vital_flags(self, text: str) -> list:
+        flags = []
+        for m in _SPO2_RE.finditer(text):
+            value = int(m.group(1))
+            if 50 <= value < SPO2_HIGH_THRESHOLD:
+                flags.append({"name": "hypoxia", "condition": "Hypoxia (low SpO2)", "evidence": m.group(0)})
+                break
+        for m in _BP_RE.finditer(text):
+            systolic = int(m.group(1))
+            if 40 <= systolic < SYSTOLIC_HIGH_THRESHOLD:
+                flags.append({"name": "hypotension", "condition": "Shock / hypotension", "evidence": m.group(0)})
+                break
+        return flags
+
+    def detect(self, collected_text: str) -> list:
+        text = patient_statements(collected_text)
+        flags = self._vital_flags(text)
+        for rule in self.rules:
+            evidence = rule.match(text)
+            if evidence:
+                flags.append({"name": rule.name, "condition": rule.condition, "evidence": evidence})
+        return flags
@@ -0,0 +1,199 @@
+# modules/relevance_rules.py
+"""
+Local fast path for the follow-up answer guardrail.
+
+Short answers such as "3 days", "severe", "only at night" or "yes" are
+clearly relevant — to the right question — so they are accepted here
+without a Gemini call. Each answer part is typed (duration, severity,
+progression, timing, location, trigger, yes/no) and must match a slot the
+question asks about: "severe" answers "How bad is the pain?", not "How
+long have you had it?" or "Do you have a fever?".
+
+The rules only ever ACCEPT: anything they are not sure about (longer
+text, unknown words, a question of no recognised type, possible new
+symptoms, medicine mentions) returns None and escalates to
+check_answer_relevance_with_gemini as before.
+"""
+
+import re
+import threading
+
+
+_NUMBER = r"(\d+(\.\d+)?|a|an|one|two|three|four|five|six|seven|eight|nine|ten|few|a few|couple of|a couple of|several)"
+_UNIT = r"(min(ute)?s?|hours?|hrs?|days?|nights?|weeks?|months?|years?)"
+
+DURATION_RE = re.compile(
+    rf"^((since|for|about|around|almost|nearly|over|more than|less than|past|last)\s+)*"
+    rf"{_NUMBER}\s*(-|to)?\s*{_NUMBER}?\s*{_UNIT}(\s+(ago|now|back|already))?$"
+)
+SINCE_RE = re.compile(
+    r"^(since\s+)?(yesterday|today|this morning|last night|last week|last month|morning|evening|"
+    r"birth|childhood|(\d+|one|two|three|four|five|six|seven)\s+days?\s+back)$"
+)
+SEVERITY_RE = re.compile(
+    r"^((very|quite|really|extremely|little|a little|bit|a bit|slightly|too|so)\s+)*"
+    r"(mild|moderate|severe|bad|intense|unbearable|tolerable|manageable|light|heavy|sharp|dull|"
+    r"throbbing|burning)$"
+)
+SCALE_RE = re.compile(r"^(\d|10)\s*(/\s*10|out of 10|on 10)?$")
+PROGRESSION_RE = re.compile(
+    r"^((getting|got|feels?|it is|its|it's|much|a bit|slightly)\s+)*"
+    r"(worse|better|improved|improving|same|worsened|worsening|unchanged|no change|stable|"
+    r"increasing|decreasing|reduced)$"
+)
+PATTERN_RE = re.compile(
+    r"^((mostly|usually|only|almost)\s+)?"
+    r"(constant|constantly|on and off|off and on|intermittent|continuous|comes and goes|all the time|"
+    r"all day|day and night)$"
+)
+
+# What a follow-up question asks about, by cue. A question may ask about
+# several slots ("How long and how bad?"); yes/no is decided separately.
+QUESTION_SLOTS = {
+    "duration": re.compile(
+        r"how long|since when|how many (minutes|hours|days|weeks|months|years)|duration"
+        r"|when did (it|this|the \w+|they|you) (start|begin|began)|\b(minutes|hours|days|weeks|months)\b"
+    ),
+    "severity": re.compile(
+        r"sever|how bad|how strong|how much (pain|does it hurt)|intensity|\bscale\b|out of 10"
+        r"|rate (it|the|your)|\bmild\b|\bmoderate\b"
+    ),
+    "progression": re.compile(
+        r"getting (better|worse)|better or worse|worse or better|progress|\bchang(e|ed|ing)\b|improv"
+        r"|stayed the same|same as|sudden|gradual"
+    ),
+    "timing": re.compile(
+        r"when does|what time|time of (the )?day|night|morning|evening|meals|exertion|walking|lying down"
+        r"|resting|at rest|pattern|constant|continuous|intermittent|come and go|comes and goes|how often|timing"
+    ),
+    "location": re.compile(r"\bwhere\b|which (side|part)|location|radiat|spread|move to"),
+    "trigger": re.compile(
+        r"trigger|(worse|better) (with|when|after|on)|reliev|aggravat|what makes|brings? (it )?on"
+    ),
+}
+
+YES_NO = {
+    "yes", "no", "yeah", "yep", "yup", "nope", "nah", "not really", "no not at all",
+    "not at all", "sometimes", "occasionally", "yes sometimes", "no never", "never",
+}
+
+# Slot keywords that name a question type rather than an answer, plus
+# "with <symptom>" phrases, which could smuggle in a new symptom
+_QUESTION_ONLY = {
+    "duration", "since when", "how long", "for how long", "severity", "scale", "intensity",
+    "timing", "pattern", "triggers", "trigger", "location", "where exactly", "which side",
+    "progression", "associated", "worse with", "better with", "relieved by", "aggravated by",
+}
+_YES_NO_STARTS = ("do ", "is ", "are ", "did ", "does ", "have ", "has ", "can ", "could ",
+                  "would ", "will ", "was ", "were ", "any ")
+_MED_RE = re.compile(r"\b(mg|ml|mcg|tablets?|syrup|dose|dosage|capsules?|injection)\b")
+_SPLIT_RE = re.compile(r"\s*(?:,|;|\band\b|\bbut\b)\s*")
+
+MAX_WORDS = 8
+
+
+def _norm(text: str) -> str:
+    text = re.sub(r"[^\w\s/'.-]", " ", (text or "").lower())
+    return " ".join(text.replace("'", "").split()).strip(" .")
+
+
+def question_slots(question: str) -> set:
+    """Slots a follow-up question asks about, plus "yes_no" for closed questions."""
+    q = " ".join((question or "").lower().split())
+    slots = {slot for slot, cue in QUESTION_SLOTS.items() if cue.search(q)}
+    if q.startswith(_YES_NO_STARTS):
+        slots.add("yes_no")
+    return slots
+
+
+def _answer_slot(segment: str):
+    """The slot a short answer fills, from its shape alone (None if unknown)."""
+    if DURATION_RE.match(segment) or SINCE_RE.match(segment):
+        return "duration"
+    if SEVERITY_RE.match(segment) or SCALE_RE.match(segment):
+        return "severity"
+    if PROGRESSION_RE.match(segment):
+        return "progression"
+    if PATTERN_RE.match(segment):
+        return "timing"
+    return None
+
+
+class RelevancePreClassifier:
+    """
+    classify(question, answer) → verdict dict (same shape as the Gemini
+    guardrail) when the answer is clearly relevant, otherwise None.
+    Counts how many Gemini calls it saved.
+    """
+
+    def __init__(self, slot_keywords=()):
+        # answer phrase → slot it fills ("only at night" → timing); phrases
+        # whose slot cannot be told are left to Gemini
+        self.answer_phrases = {}
+        for k in slot_keywords:
+            if k in _QUESTION_ONLY or k.startswith("with "):
+                continue
+            phrase = _norm(k)
+            slot = _answer_slot(phrase) or next(
+                (s for s, cue in QUESTION_SLOTS.items() if cue.search(phrase)), None)
+            if slot:
+                self.answer_phrases[phrase] = slot
+        self._lock = threading.Lock()
+
+        self.checked = 0
+        self.llm_calls_avoided = 0
+        self.escalated = 0
+        self.by_rule = {}
+
+    def _segment_slot(self, segment: str):
+        slot = _answer_slot(segment) or self.answer_phrases.get(segment)
+        if slot is None and segment in YES_NO:
+            return "yes_no"
+        return slot
+
+    def _match(self, question: str, answer: str):
+        text = _norm(answer)
+        if not text or len(text.split()) > MAX_WORDS or _MED_RE.search(text):
+            return None
+
+        asked = question_slots(question)
+        if not asked:
+            return None
+
+        # "on and off" is one answer, not two
+        slot = self._segment_slot(text)
+        if slot in asked:
+            return slot
+
+        # "3 days, severe" → every part must answer something the question asked
+        rules = []
+        for segment in _SPLIT_RE.split(answer.lower()):
+            segment = _norm(segment)
+            if not segment:
+                continue
+            slot = self._segment_slot(segment)
+            if slot not in asked:
+                return None
+            rules.append(slot)
+        return rules[0] if rules else None
+
+    def classify(self, question: str, answer: str):
+        rule = self._match(question, answer)
+        with self._lock:
+            self.checked += 1
+            if rule is None:
+                self.escalated += 1
+                return None
+            self.llm_calls_avoided += 1
+            self.by_rule[rule] = self.by_rule.get(rule, 0) + 1
+
+        return {"is_relevant": True, "introduces_new_symptom": False, "reason": f"local rule: {rule}"}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "llm_calls_avoided": self.llm_calls_avoided,
+                "escalated_to_llm": self.escalated,
+                "by_rule": dict(self.by_rule),
+            }
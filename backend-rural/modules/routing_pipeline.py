@@ -8,15 +8,21 @@ from dotenv import load_dotenv
 from modules.symptom_collector import SymptomCollector
 from modules.symptom_shortlister import SymptomShortlister
 from modules.complexity import ComplexityAssessor
+from modules.triage_analysis import TriageAnalyzer
 
 from agents.low import GeminiPCP
 from agents.medium import MDTAgentGroup
 from agents.high import HighCaseHandler
 from gemini_llm_wrapper import GeminiLLMWrapper
+from modules.llm_async import to_async, drop_unknown_kwargs
+from tracing import TRACER
+from circuit_breaker import LLMUnavailableError
+from llm_scheduler import LLMOverloadedError
+from llm_transport import requires_api_key
 
 
 class RoutingPipeline:
-    def __init__(self, external_llm_generate=None):
+    def __init__(self, external_llm_generate=None, external_llm_agenerate=None, external_llm_astream=None):
         load_dotenv()
 
         # -----------------------------
@@ -24,43 +30,87 @@ class RoutingPipeline:
         # -----------------------------
         if external_llm_generate:
             if callable(external_llm_generate):
-                self._safe_generate_reply = external_llm_generate
+                # plain f(messages) callables are fine: unknown kwargs (call_site, ...) are dropped
+                self._safe_generate_reply = drop_unknown_kwargs(external_llm_generate)
             elif hasattr(external_llm_generate, "generate_reply"):
-                self._safe_generate_reply = external_llm_generate.generate_reply
+                self._safe_generate_reply = drop_unknown_kwargs(external_llm_generate.generate_reply)
+                external_llm_agenerate = external_llm_agenerate or getattr(external_llm_generate, "agenerate_reply", None)
+                external_llm_astream = external_llm_astream or getattr(external_llm_generate, "agenerate_reply_stream", None)
             else:
                 raise ValueError("external_llm_generate must be callable or provide .generate_reply()")
+            # Without a native async callable, async stages run the sync one in a worker thread
+            self._safe_agenerate_reply = drop_unknown_kwargs(external_llm_agenerate) or to_async(self._safe_generate_reply)
+            # Optional async chunk generator; without it nothing is streamed
+            self._safe_astream_reply = drop_unknown_kwargs(external_llm_astream)
             self.llm = None
             print("✅ RoutingPipeline using external LLM")
         else:
             api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-            if not api_key:
+            if not api_key and requires_api_key():
                 api_key = input("Enter your Gemini API key: ").strip()
 
             self.llm = GeminiLLMWrapper(api_key=api_key, model="gemini-2.5-flash")
             self._safe_generate_reply = self._internal_safe_generate_reply
+            self._safe_agenerate_reply = self._internal_safe_agenerate_reply
+            self._safe_astream_reply = self.llm.agenerate_reply_stream
             print("✅ Gemini LLM initialized")
 
         # -----------------------------
         # Submodule Setup
         # -----------------------------
-        self.llm_config = {"custom_generate_reply": self._safe_generate_reply}
+        self.llm_config = {
+            "custom_generate_reply": self._safe_generate_reply,
+            "custom_agenerate_reply": self._safe_agenerate_reply,
+            "custom_astream_reply": self._safe_astream_reply,
+        }
 
-        self.collector = SymptomCollector(self._safe_generate_reply)
-        self.shortlister = SymptomShortlister(self._safe_generate_reply)
-        self.complexity = ComplexityAssessor(self._safe_generate_reply)
+        self.collector = SymptomCollector(self._safe_generate_reply, self._safe_agenerate_reply)
+        self.shortlister = SymptomShortlister(self._safe_generate_reply, self._safe_agenerate_reply)
+        self.complexity = ComplexityAssessor(self._safe_generate_reply, self._safe_agenerate_reply)
+        # Fused shortlist + complexity in one call (falls back to the two above)
+        self.triage = TriageAnalyzer(self._safe_generate_reply, self._safe_agenerate_reply,
+                                     shortlister=self.shortlister, complexity=self.complexity)
 
-        self.low_handler = GeminiPCP(self._safe_generate_reply)
+        self.low_handler = GeminiPCP(self._safe_generate_reply, self._safe_agenerate_reply, self._safe_astream_reply)
         self.mdt_handler = MDTAgentGroup(self.llm_config, src_lang="eng")
         self.high_handler = HighCaseHandler()
 
-    def _internal_safe_generate_reply(self, messages):
+    def _internal_safe_generate_reply(self, messages, **kwargs):
+        try:
+            res = self.llm.generate_reply(messages, **kwargs)
+            return res.text.strip() if hasattr(res, "text") else str(res)
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            print("⚠️ Gemini Error:", e)
+            return ""
+
+    async def _internal_safe_agenerate_reply(self, messages, **kwargs):
         try:
-            res = self.llm.generate_reply(messages)
+            res = await self.llm.agenerate_reply(messages, **kwargs)
             return res.text.strip() if hasattr(res, "text") else str(res)
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             print("⚠️ Gemini Error:", e)
             return ""
 
+    def _degraded_result(self, result: dict, error) -> dict:
+        """LLM unavailable mid-route: static nurse checklist instead of a timeout chain."""
+        print(f"⚠️ LLM unavailable ({error}) — returning local degraded advice")
+        offline = self.low_handler.offline_reply()
+        result.update({
+            "route": "Degraded (Local)",
+            "specialists_involved": [],
+            "specialist_discussion": "",
+            "mdt_summary_raw": None,
+            "patient_friendly_advice": offline["advice"],
+            "pcp_full": offline["pcp_full"],
+            "medicines_advised": offline["medicines"],
+        })
+        result["degradations"] = result.get("degradations", []) + ["llm_unavailable"]
+        return result
+
     def _mdt_logging_callable(self, discussion_log):
         """For terminal logging."""
         def log_turn(question):
@@ -79,8 +129,8 @@ class RoutingPipeline:
 
         collected_text = self.collector.clarification_loop_non_interactive(patient_description)
 
-        summary = self.shortlister.shortlist(collected_text)
-        case_complexity = self.complexity.assess(summary)
+        summary = self.triage.analyze(collected_text)
+        case_complexity = summary["complexity"]
 
         result = {
             "case_id": case_id,
@@ -88,12 +138,19 @@ class RoutingPipeline:
             "symptoms": summary.get("symptoms", []),
             "possible_diseases": summary.get("possible_diseases", []),
         }
+        if summary.get("degraded"):
+            result["degradations"] = ["keyword_triage"]
 
         # ------------------------------------------------------
         # LOW COMPLEXITY (PCP)
         # ------------------------------------------------------
         if case_complexity == "low":
-            pcp_output = self.low_handler.generate_reply(collected_text)
+            try:
+                pcp_output = self.low_handler.generate_reply(collected_text)
+            except LLMOverloadedError:
+                raise
+            except LLMUnavailableError as e:
+                return self._degraded_result(result, e)
             result.update({
                 "route": "Low (PCP)",
                 "specialists_involved": ["Primary Care Physician"],
@@ -110,10 +167,16 @@ class RoutingPipeline:
         elif case_complexity == "medium":
             discussion_log = []
 
-            md_results = self.mdt_handler.run_interactive_case(
-                collected_text,
-                ask_user_callable=self._mdt_logging_callable(discussion_log)
-            )
+            try:
+                md_results = self.mdt_handler.run_interactive_case(
+                    collected_text,
+                    ask_user_callable=self._mdt_logging_callable(discussion_log),
+                    summary=summary,
+                )
+            except LLMOverloadedError:
+                raise
+            except LLMUnavailableError as e:
+                return self._degraded_result(result, e)
 
             result.update({
                 "route": "Medium (MDT)",
@@ -152,7 +215,16 @@ class RoutingPipeline:
     # ===========================================================
     # FASTAPI FINAL ROUTE + PROGRESS
     # ===========================================================
-    async def run_route(self, case_complexity, collected_text, summary, case_id, progress_callback=None):
+    async def run_route(self, case_complexity, collected_text, summary, case_id,
+                        progress_callback=None, delta_callback=None, deadline=None):
+        """
+        summary is the triage result; its symptoms are handed to the MDT so
+        it does not extract them again.
+        progress_callback(msg) receives stage updates.
+        delta_callback(stage, text) receives streamed LLM chunks ("pcp" / "mdt_moderator").
+        deadline (deadline.Deadline) shortens the PCP reply / MDT discussion
+        when the case budget runs low; the caller reports deadline.applied.
+        """
 
         async def send(msg):
             if progress_callback:
@@ -161,6 +233,16 @@ class RoutingPipeline:
                 else:
                     progress_callback(msg)
 
+        def stream_to(stage):
+            if not delta_callback:
+                return None
+
+            async def on_delta(text):
+                res = delta_callback(stage, text)
+                if asyncio.iscoroutine(res):
+                    await res
+            return on_delta
+
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         result = {
@@ -169,13 +251,23 @@ class RoutingPipeline:
             "symptoms": summary.get("symptoms", []),
             "possible_diseases": summary.get("possible_diseases", []),
         }
+        if summary.get("degraded"):
+            result["degradations"] = ["keyword_triage"]
 
         # ------------------------------------------------------
         # LOW
         # ------------------------------------------------------
         if case_complexity == "low":
             await send("Routing to PCP…")
-            pcp = self.low_handler.generate_reply(collected_text)
+            try:
+                with TRACER.span("route.pcp", case_id=case_id):
+                    limit = deadline.output_limit("pcp", "simplify") if deadline else {}
+                    pcp = await self.low_handler.agenerate_reply(collected_text, on_delta=stream_to("pcp"), **limit)
+            except LLMOverloadedError:
+                raise
+            except LLMUnavailableError as e:
+                await send("⚠️ AI assistant unavailable — using the local safety checklist.")
+                return self._degraded_result(result, e)
             result.update({
                 "route": "Low (PCP)",
                 "specialists_involved": ["Primary Care Physician"],
@@ -193,10 +285,21 @@ class RoutingPipeline:
             await send("Routing to MDT team…")
             discussion_log = []
 
-            md_results = self.mdt_handler.run_interactive_case(
-                collected_text,
-                ask_user_callable=self._mdt_logging_callable(discussion_log)
-            )
+            try:
+                with TRACER.span("route.mdt", case_id=case_id) as span:
+                    md_results = await self.mdt_handler.arun_interactive_case(
+                        collected_text,
+                        ask_user_callable=self._mdt_logging_callable(discussion_log),
+                        on_delta=stream_to("mdt_moderator"),
+                        summary=summary,
+                        deadline=deadline,
+                    )
+                    if span: span.set(specialists=", ".join(md_results.get("specialists") or []))
+            except LLMOverloadedError:
+                raise
+            except LLMUnavailableError as e:
+                await send("⚠️ AI assistant unavailable — using the local safety checklist.")
+                return self._degraded_result(result, e)
 
             await send("MDT discussion completed.")
 
@@ -215,7 +318,8 @@ class RoutingPipeline:
         # ------------------------------------------------------
         elif case_complexity == "high":
             await send("Emergency case detected…")
-            emergency_advice = self.high_handler.handle(summary)
+            with TRACER.span("route.high", case_id=case_id):
+                emergency_advice = self.high_handler.handle(summary)
             result.update({
                 "route": "High (Emergency)",
                 "specialists_involved": ["Emergency Response Team"],
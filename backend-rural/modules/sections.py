@@ -0,0 +1,97 @@
+# modules/sections.py
+# Parsing of the 5-section advice text + medicine sanitising (used by server.py)
+import re
+from typing import Dict, List
+
+from modules.text_scan import PatternSet
+
+
+DOSAGE_PATTERNS = PatternSet([
+    r"\b\d+\s?mg\b",
+    r"\b\d+\s?ml\b",
+    r"\b\d+\s?mg\/kg\b",
+    r"\b\d+\s?(?:times|x)\s?(?:a\s)?day\b",
+    r"\btwice\s?a\s?day\b",
+    r"\bthrice\s?a\s?day\b",
+    r"\bevery\s?\d+\s?(?:hours|hrs|h)\b",
+])
+
+def contains_medicine_dosage(text: str) -> bool:
+    return DOSAGE_PATTERNS.contains_any(text)
+
+def sanitize_medicine_output(text: str) -> str:
+    if contains_medicine_dosage(text):
+        return "Seek a clinical evaluation for safe medication use."
+    return text
+
+# -------------------------
+# SECTION PARSING UTILITIES
+# -------------------------
+HEADINGS = [
+    "CONDITION SUMMARY",
+    "POSSIBLE CAUSES",
+    "NURSE ACTIONS",
+    "ESCALATION CRITERIA",
+    "MEDICINES ADVISED"
+]
+
+_heading_pattern = re.compile(
+    r"(?P<h>CONDITION SUMMARY|POSSIBLE CAUSES|NURSE ACTIONS|ESCALATION CRITERIA|MEDICINES ADVISED)\s*[:\-]?",
+    flags=re.IGNORECASE
+)
+
+def split_into_sections(text: str) -> Dict[str, str]:
+    """
+    Parse text and split into the five headings.
+    Returns dict with keys equal to HEADINGS in UPPER form; values are strings (possibly empty).
+    """
+    if not text:
+        return {h: "" for h in HEADINGS}
+
+    # Normalize whitespace
+    cleaned = text.strip()
+    cleaned = cleaned.replace("**", "")
+
+    # Find all heading matches and their spans
+    matches = list(_heading_pattern.finditer(cleaned))
+    sections = {h: "" for h in HEADINGS}
+
+    if not matches:
+        # No explicit headings — fallback: put everything in CONDITION SUMMARY
+        sections["CONDITION SUMMARY"] = cleaned
+        return sections
+
+    # For each heading, capture content until next heading
+    for idx, m in enumerate(matches):
+        heading = m.group("h").upper()
+        start = m.end()
+        end = matches[idx + 1].start() if idx + 1 < len(matches) else len(cleaned)
+        content = cleaned[start:end].strip()
+        sections[heading] = content
+
+    # Ensure each heading exists (already initialized)
+    return sections
+
+def medicines_list_from_section(med_text: str) -> List[str]:
+    if not med_text:
+        return []
+    # Split on newlines and bullets and commas, keep short meaningful items
+    lines = re.split(r"[\n\r]+", med_text)
+    meds = []
+    for ln in lines:
+        ln = ln.strip(" -•\t")
+        if not ln:
+            continue
+        # Comma-separated fallback
+        for part in ln.split(","):
+            part = part.strip()
+            if part:
+                meds.append(part)
+    # dedupe preserve order
+    seen = set()
+    out = []
+    for m in meds:
+        if m.lower() not in seen:
+            out.append(m)
+            seen.add(m.lower())
+    return out
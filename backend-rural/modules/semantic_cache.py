@@ -0,0 +1,177 @@
+# modules/semantic_cache.py
+"""
+Nearest-neighbour cache for guardrail decisions.
+
+"fever 3 days" and "fever since 3 days" get the same guardrail verdict, but
+an exact-match cache treats them as different prompts. Here the input is
+embedded with a small CPU sentence encoder and compared (cosine) against
+earlier inputs; a stored decision above the guardrail's threshold is reused.
+
+Optional: needs sentence-transformers + numpy. Without them (or with
+SEMANTIC_CACHE=0) every lookup is a miss and the guardrail runs as before.
+"""
+
+import os
+import asyncio
+import threading
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # optional dependency
+    np = None
+    SentenceTransformer = None
+
+
+DEFAULT_ENCODER = "all-MiniLM-L6-v2"
+
+_ENCODER = None
+_ENCODER_LOCK = threading.Lock()
+
+
+def _load_encoder(model_name: str):
+    """One encoder per process, shared by every guardrail cache."""
+    global _ENCODER
+    with _ENCODER_LOCK:
+        if _ENCODER is None:
+            try:
+                _ENCODER = SentenceTransformer(model_name, device="cpu")
+                print(f"✅ Semantic guardrail cache encoder loaded: {model_name}")
+            except Exception as e:
+                print(f"⚠️ Semantic cache encoder unavailable: {e}")
+                _ENCODER = False
+    return _ENCODER or None
+
+
+class SemanticDecisionCache:
+    """
+    In-memory vector index of (embedding, partition, decision).
+
+    - threshold: minimum cosine similarity for a hit
+    - partition: decisions only match inside the same partition
+      (e.g. the answer-relevance cache is partitioned by question)
+    - max_entries: ring buffer; the oldest decision is overwritten first
+    """
+
+    def __init__(self, name: str, threshold: float = 0.92, max_entries: int = 2000,
+                 encoder_name: str = DEFAULT_ENCODER, enabled: bool = True):
+        self.name = name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.encoder_name = encoder_name
+        self.enabled = bool(enabled and SentenceTransformer is not None)
+
+        self._vectors = None  # (max_entries, dim) float32, rows L2-normalized
+        self._partitions = [None] * max_entries
+        self._decisions = [None] * max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.last_similarity = None
+
+    # ------------------------------------
+    # Embedding (CPU-bound → worker thread)
+    # ------------------------------------
+    def embed(self, text: str):
+        if not self.enabled:
+            return None
+        encoder = _load_encoder(self.encoder_name)
+        if encoder is None:
+            self.enabled = False
+            return None
+        vec = encoder.encode([" ".join((text or "").lower().split())], normalize_embeddings=True)[0]
+        return np.asarray(vec, dtype=np.float32)
+
+    async def aembed(self, text: str):
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self.embed, text)
+
+    # ------------------------------------
+    # Lookup / store
+    # ------------------------------------
+    def lookup(self, vec, partition: str = ""):
+        if vec is None:
+            return None
+        with self._lock:
+            if not self._size:
+                self.misses += 1
+                return None
+
+            sims = self._vectors[:self._size] @ vec
+            best, best_sim = None, -1.0
+            for idx in np.argsort(sims)[::-1]:
+                if sims[idx] < self.threshold:
+                    break
+                if self._partitions[idx] == partition:
+                    best, best_sim = idx, float(sims[idx])
+                    break
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.last_similarity = best_sim
+            print(f"♻️ Semantic cache hit [{self.name}] sim={best_sim:.3f}")
+            return dict(self._decisions[best])
+
+    def store(self, vec, decision: dict, partition: str = ""):
+        if vec is None:
+            return
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+            slot = self._next
+            self._vectors[slot] = vec
+            self._partitions[slot] = partition
+            self._decisions[slot] = dict(decision)
+            self._next = (slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+            self.stores += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "stores": self.stores,
+            "last_hit_similarity": self.last_similarity,
+        }
+
+
+def create_guardrail_caches() -> dict:
+    """
+    SEMANTIC_CACHE=1 turns the caches on (off by default: the encoder is a
+    ~90MB download). Per-guardrail thresholds:
+      SEMANTIC_CACHE_THRESHOLD_FIRST_INPUT (default 0.92)
+      SEMANTIC_CACHE_THRESHOLD_ANSWER (default 0.90)
+    """
+    enabled = os.getenv("SEMANTIC_CACHE", "0").strip().lower() in ("1", "true", "yes", "on")
+    if enabled and SentenceTransformer is None:
+        print("⚠️ SEMANTIC_CACHE=1 but sentence-transformers is not installed — semantic cache off")
+
+    encoder_name = os.getenv("SEMANTIC_CACHE_MODEL", DEFAULT_ENCODER)
+    max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+    return {
+        "first_input": SemanticDecisionCache(
+            "first_input",
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD_FIRST_INPUT", "0.92")),
+            max_entries=max_entries, encoder_name=encoder_name, enabled=enabled,
+        ),
+        "answer_relevance": SemanticDecisionCache(
+            "answer_relevance",
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD_ANSWER", "0.90")),
+            max_entries=max_entries, encoder_name=encoder_name, enabled=enabled,
+        ),
+    }
@@ -0,0 +1,337 @@
+# modules/session_backends.py
+"""
+Shared session backends so `uvicorn --workers N` (or a restart) does not
+lose cases in flight. Every backend exposes the same get / put / delete /
+stats surface as the in-memory SessionStore.
+
+Select with SESSION_BACKEND=memory|sqlite|redis (default: memory).
+
+The async endpoints use the aget / aput / adelete / astats twins: SQLite
+and Redis run the blocking call in a worker thread so a slow disk or
+Redis round-trip never stalls the event loop.
+
+Only the session records are shared. The tracer's span buffer
+(/api/case/{id}/trace), the in-memory tier of the LLM response cache, the
+guardrail caches, the circuit breaker and the LLM scheduler's
+concurrency / rate limits are still per worker process: with N workers
+up to N × LLM_MAX_CONCURRENCY calls (and N × LLM_RATE_PER_MINUTE) reach
+Gemini, and a trace is only visible on the worker that ran the case.
+"""
+
+import os
+import json
+import asyncio
+import time
+import socket
+import sqlite3
+import threading
+from urllib.parse import urlparse
+
+from modules.session_store import SessionStore, SessionRecord
+
+
+class _ThreadedAsyncMixin:
+    """Async twins of get / put / delete / stats for backends that do blocking I/O."""
+
+    async def aget(self, case_id: str):
+        return await asyncio.to_thread(self.get, case_id)
+
+    async def aput(self, case_id: str, record: SessionRecord):
+        await asyncio.to_thread(self.put, case_id, record)
+
+    async def adelete(self, case_id: str):
+        await asyncio.to_thread(self.delete, case_id)
+
+    async def astats(self) -> dict:
+        return await asyncio.to_thread(self.stats)
+
+
+# ===========================================================
+# SQLite (WAL) — shared by all workers on one machine
+# ===========================================================
+class SQLiteSessionStore(_ThreadedAsyncMixin):
+    """
+    Stores each case as a JSON row. WAL mode lets every worker read while
+    one writes, and rows survive a restart. Idle TTL and the entry cap are
+    enforced on write; a cheap indexed delete keeps the table bounded.
+    """
+
+    def __init__(self, path: str, max_entries: int = 2000, idle_ttl: float = 2 * 60 * 60):
+        self.path = path
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " case_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions(last_access)")
+
+        # Counters are per worker process
+        self.hits = 0
+        self.misses = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+
+    def get(self, case_id: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, last_access FROM sessions WHERE case_id = ?", (case_id,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            data, last_access = row
+            if now - last_access > self.idle_ttl:
+                self._conn.execute("DELETE FROM sessions WHERE case_id = ?", (case_id,))
+                self.evicted_ttl += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE sessions SET last_access = ? WHERE case_id = ?", (now, case_id))
+            self.hits += 1
+        return SessionRecord.from_dict(json.loads(data))
+
+    def put(self, case_id: str, record: SessionRecord):
+        now = time.time()
+        data = json.dumps(record.to_dict(), ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (case_id, data, last_access) VALUES (?, ?, ?)",
+                (case_id, data, now),
+            )
+            self._evict(now)
+
+    def delete(self, case_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE case_id = ?", (case_id,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, approx_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries,
+            "approx_bytes": approx_bytes,
+            "max_entries": self.max_entries,
+            "idle_ttl_seconds": self.idle_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted_lru": self.evicted_lru,
+            "evicted_ttl": self.evicted_ttl,
+        }
+
+    def _evict(self, now):
+        cur = self._conn.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.idle_ttl,))
+        self.evicted_ttl += max(cur.rowcount, 0)
+
+        count = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cur = self._conn.execute(
+                "DELETE FROM sessions WHERE case_id IN ("
+                " SELECT case_id FROM sessions ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evicted_lru += max(cur.rowcount, 0)
+
+
+# ===========================================================
+# Redis protocol (RESP2) — shared across machines
+# ===========================================================
+class RedisProtocolError(Exception):
+    pass
+
+
+class _RespConnection:
+    """Minimal RESP2 client: just enough for GET/SET/DEL/PEXPIRE/SCAN."""
+
+    def __init__(self, host: str, port: int, db: int = 0, password: str = None, timeout: float = 2.0):
+        self.host, self.port, self.db = host, port, db
+        self.password, self.timeout = password, timeout
+        self._sock = None
+        self._buf = b""
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._buf = b""
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", str(self.db))
+
+    def close(self):
+        if self._sock:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+    def execute(self, *args):
+        # One reconnect attempt covers a restarted server / idle-closed socket
+        for attempt in range(2):
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._roundtrip(*args)
+            except (OSError, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+
+    def _roundtrip(self, *args):
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            a = a if isinstance(a, bytes) else str(a).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(a), a))
+        self._sock.sendall(b"".join(out))
+        return self._read_reply()
+
+    def _read_line(self) -> bytes:
+        while b"\r\n" not in self._buf:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Redis connection closed")
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\r\n", 1)
+        return line
+
+    def _read_exact(self, n: int) -> bytes:
+        while len(self._buf) < n + 2:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Redis connection closed")
+            self._buf += chunk
+        data, self._buf = self._buf[:n], self._buf[n + 2:]
+        return data
+
+    def _read_reply(self):
+        line = self._read_line()
+        kind, rest = line[:1], line[1:]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RedisProtocolError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            return None if n < 0 else self._read_exact(n)
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._read_reply() for _ in range(n)]
+        raise RedisProtocolError(f"Unexpected RESP reply: {line!r}")
+
+
+class RedisSessionStore(_ThreadedAsyncMixin):
+    """
+    Stores each case as a JSON string under `<prefix><case_id>` with a
+    PX expiry that is refreshed on every access (idle TTL). The entry cap
+    is left to the server's maxmemory-policy (allkeys-lru recommended).
+    Works against any RESP2 server: Redis, Valkey, KeyDB or a local stand-in.
+    """
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", idle_ttl: float = 2 * 60 * 60,
+                 prefix: str = "ayu:session:"):
+        parsed = urlparse(url)
+        db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.url = f"{parsed.scheme}://{parsed.hostname}:{parsed.port or 6379}/{db}"
+        self.idle_ttl = idle_ttl
+        self.prefix = prefix
+        self._ttl_ms = str(int(idle_ttl * 1000))
+        self._conn = _RespConnection(parsed.hostname or "127.0.0.1", parsed.port or 6379,
+                                     db=db, password=parsed.password)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, case_id: str) -> str:
+        return f"{self.prefix}{case_id}"
+
+    def get(self, case_id: str):
+        with self._lock:
+            raw = self._conn.execute("GET", self._key(case_id))
+            if raw is None:
+                self.misses += 1
+                return None
+            self._conn.execute("PEXPIRE", self._key(case_id), self._ttl_ms)
+            self.hits += 1
+        return SessionRecord.from_dict(json.loads(raw.decode("utf-8")))
+
+    def put(self, case_id: str, record: SessionRecord):
+        data = json.dumps(record.to_dict(), ensure_ascii=False)
+        with self._lock:
+            self._conn.execute("SET", self._key(case_id), data, "PX", self._ttl_ms)
+
+    def delete(self, case_id: str):
+        with self._lock:
+            self._conn.execute("DEL", self._key(case_id))
+
+    def __len__(self):
+        return self._count()
+
+    def _count(self) -> int:
+        count, cursor = 0, "0"
+        with self._lock:
+            while True:
+                cursor, keys = self._conn.execute("SCAN", cursor, "MATCH", f"{self.prefix}*", "COUNT", "500")
+                cursor = cursor.decode("utf-8") if isinstance(cursor, bytes) else str(cursor)
+                count += len(keys)
+                if cursor == "0":
+                    return count
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis",
+            "url": self.url,
+            "entries": self._count(),
+            "idle_ttl_seconds": self.idle_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# ===========================================================
+# Factory
+# ===========================================================
+def create_session_store():
+    backend = os.getenv("SESSION_BACKEND", "memory").strip().lower()
+    max_entries = int(os.getenv("SESSION_MAX_ENTRIES", "2000"))
+    idle_ttl = float(os.getenv("SESSION_IDLE_TTL_SECONDS", str(2 * 60 * 60)))
+
+    if backend == "sqlite":
+        path = os.getenv("SESSION_SQLITE_PATH", "sessions.sqlite3")
+        print(f"✅ Session backend: SQLite (WAL) at {path}")
+        return SQLiteSessionStore(path, max_entries=max_entries, idle_ttl=idle_ttl)
+
+    if backend == "redis":
+        url = os.getenv("SESSION_REDIS_URL", "redis://127.0.0.1:6379/0")
+        print(f"✅ Session backend: Redis at {url}")
+        return RedisSessionStore(url, idle_ttl=idle_ttl)
+
+    if backend != "memory":
+        print(f"⚠️ Unknown SESSION_BACKEND '{backend}' — using in-memory store")
+
+    return SessionStore(
+        max_entries=max_entries,
+        max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+        idle_ttl=idle_ttl,
+    )
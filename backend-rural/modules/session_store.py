@@ -0,0 +1,191 @@
+# modules/session_store.py
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+
+class SessionRecord:
+    """
+    One interactive case (start_case → next_question → process_final_answers).
+    Slotted so thousands of open cases stay cheap to hold in memory.
+    """
+
+    __slots__ = (
+        "initial_text", "questions", "answers", "current_round",
+        "max_rounds", "mdt_done", "original_symptoms",
+    )
+
+    def __init__(self, initial_text: str, original_symptoms=None, max_rounds: int = 5):
+        self.initial_text = initial_text
+        self.questions = []
+        self.answers = {}
+        self.current_round = 0
+        self.max_rounds = max_rounds
+        self.mdt_done = False
+        self.original_symptoms = set(original_symptoms or ())
+
+    def to_dict(self) -> dict:
+        return {
+            "initial_text": self.initial_text,
+            "questions": list(self.questions),
+            "answers": dict(self.answers),
+            "current_round": self.current_round,
+            "max_rounds": self.max_rounds,
+            "mdt_done": self.mdt_done,
+            "original_symptoms": sorted(self.original_symptoms),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SessionRecord":
+        record = cls(
+            initial_text=data.get("initial_text", ""),
+            original_symptoms=data.get("original_symptoms") or (),
+            max_rounds=data.get("max_rounds", 5),
+        )
+        record.questions = list(data.get("questions") or [])
+        record.answers = dict(data.get("answers") or {})
+        record.current_round = data.get("current_round", 0)
+        record.mdt_done = bool(data.get("mdt_done", False))
+        return record
+
+    def approx_bytes(self) -> int:
+        """Rough footprint: object shells plus the text the case has accumulated."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.initial_text)
+        size += sys.getsizeof(self.questions) + sum(sys.getsizeof(q) for q in self.questions)
+        size += sys.getsizeof(self.answers)
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.answers.items())
+        size += sys.getsizeof(self.original_symptoms)
+        size += sum(sys.getsizeof(s) for s in self.original_symptoms)
+        return size
+
+
+class SessionStore:
+    """
+    In-memory case store with LRU + idle-TTL eviction.
+
+    - max_entries: hard cap on open cases (least recently used goes first)
+    - max_bytes: cap on the approximate memory held by all records
+    - idle_ttl: seconds a case may sit untouched before it is dropped
+
+    Callers must put() a record back after mutating it so the byte
+    accounting stays accurate.
+    """
+
+    def __init__(self, max_entries: int = 2000, max_bytes: int = 64 * 1024 * 1024, idle_ttl: float = 2 * 60 * 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+
+        # case_id -> (record, last_access, approx_bytes); order = recency
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+        self.evicted_bytes = 0
+
+    # ------------------------------------
+    # Public API
+    # ------------------------------------
+    def get(self, case_id: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(case_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            record, last_access, size = entry
+            if now - last_access > self.idle_ttl:
+                self._drop(case_id)
+                self.evicted_ttl += 1
+                self.misses += 1
+                return None
+
+            self._entries[case_id] = (record, now, size)
+            self._entries.move_to_end(case_id)
+            self.hits += 1
+            return record
+
+    def put(self, case_id: str, record: SessionRecord):
+        size = record.approx_bytes()
+        now = time.monotonic()
+        with self._lock:
+            if case_id in self._entries:
+                self._drop(case_id)
+            self._entries[case_id] = (record, now, size)
+            self._bytes += size
+            self._evict(now)
+
+    def delete(self, case_id: str):
+        with self._lock:
+            if case_id in self._entries:
+                self._drop(case_id)
+
+    # In-memory: the async twins run inline (nothing blocks)
+    async def aget(self, case_id: str):
+        return self.get(case_id)
+
+    async def aput(self, case_id: str, record: SessionRecord):
+        self.put(case_id, record)
+
+    async def adelete(self, case_id: str):
+        self.delete(case_id)
+
+    async def astats(self) -> dict:
+        return self.stats()
+
+    def __contains__(self, case_id):
+        return self.get(case_id) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire_idle(time.monotonic())
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "approx_bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "idle_ttl_seconds": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted_lru": self.evicted_lru,
+                "evicted_ttl": self.evicted_ttl,
+                "evicted_bytes": self.evicted_bytes,
+            }
+
+    # ------------------------------------
+    # Eviction helpers (lock must be held)
+    # ------------------------------------
+    def _drop(self, case_id):
+        _, _, size = self._entries.pop(case_id)
+        self._bytes -= size
+
+    def _expire_idle(self, now):
+        # Oldest entries sit at the front, so stop at the first live one
+        while self._entries:
+            case_id, (_, last_access, _) = next(iter(self._entries.items()))
+            if now - last_access <= self.idle_ttl:
+                break
+            self._drop(case_id)
+            self.evicted_ttl += 1
+
+    def _evict(self, now):
+        self._expire_idle(now)
+
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.evicted_lru += 1
+
+        # Never evict the entry that was just written
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+            self.evicted_bytes += 1
@@ -0,0 +1,35 @@
+# modules/speculative.py
+import asyncio
+
+
+def _discard(task: asyncio.Task):
+    # Retrieve the outcome of a dropped speculative task so asyncio never
+    # logs "Task exception was never retrieved" for it.
+    if not task.cancelled():
+        task.exception()
+
+
+async def run_speculative(guard_coro, work_coro, accept):
+    """
+    Run a guardrail and the work that normally follows it at the same time,
+    betting that the guardrail passes.
+
+    - accept(guard_result) → True keeps the work result
+    - on rejection (or a guardrail error) the work is cancelled and dropped
+
+    Returns (guard_result, work_result_or_None).
+    """
+    work = asyncio.ensure_future(work_coro)
+    try:
+        guard = await guard_coro
+    except BaseException:
+        work.cancel()
+        work.add_done_callback(_discard)
+        raise
+
+    if not accept(guard):
+        work.cancel()
+        work.add_done_callback(_discard)
+        return guard, None
+
+    return guard, await work
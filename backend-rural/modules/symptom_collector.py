@@ -1,11 +1,24 @@
 # modules/symptom_collector.py
 import re
+import asyncio
 from time import sleep
 
+from modules.llm_async import to_async
+from circuit_breaker import LLMUnavailableError
+from llm_scheduler import LLMOverloadedError
+from modules.text_scan import KeywordScanner, PatternSet
+
 class SymptomCollector:
-    def __init__(self, llm):
+    def __init__(self, llm, allm=None):
         self.llm = llm
 
+        # Awaitable twin of self.llm used by the FastAPI (async) endpoints
+        if allm is None:
+            allm = getattr(llm, "agenerate_reply", None) or to_async(
+                llm if callable(llm) else llm.generate_reply
+            )
+        self.allm = allm
+
         self._symptom_lexicon = {
             "fever","cough","cold","jaundice","yellow","pain","headache","vomiting","nausea","diarrhea",
             "breath","breathing","shortness","sob","dyspnea","chest","abdomen","abdominal","throat",
@@ -38,9 +51,21 @@ class SymptomCollector:
             r"\btwice\s+a\s+day\b", r"\bonce\s+a\s+day\b", r"\bthrice\s+a\s+day\b",
         ]
 
+        # Compiled once; the validators run for every candidate question
+        self._symptom_scanner = KeywordScanner(self._symptom_lexicon, boundary="word")
+        self._slot_scanner = KeywordScanner(self._slot_keywords, boundary="start")
+        self._med_rx = PatternSet(self._med_rx_patterns)
+        # (context, keywords) of the last context scanned — candidates share it
+        self._ctx_keywords = (None, frozenset())
+
         # ❌ NEW SYMPTOM FISHING — REMOVED COMPLETELY
         self._broad_new_symptom_phrases = []  # <-- wiped out
 
+    @property
+    def slot_keywords(self) -> frozenset:
+        """Duration / severity / timing / ... phrases a follow-up question may ask about."""
+        return frozenset(self._slot_keywords)
+
     # ------------------------------------
     # LLM Helpers
     # ------------------------------------
@@ -69,38 +94,65 @@ class SymptomCollector:
         except Exception as e:
             return f"Gemini error: {e}"
 
-    def gemini_reply_to_str(self, messages, retries=2, backoff=0.5):
+    def gemini_reply_to_str(self, messages, retries=2, backoff=0.5, call_site="followup"):
         last_err = None
         for _ in range(retries):
             try:
-                res = self.llm(messages) if callable(self.llm) else self.llm.generate_reply(messages)
+                if callable(self.llm):
+                    res = self.llm(messages, call_site=call_site)
+                else:
+                    res = self.llm.generate_reply(messages, call_site=call_site)
                 text = self._extract_text_from_response(res)
                 if text and "quick accessor" in text.lower():
                     raise ValueError(text)
                 return text
+            except LLMUnavailableError:
+                raise
             except Exception as e:
                 last_err = e
                 sleep(backoff)
                 backoff *= 1.5
         return f"Gemini error: {last_err}"
 
+    async def agemini_reply_to_str(self, messages, retries=2, backoff=0.5, call_site="followup"):
+        last_err = None
+        for _ in range(retries):
+            try:
+                res = await self.allm(messages, call_site=call_site)
+                text = self._extract_text_from_response(res)
+                if text and "quick accessor" in text.lower():
+                    raise ValueError(text)
+                return text
+            except LLMUnavailableError:
+                raise
+            except Exception as e:
+                last_err = e
+                await asyncio.sleep(backoff)
+                backoff *= 1.5
+        return f"Gemini error: {last_err}"
+
     # ------------------------------------
     # Guardrail Helpers
     # ------------------------------------
     def _extract_symptom_keywords(self, text: str) -> set:
-        words = set(w.strip(".,:;!?()[]{}\"'").lower() for w in text.split())
-        return {w for w in words if w in self._symptom_lexicon}
+        return self._symptom_scanner.find_all(text)
+
+    def _context_symptom_keywords(self, context: str) -> frozenset:
+        # The growing case context is scanned once, not once per candidate question
+        cached_context, keywords = self._ctx_keywords
+        if cached_context != context:
+            keywords = frozenset(self._extract_symptom_keywords(context))
+            self._ctx_keywords = (context, keywords)
+        return keywords
 
     def _contains_med_or_dose(self, question: str) -> bool:
-        return any(re.search(p, question.lower()) for p in self._med_rx_patterns)
+        return self._med_rx.contains_any(question)
 
     def _mentions_slot(self, question: str) -> bool:
-        q = question.lower()
-        return any(slot in q for slot in self._slot_keywords)
+        return self._slot_scanner.contains_any(question)
 
     def _overlaps_context_symptoms(self, question: str, ctx_keywords: set) -> bool:
-        qwords = set(w.strip(".,:;!?()[]{}\"'").lower() for w in question.split())
-        return len(qwords & ctx_keywords) > 0
+        return not self._extract_symptom_keywords(question).isdisjoint(ctx_keywords)
 
     def _looks_like_question(self, q: str) -> bool:
         q = q.strip().lower()
@@ -132,7 +184,7 @@ class SymptomCollector:
         if norm_q in asked_norms:
             return False,"duplicate",q
 
-        ctx_keys = self._extract_symptom_keywords(current_context)
+        ctx_keys = self._context_symptom_keywords(current_context)
         relevant = self._overlaps_context_symptoms(q, ctx_keys) or self._mentions_slot(q)
 
         if not relevant:
@@ -143,27 +195,50 @@ class SymptomCollector:
     # ------------------------------------
     # Follow-up generator
     # ------------------------------------
-    def generate_single_followup(self, current_context: str, asked_questions=None):
-        asked_questions = asked_questions or []
-
-        base = (
-    "You are a clinical triage AI assistant.\n"
-    "Ask ONE follow-up question that covers ALL already-mentioned symptoms together.\n"
-    "You may ask about duration OR severity OR timing OR triggers OR location OR progression — but apply it to all symptoms in a single question.\n"
-    "Do NOT ask separate questions for each symptom.\n"
-    "Do NOT introduce new symptoms.\n"
-    "The question must be short and use one slot applied to all symptoms.\n"
-    "If no follow-up is needed, reply: no further questions."
-)
-
-        prompt = (
-            f"{base}\n\nContext: '''{current_context}'''\n"
+    _FOLLOWUP_BASE = (
+        "You are a clinical triage AI assistant.\n"
+        "Ask ONE follow-up question that covers ALL already-mentioned symptoms together.\n"
+        "You may ask about duration OR severity OR timing OR triggers OR location OR progression — but apply it to all symptoms in a single question.\n"
+        "Do NOT ask separate questions for each symptom.\n"
+        "Do NOT introduce new symptoms.\n"
+        "The question must be short and use one slot applied to all symptoms.\n"
+        "If no follow-up is needed, reply: no further questions."
+    )
+
+    _FOLLOWUP_FALLBACK = "Can you describe severity and timing of the main symptom?"
+
+    def _followup_prompt(self, current_context, asked_questions):
+        return (
+            f"{self._FOLLOWUP_BASE}\n\nContext: '''{current_context}'''\n"
             f"Previously asked: {', '.join(asked_questions) if asked_questions else 'none'}\n\n"
             "Your ONE follow-up question:"
         )
 
+    def _corrected_followup_prompt(self, current_context, asked_questions, reason):
+        return (
+            f"{self._FOLLOWUP_BASE}\n\nCONSTRAINTS:\n"
+            f"- Last attempt rejected for: {reason}\n"
+            f"- Must refer ONLY to existing symptoms\n"
+            f"- Only duration/severity/timing/location\n"
+            f"- No meds/doses\n"
+            f"Context: '''{current_context}'''\n"
+            f"Previously asked: {', '.join(asked_questions)}\n\n"
+            "Your corrected follow-up question:"
+        )
+
+    def generate_single_followup(self, current_context: str, asked_questions=None):
+        asked_questions = asked_questions or []
+        prompt = self._followup_prompt(current_context, asked_questions)
+
         for attempt in range(3):
-            q = self.gemini_reply_to_str([{"role":"user","content":prompt}])
+            try:
+                q = self.gemini_reply_to_str([{"role":"user","content":prompt}])
+            except LLMOverloadedError:
+                raise
+            except LLMUnavailableError as e:
+                # Degraded mode: stop asking so the case goes straight to local triage
+                print(f"⚠️ Follow-up generation skipped — {e}")
+                return None
             if not q:
                 continue
 
@@ -176,18 +251,53 @@ class SymptomCollector:
             if ok:
                 return sanitized
 
-            prompt = (
-                f"{base}\n\nCONSTRAINTS:\n"
-                f"- Last attempt rejected for: {reason}\n"
-                f"- Must refer ONLY to existing symptoms\n"
-                f"- Only duration/severity/timing/location\n"
-                f"- No meds/doses\n"
-                f"Context: '''{current_context}'''\n"
-                f"Previously asked: {', '.join(asked_questions)}\n\n"
-                "Your corrected follow-up question:"
+            prompt = self._corrected_followup_prompt(current_context, asked_questions, reason)
+
+        return self._FOLLOWUP_FALLBACK
+
+    async def agenerate_single_followup(self, current_context: str, asked_questions=None):
+        asked_questions = asked_questions or []
+        prompt = self._followup_prompt(current_context, asked_questions)
+
+        for attempt in range(3):
+            try:
+                q = await self.agemini_reply_to_str([{"role":"user","content":prompt}])
+            except LLMOverloadedError:
+                raise
+            except LLMUnavailableError as e:
+                print(f"⚠️ Follow-up generation skipped — {e}")
+                return None
+            if not q:
+                continue
+
+            if "no further" in q.lower():
+                return None
+
+            ok, reason, sanitized = self._validate_followup_question(
+                current_context, asked_questions, q
             )
+            if ok:
+                return sanitized
+
+            prompt = self._corrected_followup_prompt(current_context, asked_questions, reason)
 
-        return "Can you describe severity and timing of the main symptom?"
+        return self._FOLLOWUP_FALLBACK
+
+    def select_followup(self, current_context, asked_questions, candidates):
+        """
+        Pick the first candidate that passes the local validators
+        (used by the fused intake call, which returns a ranked list).
+        Returns None when no candidate is acceptable.
+        """
+        for q in candidates or []:
+            if not isinstance(q, str):
+                continue
+            ok, _, sanitized = self._validate_followup_question(
+                current_context, asked_questions or [], q
+            )
+            if ok:
+                return sanitized
+        return None
 
     # ------------------------------------
     # First question API
@@ -199,6 +309,13 @@ class SymptomCollector:
             return collected, []
         return collected, [q]
 
+    async def aclarification_loop_api(self, initial_input, max_rounds=1, confidence_threshold=70):
+        collected = initial_input.strip()
+        q = await self.agenerate_single_followup(collected, asked_questions=[])
+        if not q:
+            return collected, []
+        return collected, [q]
+
     # ------------------------------------
     # Next question API – simplified (no new-symptom blocking)
     # ------------------------------------
@@ -214,6 +331,18 @@ class SymptomCollector:
 
         return False, next_q, collected_context
 
+    async def agenerate_next_question_api(self, collected_context, new_answers, asked_questions=None, confidence_threshold=70):
+        asked_questions = asked_questions or []
+
+        for q, a in new_answers.items():
+            collected_context += f" | {q}: {a or 'unknown'}"
+
+        next_q = await self.agenerate_single_followup(collected_context, asked_questions)
+        if not next_q:
+            return True, None, collected_context
+
+        return False, next_q, collected_context
+
     # ------------------------------------
     # Non-interactive loop
     # ------------------------------------
@@ -1,23 +1,21 @@
 # modules/symptom_shortlister.py
 
+from modules.llm_async import to_async
+
+
 class SymptomShortlister:
     """
     Uses Gemini to extract ONLY symptom keywords from patient text.
     No disease prediction. No fallback KB.
     """
 
-    def __init__(self, llm_generate_reply):
+    def __init__(self, llm_generate_reply, allm_generate_reply=None):
         self.llm_generate_reply = llm_generate_reply
+        self.allm_generate_reply = allm_generate_reply or to_async(llm_generate_reply)
 
-    def shortlist(self, patient_text: str):
-        """
-        Return ONLY:
-        - symptoms: list of extracted symptoms (from Gemini)
-        - raw_text: original full text
-        """
-
+    def _prompt(self, patient_text: str) -> str:
         # LLM prompt to extract ONLY symptoms
-        prompt = (
+        return (
             "You are a medical assistant.\n"
             "Extract ONLY the symptoms mentioned in the following patient description.\n"
             "Return them as a comma-separated list.\n"
@@ -26,8 +24,14 @@ class SymptomShortlister:
             f"Patient text: '{patient_text}'\n"
         )
 
+    def shortlist(self, patient_text: str):
+        """
+        Return ONLY:
+        - symptoms: list of extracted symptoms (from Gemini)
+        - raw_text: original full text
+        """
         try:
-            reply = self.llm_generate_reply([{"role": "user", "content": prompt}])
+            reply = self.llm_generate_reply([{"role": "user", "content": self._prompt(patient_text)}], call_site="shortlist")
             # Parse Gemini result into list
             symptoms = [s.strip() for s in reply.split(",") if s.strip()]
         except Exception as e:
@@ -38,3 +42,17 @@ class SymptomShortlister:
             "symptoms": symptoms,
             "raw_text": patient_text
         }
+
+    async def ashortlist(self, patient_text: str):
+        """Awaitable twin of shortlist()."""
+        try:
+            reply = await self.allm_generate_reply([{"role": "user", "content": self._prompt(patient_text)}], call_site="shortlist")
+            symptoms = [s.strip() for s in reply.split(",") if s.strip()]
+        except Exception as e:
+            print(f"⚠️ SymptomShortlister LLM Error: {e}")
+            symptoms = []
+
+        return {
+            "symptoms": symptoms,
+            "raw_text": patient_text
+        }
@@ -0,0 +1,108 @@
+# modules/text_scan.py
+"""
+Shared multi-keyword scanning for the symptom / slot lexicons.
+
+A scanner is built once per lexicon and answers "which keywords occur in
+this text?" with proper word boundaries, doing as much work as possible in
+C:
+  - single-word keywords (boundary="word") → one str.translate + split of
+    the text and a set intersection
+  - phrases / prefix matching → str.find per keyword, with only the
+    candidate positions boundary-checked in Python
+For lexicons of this size (tens of terms) that beats both a pure-Python
+Aho–Corasick automaton and a trie compiled into one regex in CPython —
+see benchmarks/bench_text_scan.py.
+
+Boundaries:
+  - "word":  whole words only  ("pain" matches "pain", not "painful")
+  - "start": keyword must start a word  ("pain" matches "painful", not "spain")
+  - "none":  plain substring semantics
+"""
+
+import re
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+# Every ASCII non-word character (plus common typographic quotes) → space
+_TO_SPACES = str.maketrans({
+    ch: " " for ch in [chr(c) for c in range(128)] + list("‘’“”–—…")
+    if not _is_word_char(ch)
+})
+
+
+def word_tokens(text: str) -> set:
+    """Lower-cased word set of text (punctuation-insensitive)."""
+    return set((text or "").lower().translate(_TO_SPACES).split())
+
+
+class KeywordScanner:
+    """
+    Precompiled matcher over a fixed lexicon (case-insensitive).
+
+    find_all(text) → set of keywords present
+    contains_any(text) → bool, stops at the first hit
+    """
+
+    BOUNDARIES = ("word", "start", "none")
+
+    def __init__(self, keywords, boundary: str = "word"):
+        if boundary not in self.BOUNDARIES:
+            raise ValueError(f"boundary must be one of {self.BOUNDARIES}")
+        self.boundary = boundary
+        normalized = {" ".join(k.lower().split()) for k in keywords if k and k.strip()}
+
+        # Whole single words are answered from the token set; the rest need find()
+        if boundary == "word":
+            self._words = frozenset(k for k in normalized if word_tokens(k) == {k})
+        else:
+            self._words = frozenset()
+        # Longest first so contains_any() tends to hit the more specific phrase
+        self._phrases = tuple(sorted(normalized - self._words, key=len, reverse=True))
+        self.keywords = frozenset(normalized)
+
+    def _occurs(self, text: str, kw: str) -> bool:
+        i = text.find(kw)
+        if self.boundary == "none":
+            return i != -1
+
+        n = len(text)
+        check_right = self.boundary == "word"
+        while i != -1:
+            j = i + len(kw)
+            if (i == 0 or not _is_word_char(text[i - 1])) and \
+                    (not check_right or j == n or not _is_word_char(text[j])):
+                return True
+            i = text.find(kw, i + 1)
+        return False
+
+    def find_all(self, text: str) -> set:
+        text = (text or "").lower()
+        found = word_tokens(text) & self._words if self._words else set()
+        found.update(kw for kw in self._phrases if self._occurs(text, kw))
+        return found
+
+    def contains_any(self, text: str) -> bool:
+        text = (text or "").lower()
+        if self._words and not self._words.isdisjoint(word_tokens(text)):
+            return True
+        for kw in self._phrases:
+            if self._occurs(text, kw):
+                return True
+        return False
+
+
+class PatternSet:
+    """A list of regexes compiled once into a single alternation (case-insensitive)."""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._regex = re.compile("|".join(f"(?:{p})" for p in self.patterns), re.IGNORECASE)
+
+    def search(self, text: str):
+        return self._regex.search(text or "")
+
+    def contains_any(self, text: str) -> bool:
+        return self._regex.search(text or "") is not None
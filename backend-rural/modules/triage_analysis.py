@@ -0,0 +1,157 @@
+# modules/triage_analysis.py
+
+from modules.llm_async import to_async
+from modules.llm_json import safe_load_json
+from modules.complexity import COMPLEXITY_CRITERIA, ComplexityAssessor
+from modules.symptom_shortlister import SymptomShortlister
+from circuit_breaker import LLMUnavailableError
+from llm_scheduler import LLMOverloadedError
+
+
+class TriageAnalyzer:
+    """
+    One Gemini call that replaces shortlist() + assess() on final submission.
+
+    Returns the same shape the shortlister did (symptoms, raw_text) plus
+    possible_diseases and complexity, so run_route() can take it as-is.
+    If the reply is not usable JSON the two legacy calls are used instead;
+    an unusable complexity value falls back to the keyword rules in
+    ComplexityAssessor.fallback_assess(). Red-flag emergencies skip the
+    LLM classifier: only the symptom shortlist is asked for, and the
+    matched rules go under red_flags / red_flag_evidence. When the LLM is
+    unavailable (circuit open) the keyword rules are used directly and the
+    result carries degraded=True.
+    """
+
+    LEVELS = ("low", "medium", "high")
+
+    def __init__(self, llm_generate_reply, allm_generate_reply=None, shortlister=None, complexity=None):
+        self.llm_generate_reply = llm_generate_reply
+        self.allm_generate_reply = allm_generate_reply or to_async(llm_generate_reply)
+        self.shortlister = shortlister or SymptomShortlister(llm_generate_reply, self.allm_generate_reply)
+        self.complexity = complexity or ComplexityAssessor(llm_generate_reply, self.allm_generate_reply)
+
+    def _prompt(self, patient_text: str) -> str:
+        return (
+            "Role:\n"
+            "You are a clinical triage AI assistant.\n\n"
+
+            f"Free-text patient/nurse description (vitals, initial and adaptive symptoms): '{patient_text}'\n\n"
+
+            "Your Task:\n"
+            "1. Extract ONLY the symptoms mentioned in the description. Do NOT invent symptoms.\n"
+            "2. List up to 3 possible conditions the symptoms could point to (for the care team only).\n"
+            "3. Classify the overall case complexity as low, medium, or high using these criteria:\n\n"
+
+            f"{COMPLEXITY_CRITERIA}"
+
+            "Respond ONLY with JSON in this exact format:\n"
+            "{\n"
+            '  "symptoms": ["symptom 1", "symptom 2"],\n'
+            '  "possible_diseases": ["condition 1", "condition 2"],\n'
+            '  "complexity": "low" | "medium" | "high"\n'
+            "}"
+        )
+
+    @staticmethod
+    def _clean_list(value) -> list:
+        if isinstance(value, str):
+            value = value.split(",")
+        if not isinstance(value, list):
+            return []
+        return [str(v).strip() for v in value if str(v).strip()]
+
+    def _parse_reply(self, reply, patient_text: str):
+        parsed = safe_load_json(reply or "")
+        if not parsed or "symptoms" not in parsed:
+            return None
+
+        level = str(parsed.get("complexity", "")).strip().lower()
+        if level not in self.LEVELS:
+            print(f"⚠️ Triage analysis returned complexity '{level}' — using keyword fallback")
+            level = self.complexity.fallback_assess(patient_text.lower())
+        else:
+            print(f"(Gemini classified complexity as: {level})")
+
+        return {
+            "symptoms": self._clean_list(parsed.get("symptoms")),
+            "possible_diseases": self._clean_list(parsed.get("possible_diseases")),
+            "complexity": level,
+            "raw_text": patient_text,
+        }
+
+    def _red_flags(self, patient_text: str) -> list:
+        flags = self.complexity.red_flags.detect(patient_text)
+        if flags:
+            print(f"🚨 Red flags: {', '.join(f['name'] for f in flags)} — complexity high (no classifier call)")
+        return flags
+
+    def _red_flag_result(self, flags: list, summary: dict) -> dict:
+        return {
+            "symptoms": summary.get("symptoms", []),
+            "possible_diseases": list(dict.fromkeys(f["condition"] for f in flags)),
+            "complexity": "high",
+            "red_flags": [f["name"] for f in flags],
+            "red_flag_evidence": {f["name"]: f["evidence"] for f in flags},
+            "raw_text": summary.get("raw_text", ""),
+        }
+
+    def _legacy_result(self, summary: dict, level: str) -> dict:
+        summary = dict(summary)
+        summary.setdefault("possible_diseases", [])
+        summary["complexity"] = level
+        return summary
+
+    def _degraded_result(self, patient_text: str, error) -> dict:
+        # LLM unavailable: keyword complexity rules only, no second LLM round trip
+        print(f"⚠️ Triage analysis degraded to keyword rules — {error}")
+        return {
+            "symptoms": [],
+            "possible_diseases": [],
+            "complexity": self.complexity.fallback_assess(patient_text.lower()),
+            "raw_text": patient_text,
+            "degraded": True,
+        }
+
+    def analyze(self, patient_text: str) -> dict:
+        flags = self._red_flags(patient_text)
+        if flags:
+            return self._red_flag_result(flags, self.shortlister.shortlist(patient_text))
+
+        try:
+            reply = self.llm_generate_reply([{"role": "user", "content": self._prompt(patient_text)}], call_site="triage")
+            result = self._parse_reply(reply, patient_text)
+            if result:
+                return result
+            print("⚠️ Triage analysis reply was not JSON — falling back to shortlist + assess")
+        except LLMOverloadedError:
+            raise
+        except LLMUnavailableError as e:
+            return self._degraded_result(patient_text, e)
+        except Exception as e:
+            print(f"⚠️ Triage analysis LLM Error: {e}")
+
+        summary = self.shortlister.shortlist(patient_text)
+        return self._legacy_result(summary, self.complexity.assess(summary))
+
+    async def aanalyze(self, patient_text: str) -> dict:
+        """Awaitable twin of analyze()."""
+        flags = self._red_flags(patient_text)
+        if flags:
+            return self._red_flag_result(flags, await self.shortlister.ashortlist(patient_text))
+
+        try:
+            reply = await self.allm_generate_reply([{"role": "user", "content": self._prompt(patient_text)}], call_site="triage")
+            result = self._parse_reply(reply, patient_text)
+            if result:
+                return result
+            print("⚠️ Triage analysis reply was not JSON — falling back to shortlist + assess")
+        except LLMOverloadedError:
+            raise
+        except LLMUnavailableError as e:
+            return self._degraded_result(patient_text, e)
+        except Exception as e:
+            print(f"⚠️ Triage analysis LLM Error: {e}")
+
+        summary = await self.shortlister.ashortlist(patient_text)
+        return self._legacy_result(summary, await self.complexity.aassess(summary))
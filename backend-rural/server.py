@@ -1,7 +1,23 @@
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from modules.routing_pipeline import RoutingPipeline
+from modules.session_store import SessionRecord
+from modules.session_backends import create_session_store
+from modules.speculative import run_speculative
+from modules.llm_json import safe_load_json as _safe_load_json
+from modules.semantic_cache import create_guardrail_caches
+from modules.relevance_rules import RelevancePreClassifier
+from modules.text_scan import KeywordScanner
+from modules.sections import HEADINGS, split_into_sections, medicines_list_from_section, sanitize_medicine_output
 from gemini_llm_wrapper import GeminiLLMWrapper
+from metrics import REGISTRY, MetricsMiddleware
+from circuit_breaker import LLMUnavailableError, get_default_breaker
+from hedging import get_default_hedger
+from deadline import Deadline
+from llm_scheduler import LLMOverloadedError, get_default_scheduler, EMERGENCY, INTERACTIVE, BACKGROUND
+from llm_transport import requires_api_key
+from tracing import TRACER
 from adapter import GeminiAdapter
 from dotenv import load_dotenv
 import os
@@ -10,7 +26,10 @@ from pydantic import BaseModel
 from typing import Dict, List, Optional
 import re
 import json
+import time
+import asyncio
 import traceback
+from contextlib import ExitStack
 
 load_dotenv()
 
@@ -24,15 +43,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ✅ Metrics — per-route latency here, LLM metrics inside the Gemini wrappers
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "path", "status"))
+app.add_middleware(MetricsMiddleware, histogram=HTTP_LATENCY)
+
 # ✅ LLM Setup
 try:
     api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-    if not api_key:
+    if not api_key and requires_api_key():
         raise ValueError("GEMINI_API_KEY not found in environment variables.")
 
     gemini_llm = GeminiLLMWrapper(api_key=api_key)
-    llm_adapter = GeminiAdapter(gemini_llm.generate_reply)
-    router = RoutingPipeline(external_llm_generate=llm_adapter.generate_reply)
+    llm_adapter = GeminiAdapter(
+        gemini_llm.generate_reply,
+        gemini_llm.agenerate_reply,
+        gemini_llm.agenerate_reply_stream,
+    )
+    router = RoutingPipeline(
+        external_llm_generate=llm_adapter.generate_reply,
+        external_llm_agenerate=llm_adapter.agenerate_reply,
+        external_llm_astream=llm_adapter.agenerate_reply_stream,
+    )
     print("✅ Backend Initialized Successfully.")
 except Exception as e:
     print(f"❌ CRITICAL ERROR during backend initialization: {e}")
@@ -41,13 +74,93 @@ except Exception as e:
 # Try to import/instantiate the simplifier (used for final clean PCP/MDT simplification)
 try:
     from agents_helper.simplify import GeminiSimplify
-    simplifier = GeminiSimplify(llm_adapter.generate_reply)
+    simplifier = GeminiSimplify(
+        llm_adapter.generate_reply,
+        llm_adapter.agenerate_reply,
+        llm_adapter.agenerate_reply_stream,
+    )
 except Exception as e:
     simplifier = None
     print(f"⚠️ Could not initialize GeminiSimplify: {e}")
 
-# ✅ Session Store
-SESSION_STORE: Dict[str, dict] = {}
+# ✅ Session Store — memory (default), or sqlite / redis to share cases
+# across uvicorn workers and restarts (see SESSION_BACKEND)
+SESSION_STORE = create_session_store()
+
+ACTIVE_WS_CASES = REGISTRY.gauge("ws_active_cases", "Websocket cases currently being processed.")
+# Sized by a background task, not at scrape time: stats() is a SCAN / COUNT(*)
+# whose cost grows with the number of stored cases
+SESSION_STATS_INTERVAL = float(os.getenv("SESSION_STATS_INTERVAL", "30"))
+SESSION_STORE_SIZE = REGISTRY.gauge(
+    "session_store_entries", f"Cases held by the session store (refreshed every {SESSION_STATS_INTERVAL:g}s).")
+CASE_ROUTES = REGISTRY.counter("case_routes_total", "Processed cases by route.", ("route",))
+BATCH_CASES = REGISTRY.counter("batch_cases_total", "Cases submitted through /api/batch_process, by outcome.",
+                               ("outcome",))
+LLM_BREAKER = get_default_breaker()
+REGISTRY.gauge("llm_circuit_open", "1 while the Gemini circuit breaker is open or half-open.",
+               collect=lambda: 0 if LLM_BREAKER.state == LLM_BREAKER.CLOSED else 1)
+# ✅ Hedged requests (LLM_HEDGE=1): duplicate slow guardrail/complexity/shortlist calls past their p90
+LLM_HEDGER = get_default_hedger()
+# ✅ LLM scheduler: bounded concurrency + rate limit + priority lanes, sheds with 503
+LLM_SCHEDULER = get_default_scheduler()
+
+async def _refresh_session_store_size():
+    while True:
+        try:
+            SESSION_STORE_SIZE.set((await SESSION_STORE.astats()).get("entries", 0))
+        except Exception as e:
+            print(f"⚠️ metrics: could not size the session store: {e}")
+        await asyncio.sleep(SESSION_STATS_INTERVAL)
+
+_background_tasks = set()
+
+@app.on_event("startup")
+async def _start_background_tasks():
+    task = asyncio.create_task(_refresh_session_store_size())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+def _admit(lane: str):
+    """Turn new work away early (503 + Retry-After) instead of queueing it behind a backlog."""
+    retry_after = LLM_SCHEDULER.overloaded(lane)
+    if retry_after:
+        raise HTTPException(503, "⚠️ Server busy — please retry shortly.",
+                            headers={"Retry-After": str(retry_after)})
+
+def _case_lane(text: str):
+    """Red-flag cases jump the LLM queue (None = per-call-site lane)."""
+    if router and router.complexity.red_flags.detect(text or ""):
+        return EMERGENCY
+    return None
+
+@app.exception_handler(LLMOverloadedError)
+async def llm_overloaded_handler(request, exc: LLMOverloadedError):
+    return JSONResponse({"detail": "⚠️ Server busy — please retry shortly."}, status_code=503,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+def _count_route(complexity: str):
+    route = (complexity or "").lower()
+    route = next((r for r in ("low", "medium", "high") if route.startswith(r)), "unknown")
+    CASE_ROUTES.inc(route=route)
+
+# ✅ Semantic guardrail caches — reuse a verdict for near-duplicate inputs
+# (SEMANTIC_CACHE=1; thresholds per guardrail, see modules/semantic_cache.py)
+GUARDRAIL_CACHES = create_guardrail_caches()
+
+# ✅ Local fast path: "3 days", "severe", "yes" are accepted without a Gemini call
+RELEVANCE_FAST_PATH = os.getenv("RELEVANCE_FAST_PATH", "1") == "1"
+RELEVANCE_RULES = RelevancePreClassifier(router.collector.slot_keywords if router else ())
+
+# ✅ Generate the next question while the answer guardrail is still running
+SPECULATIVE_NEXT_QUESTION = os.getenv("SPECULATIVE_NEXT_QUESTION", "1") == "1"
+
+# ✅ Optional fused intake: one Gemini call returns the guardrail verdict
+# plus ranked follow-up candidates (falls back to the two-call flow)
+FUSED_INTAKE = os.getenv("FUSED_INTAKE", "0") == "1"
+
+# ✅ Batch processing (screening camps): cases per request, cases processed at once
+BATCH_MAX_CASES = int(os.getenv("BATCH_MAX_CASES", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
 
 # ✅ Symptom Keywords for extraction
 SYMPTOM_LEXICON = {
@@ -56,123 +169,17 @@ SYMPTOM_LEXICON = {
     "weakness", "diarrhea", "cold"
 }
 
-# ✅ Helpers
-def contains_medicine_dosage(text: str) -> bool:
-    patterns = [
-        r"\b\d+\s?mg\b",
-        r"\b\d+\s?ml\b",
-        r"\b\d+\s?mg\/kg\b",
-        r"\b\d+\s?(?:times|x)\s?(?:a\s)?day\b",
-        r"\btwice\s?a\s?day\b",
-        r"\bthrice\s?a\s?day\b",
-        r"\bevery\s?\d+\s?(?:hours|hrs|h)\b",
-    ]
-    return any(re.search(p, text.lower()) for p in patterns)
-
-def sanitize_medicine_output(text: str) -> str:
-    if contains_medicine_dosage(text):
-        return "Seek a clinical evaluation for safe medication use."
-    return text
+# Compiled once at import (start-of-word match: "vomit" also hits "vomiting")
+SYMPTOM_SCANNER = KeywordScanner(SYMPTOM_LEXICON, boundary="start")
 
+# ✅ Helpers
 def extract_original_symptoms(text: str):
-    text_l = text.lower()
-    return {s for s in SYMPTOM_LEXICON if s in text_l}
-
-# ✅ Robust JSON extractor for Gemini responses
-def _safe_load_json(raw) -> dict:
-    if not isinstance(raw, str):
-        raw = getattr(raw, "text", None) or str(raw)
-
-    cleaned = raw.strip().strip("`").strip()
-    m = re.search(r"\{.*?\}\s*$", cleaned, flags=re.DOTALL)
-    candidate = m.group(0) if m else cleaned
-    try:
-        return json.loads(candidate)
-    except:
-        m2 = re.search(r"\{.*?\}", cleaned, flags=re.DOTALL)
-        if m2:
-            try:
-                return json.loads(m2.group(0))
-            except:
-                pass
-    return {}
-
-# -------------------------
-# SECTION PARSING UTILITIES
-# -------------------------
-HEADINGS = [
-    "CONDITION SUMMARY",
-    "POSSIBLE CAUSES",
-    "NURSE ACTIONS",
-    "ESCALATION CRITERIA",
-    "MEDICINES ADVISED"
-]
-
-_heading_pattern = re.compile(
-    r"(?P<h>CONDITION SUMMARY|POSSIBLE CAUSES|NURSE ACTIONS|ESCALATION CRITERIA|MEDICINES ADVISED)\s*[:\-]?",
-    flags=re.IGNORECASE
-)
-
-def split_into_sections(text: str) -> Dict[str, str]:
-    """
-    Parse text and split into the five headings.
-    Returns dict with keys equal to HEADINGS in UPPER form; values are strings (possibly empty).
-    """
-    if not text:
-        return {h: "" for h in HEADINGS}
-
-    # Normalize whitespace
-    cleaned = text.strip()
-    cleaned = cleaned.replace("**", "")
-
-    # Find all heading matches and their spans
-    matches = list(_heading_pattern.finditer(cleaned))
-    sections = {h: "" for h in HEADINGS}
-
-    if not matches:
-        # No explicit headings — fallback: put everything in CONDITION SUMMARY
-        sections["CONDITION SUMMARY"] = cleaned
-        return sections
-
-    # For each heading, capture content until next heading
-    for idx, m in enumerate(matches):
-        heading = m.group("h").upper()
-        start = m.end()
-        end = matches[idx + 1].start() if idx + 1 < len(matches) else len(cleaned)
-        content = cleaned[start:end].strip()
-        sections[heading] = content
-
-    # Ensure each heading exists (already initialized)
-    return sections
-
-def medicines_list_from_section(med_text: str) -> List[str]:
-    if not med_text:
-        return []
-    # Split on newlines and bullets and commas, keep short meaningful items
-    lines = re.split(r"[\n\r]+", med_text)
-    meds = []
-    for ln in lines:
-        ln = ln.strip(" -•\t")
-        if not ln:
-            continue
-        # Comma-separated fallback
-        for part in ln.split(","):
-            part = part.strip()
-            if part:
-                meds.append(part)
-    # dedupe preserve order
-    seen = set()
-    out = []
-    for m in meds:
-        if m.lower() not in seen:
-            out.append(m)
-            seen.add(m.lower())
-    return out
+    return SYMPTOM_SCANNER.find_all(text)
 
 # -------------------------
 # Guardrails (unchanged)
 # -------------------------
-def check_first_input_with_gemini(text: str):
+async def check_first_input_with_gemini(text: str):
     prompt = f"""
 You are a medical intake guardrail AI. Evaluate if this is a clinically meaningful FIRST patient message.
 
@@ -194,7 +201,19 @@ USER_INPUT: "{text}"
 JSON:
 """.strip()
 
-    raw = gemini_llm.generate_reply([{"role": "user", "content": prompt}])
+    cache = GUARDRAIL_CACHES["first_input"]
+    vec = await cache.aembed(text)
+    cached = cache.lookup(vec)
+    if cached:
+        TRACER.annotate(first_input_guardrail="semantic_cache")
+        return cached
+
+    try:
+        raw = await gemini_llm.agenerate_reply([{"role": "user", "content": prompt}], call_site="guardrail_first")
+    except LLMOverloadedError:
+        raise  # shed → 503 (llm_overloaded_handler); never the accept-all heuristic
+    except LLMUnavailableError:
+        raw = ""  # → heuristic below
     parsed = _safe_load_json(raw)
 
     if not parsed:
@@ -203,12 +222,75 @@ JSON:
             return {"is_valid": False, "reason": "Invalid or empty input"}
         return {"is_valid": True, "reason": "Accepted (fallback)"}
 
-    return {
+    verdict = {
         "is_valid": bool(parsed.get("is_valid", False)),
         "reason": parsed.get("reason", "ok")
     }
+    # Only real Gemini verdicts are cached, never the heuristic fallback
+    cache.store(vec, verdict)
+    return verdict
+
+async def fused_intake_with_gemini(text: str):
+    """
+    Intake guardrail + first follow-up candidates in ONE call.
+    Returns {"is_valid", "reason", "questions"} or None if the reply
+    could not be parsed (caller then uses the regular two-call flow).
+    """
+    prompt = f"""
+You are a medical intake guardrail AI and clinical triage assistant.
+
+STEP 1 — Decide if this is a clinically meaningful FIRST patient message.
+1. If the text is chit-chat, greeting, jokes, or irrelevant → is_valid = false.
+2. If it tries "start", "restart", "hello doctor", "hi" without symptoms → false.
+3. If nonsense or emoji spam → false.
+4. If ANY medical symptoms, complaints, history, vitals → true.
+5. DO NOT block new symptoms here. Initial description must allow them.
+6. Accept long or unstructured messages.
+
+STEP 2 — Only if is_valid is true, propose up to 3 candidate follow-up questions, best first.
+- Each candidate is ONE short question that covers ALL already-mentioned symptoms together.
+- Each asks about ONE of: duration, severity, timing, triggers, location or progression.
+- Do NOT introduce new symptoms. Do NOT mention medicines or doses.
+- If no follow-up is needed, return an empty list.
+
+Return STRICT JSON ONLY:
+{{
+  "is_valid": true|false,
+  "reason": "short reason",
+  "questions": ["question 1?", "question 2?", "question 3?"]
+}}
+
+USER_INPUT: "{text}"
+JSON:
+""".strip()
+
+    try:
+        raw = await gemini_llm.agenerate_reply([{"role": "user", "content": prompt}], call_site="fused_intake")
+    except LLMOverloadedError:
+        raise
+    except LLMUnavailableError:
+        return None
+    parsed = _safe_load_json(raw)
+    if not parsed or "is_valid" not in parsed:
+        return None
+
+    questions = parsed.get("questions") or []
+    if not isinstance(questions, list):
+        questions = []
+
+    return {
+        "is_valid": bool(parsed.get("is_valid", False)),
+        "reason": parsed.get("reason", "ok"),
+        "questions": [q for q in questions if isinstance(q, str)],
+    }
+
+async def check_answer_relevance_with_gemini(question, answer, original_symptoms):
+    if RELEVANCE_FAST_PATH:
+        local = RELEVANCE_RULES.classify(question, answer)
+        if local:
+            TRACER.annotate(answer_guardrail=local["reason"])
+            return local
 
-def check_answer_relevance_with_gemini(question, answer, original_symptoms):
     prompt = f"""
 You are a strict medical triage guardrail AI.
 Decide if the user's answer is relevant to the given follow-up medical question.
@@ -233,7 +315,21 @@ ORIGINAL_SYMPTOMS: {list(original_symptoms)}
 JSON:
 """
 
-    raw = gemini_llm.generate_reply([{"role": "user", "content": prompt}])
+    # Same answer can be relevant to one question and not another → partition by question + case symptoms
+    cache = GUARDRAIL_CACHES["answer_relevance"]
+    partition = " ".join(str(question).lower().split()) + "|" + ",".join(sorted(original_symptoms or ()))
+    vec = await cache.aembed(answer)
+    cached = cache.lookup(vec, partition)
+    if cached:
+        TRACER.annotate(answer_guardrail="semantic_cache")
+        return cached
+
+    try:
+        raw = await gemini_llm.agenerate_reply([{"role": "user", "content": prompt}], call_site="guardrail_answer")
+    except LLMOverloadedError:
+        raise
+    except LLMUnavailableError:
+        raw = ""  # → heuristic below
     parsed = _safe_load_json(raw)
 
     if not parsed:
@@ -248,11 +344,13 @@ JSON:
     
         return {"is_relevant": False, "introduces_new_symptom": False, "reason": "parse fail"}
     
-    return {
+    verdict = {
         "is_relevant": bool(parsed.get("is_relevant", False)),
         "introduces_new_symptom": False,
         "reason": parsed.get("reason", "ok")
     }
+    cache.store(vec, verdict, partition)
+    return verdict
 
 # -------------------------
 # Pydantic models
@@ -281,6 +379,16 @@ class FinalOutput(BaseModel):
     status: Optional[str]
     final_summary_raw: Optional[Dict[str, str]]
     final_summary_simplified: Optional[Dict[str, object]]
+    degradations: Optional[List[str]] = None
+
+class BatchCase(BaseModel):
+    patient_input: str
+    answers: Dict[str, str] = {}
+    ref: Optional[str] = None  # camp token / bed number, echoed back
+
+class BatchInput(BaseModel):
+    cases: List[BatchCase]
+    concurrency: Optional[int] = None  # capped at BATCH_CONCURRENCY
 
 # -------------------------
 # Health
@@ -289,6 +397,47 @@ class FinalOutput(BaseModel):
 def health():
     return {"ok": True}
 
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/case/{case_id}/trace")
+def case_trace(case_id: str, format: str = "otlp"):
+    """Span timeline of one case: OTLP/JSON (default) or format=timeline."""
+    trace = TRACER.timeline(case_id) if format == "timeline" else TRACER.export_otlp(case_id)
+    if trace is None:
+        raise HTTPException(404, "No trace recorded for this case_id")
+    return trace
+
+@app.get("/api/session_stats")
+async def session_stats():
+    stats = await SESSION_STORE.astats()
+    SESSION_STORE_SIZE.set(stats.get("entries", 0))
+    return stats
+
+@app.get("/api/llm_cache_stats")
+def llm_cache_stats():
+    cache = getattr(gemini_llm, "cache", None) if router else None
+    return cache.stats() if cache else {"enabled": False}
+
+@app.get("/api/llm_circuit_stats")
+def llm_circuit_stats():
+    return LLM_BREAKER.stats()
+
+@app.get("/api/llm_hedge_stats")
+def llm_hedge_stats():
+    return LLM_HEDGER.stats()
+
+@app.get("/api/llm_scheduler_stats")
+def llm_scheduler_stats():
+    return LLM_SCHEDULER.stats()
+
+@app.get("/api/guardrail_cache_stats")
+def guardrail_cache_stats():
+    stats = {name: cache.stats() for name, cache in GUARDRAIL_CACHES.items()}
+    stats["relevance_rules"] = RELEVANCE_RULES.stats()
+    return stats
+
 # -------------------------
 # Start case
 # -------------------------
@@ -299,36 +448,60 @@ async def start_case(payload: StartCaseInput):
         raise HTTPException(503, "AI unavailable")
 
     patient_input = payload.patient_input.strip()
+    lane = _case_lane(patient_input)
+    _admit(lane or INTERACTIVE)
+    case_id = str(uuid.uuid4())[:8].upper()
 
-    # ✅ GEMINI FIRST INPUT GUARDRAIL
-    guard = check_first_input_with_gemini(patient_input)
+    with TRACER.span("start_case", case_id=case_id, input_chars=len(patient_input)), LLM_SCHEDULER.case_lane(lane):
+        guard, questions = await _intake(patient_input)
     if not guard.get("is_valid"):
         raise HTTPException(400, f"⚠️ Invalid first input: {guard['reason']}")
 
-    case_id = str(uuid.uuid4())[:8].upper()
-
-    SESSION_STORE[case_id] = {
-        "initial_text": patient_input,
-        "questions": [],
-        "answers": {},
-        "current_round": 0,
-        "max_rounds": 5,
-        "mdt_done": False,
-        "original_symptoms": extract_original_symptoms(patient_input)
-    }
-
-    collected, questions = router.collector.clarification_loop_api(
-        initial_input=patient_input,
-        max_rounds=1,
-        confidence_threshold=70
+    session = SessionRecord(
+        initial_text=patient_input,
+        original_symptoms=extract_original_symptoms(patient_input),
+        max_rounds=5,
     )
 
     first_q = questions[0] if questions else None
     if first_q:
-        SESSION_STORE[case_id]["questions"].append(first_q)
+        session.questions.append(first_q)
+    await SESSION_STORE.aput(case_id, session)
 
     return {"case_id": case_id, "first_follow_up_question": first_q}
 
+async def _intake(patient_input: str):
+    """Returns (guardrail verdict, [first follow-up question] or [])."""
+    if FUSED_INTAKE:
+        fused = await fused_intake_with_gemini(patient_input)
+        if fused is not None:
+            if not fused["is_valid"] or not fused["questions"]:
+                return fused, []
+            first_q = router.collector.select_followup(patient_input, [], fused["questions"])
+            if first_q:
+                return fused, [first_q]
+            # every candidate failed local validation → regular generator (retries + fallback)
+            _, questions = await router.collector.aclarification_loop_api(
+                initial_input=patient_input,
+                max_rounds=1,
+                confidence_threshold=70
+            )
+            return fused, questions
+
+    # ✅ GEMINI FIRST INPUT GUARDRAIL + first follow-up question, concurrently
+    # (question generation is cancelled if the guardrail rejects the input)
+    guard, first_round = await run_speculative(
+        check_first_input_with_gemini(patient_input),
+        router.collector.aclarification_loop_api(
+            initial_input=patient_input,
+            max_rounds=1,
+            confidence_threshold=70
+        ),
+        accept=lambda g: g.get("is_valid"),
+    )
+    _, questions = first_round or (patient_input, [])
+    return guard, questions
+
 # -------------------------
 # Next question
 # -------------------------
@@ -338,82 +511,299 @@ async def next_question(payload: AnswerInput):
     case_id = payload.case_id
     answers = payload.answers or {}
 
-    session = SESSION_STORE.get(case_id)
+    session = await SESSION_STORE.aget(case_id)
     if not session:
         return {"done": False, "next_question": None, "warning": "⚠️ Invalid case."}
 
-    if session["mdt_done"]:
+    if session.mdt_done:
         return {"done": True, "next_question": None}
 
-    if not session["questions"]:
+    if not session.questions:
         return {"done": False, "next_question": None, "warning": "⚠️ No active question."}
 
-    current_q = session["questions"][-1]
+    current_q = session.questions[-1]
 
     user_answer = answers.get(current_q) or next(iter(answers.values()), None)
     if not user_answer:
         return {"done": False, "next_question": current_q, "warning": "⚠️ Please answer the question"}
 
-    # ✅ Guardrail
-    guard = check_answer_relevance_with_gemini(
+    lane = _case_lane(session.initial_text + " " + user_answer)
+    _admit(lane or INTERACTIVE)
+
+    guard_coro = check_answer_relevance_with_gemini(
         question=current_q,
         answer=user_answer,
-        original_symptoms=session["original_symptoms"]
+        original_symptoms=session.original_symptoms
     )
+    accepted_context = session.initial_text + f" | {current_q}: {user_answer}"
+    is_last_round = session.current_round + 1 >= session.max_rounds
+
+    with TRACER.span("next_question", case_id=case_id, round=session.current_round + 1) as span, \
+            LLM_SCHEDULER.case_lane(lane):
+        if SPECULATIVE_NEXT_QUESTION and not is_last_round:
+            # ✅ Guardrail + next question in parallel (dropped if the guardrail rejects)
+            guard, speculative = await run_speculative(
+                guard_coro,
+                router.collector.agenerate_next_question_api(
+                    collected_context=accepted_context,
+                    new_answers={},
+                    asked_questions=list(session.questions),
+                    confidence_threshold=70
+                ),
+                accept=lambda g: g["is_relevant"],
+            )
+        else:
+            # ✅ Guardrail
+            guard, speculative = await guard_coro, None
+        if span: span.set(relevant=bool(guard["is_relevant"]))
 
     if not guard["is_relevant"]:
         return {"done": False, "next_question": current_q,
                 "warning": "⚠️ That doesn't answer the question."}
 
     # ✅ Save valid answer
-    session["answers"][current_q] = user_answer
-    session["initial_text"] += f" | {current_q}: {user_answer}"
-    session["current_round"] += 1
+    session.answers[current_q] = user_answer
+    session.initial_text = accepted_context
+    session.current_round += 1
 
-    if session["current_round"] >= session["max_rounds"]:
-        session["mdt_done"] = True
+    if session.current_round >= session.max_rounds:
+        session.mdt_done = True
+        await SESSION_STORE.aput(case_id, session)
         return {"done": True, "next_question": None}
 
-    done, next_q, updated = router.collector.generate_next_question_api(
-        collected_context=session["initial_text"],
-        new_answers={},
-        asked_questions=session["questions"],
-        confidence_threshold=70
-    )
+    if speculative is not None:
+        done, next_q, updated = speculative
+    else:
+        with TRACER.span("next_question.generate", case_id=case_id), LLM_SCHEDULER.case_lane(lane):
+            done, next_q, updated = await router.collector.agenerate_next_question_api(
+                collected_context=session.initial_text,
+                new_answers={},
+                asked_questions=session.questions,
+                confidence_threshold=70
+            )
 
-    session["initial_text"] = updated
+    session.initial_text = updated
 
     if not next_q or done:
-        session["mdt_done"] = True
+        session.mdt_done = True
+        await SESSION_STORE.aput(case_id, session)
         return {"done": True, "next_question": None}
 
-    session["questions"].append(next_q)
+    session.questions.append(next_q)
+    await SESSION_STORE.aput(case_id, session)
     return {"done": False, "next_question": next_q}
 
+async def _simplify(text: str, mode: str, on_delta=None, deadline: Deadline = None, on_reset=None) -> str:
+    """
+    on_reset(reason) — awaited when the simplified stream was cut off after
+    deltas were forwarded, so the client drops them before the raw sections
+    arrive in the final result.
+    """
+    with TRACER.span("postprocess.simplify", mode=mode, input_chars=len(text or "")):
+        # Out of time budget: raw sections instead of a late answer
+        if deadline and not deadline.affords("simplify"):
+            deadline.degrade("simplify_skipped")
+            return text
+        streamed = []
+
+        async def forward(chunk: str):
+            streamed.append(chunk)
+            res = on_delta(chunk)
+            if asyncio.iscoroutine(res):
+                await res
+
+        async def reset(reason: str):
+            if streamed and on_reset:
+                TRACER.annotate(simplify_stream_reset=reason)
+                await on_reset(reason)
+
+        try:
+            call = simplifier.asimplify_text(text, mode=mode, on_delta=forward if on_delta else None)
+            if deadline:
+                return await asyncio.wait_for(call, timeout=deadline.remaining())
+            return await call
+        except asyncio.TimeoutError:
+            if deadline:
+                deadline.degrade("simplify_skipped")
+            await reset("simplify_skipped")
+            return text
+        except LLMUnavailableError as e:
+            # Degraded mode: keep the raw sections
+            print(f"⚠️ Simplifier skipped — {e}")
+            await reset("llm_unavailable")
+            return text
+
 # -------------------------
 # Process final answers (REST)
 # -------------------------
 @app.post("/api/process_final_answers", response_model=FinalOutput)
 async def process_final_answers(payload: dict):
+    case_id = payload.get("case_id")
+    answers = payload.get("answers", {})
+    session = await _load_session(case_id)
+    _admit_final_case(session, answers)
+    return await _process_final_case(case_id, session, answers)
+
+# -------------------------
+# Process final answers (SSE: progress + token deltas + final)
+# -------------------------
+@app.post("/api/process_final_answers/stream")
+async def process_final_answers_stream(payload: dict):
 
     case_id = payload.get("case_id")
     answers = payload.get("answers", {})
 
-    session = SESSION_STORE.get(case_id)
+    session = await _load_session(case_id)
+    _admit_final_case(session, answers)
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run():
+        try:
+            final_res = await _process_final_case(case_id, session, answers, emit=queue.put)
+            await queue.put({"type": "final", "result": final_res})
+        except LLMOverloadedError as e:
+            await queue.put({"type": "error", "message": "⚠️ Server busy — please retry shortly.",
+                             "retry_after": e.retry_after})
+        except Exception as e:
+            traceback.print_exc()
+            await queue.put({"type": "error", "message": str(e)})
+        finally:
+            await queue.put(None)
+
+    async def events():
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                msg = await queue.get()
+                if msg is None:
+                    break
+                yield f"event: {msg['type']}\ndata: {json.dumps(msg, ensure_ascii=False)}\n\n"
+        finally:
+            # client went away → stop spending LLM calls on this case
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _load_session(case_id) -> SessionRecord:
+    """One store read per final-answers request; the record is passed down from here."""
+    session = await SESSION_STORE.aget(case_id)
     if not session:
         raise HTTPException(404, "Invalid case_id")
+    return session
 
-    for q, a in answers.items():
-        session["initial_text"] += f" | {q}: {a}"
+def _final_case_lane(session: SessionRecord, answers):
+    text = session.initial_text + " " + " ".join(map(str, (answers or {}).values()))
+    return _case_lane(text)
 
-    collected = session["initial_text"]
+def _admit_final_case(session: SessionRecord, answers):
+    _admit(_final_case_lane(session, answers) or BACKGROUND)
 
-    # Shortlist & complexity
-    summary = router.shortlister.shortlist(collected)
-    complexity = router.complexity.assess(summary)
+def _emergency_checklist(summary: dict) -> dict:
+    """Fixed high-risk result: the websocket flow shows it instead of waiting on the MDT."""
+    return {
+        "route": "high",
+        "status": "🚨 High-Risk Case Identified — Immediate Medical Attention Required",
+        "symptoms": summary.get("symptoms", []),
+        "specialists_involved": [],
+        "specialist_discussion": "",
+        "moderator_technical_summary": (
+            "This case has been assessed as HIGH-RISK based on the symptom pattern. "
+            "MDT processing is bypassed to avoid delay. Immediate escalation recommended."
+        ),
+        "final_summary_simplified": {
+            "CONDITION SUMMARY": (
+                "The patient's symptoms indicate a potentially serious or rapidly progressing condition "
+                "that requires urgent medical evaluation."
+            ),
+            "POSSIBLE CAUSES": (
+                "Severe infection, acute respiratory distress, systemic illness, or other emergencies. "
+                "Exact diagnosis requires clinical examination."
+            ),
+            "NURSE ACTIONS": (
+                "• Stay with the patient and ensure stability.\n"
+                "• Assess airway, breathing, circulation (ABC).\n"
+                "• Monitor vitals: temperature, SpO₂, BP, HR.\n"
+                "• Prepare for urgent escalation to an emergency doctor or unit.\n"
+                "• Keep the patient comfortable and supported."
+            ),
+            "ESCALATION CRITERIA": (
+                "• Difficulty breathing or shortness of breath.\n"
+                "• Chest pain or persistent pressure.\n"
+                "• Confusion, drowsiness, or altered mental state.\n"
+                "• Rapidly worsening symptoms.\n"
+                "• Severe vomiting or dehydration.\n"
+                "• Any major drop in vitals."
+            ),
+            "MEDICINES ADVISED": []
+        }
+    }
+
+async def _process_final_case(case_id, session: SessionRecord, answers, emit=None, emergency_checklist=False):
+    """
+    Shared body of the REST, SSE, batch and websocket final-answer paths.
+    session — the case's record, already loaded by the caller.
+    emit(msg) — optional async callable receiving progress / symptoms / delta dicts.
+    emergency_checklist — high cases return _emergency_checklist() instead of running the route.
+    """
+    with TRACER.span("process_final_answers", case_id=case_id, streamed=emit is not None), \
+            LLM_SCHEDULER.case_lane(_final_case_lane(session, answers)):
+        return await _run_final_case(case_id, session, answers, emit, emergency_checklist)
+
+async def _run_final_case(case_id, session: SessionRecord, answers, emit=None, emergency_checklist=False):
+    deadline = Deadline()
+
+    async def progress_cb(m: str):
+        await emit({"type": "progress", "message": m})
+
+    async def delta_cb(stage: str, text: str):
+        await emit({"type": "delta", "stage": stage, "text": text})
+
+    def simplify_delta():
+        if not emit:
+            return None
+        return lambda text: delta_cb("simplifier", text)
+
+    def simplify_reset():
+        if not emit:
+            return None
+        return lambda reason: emit({"type": "reset", "stage": "simplifier", "reason": reason})
+
+    for q, a in answers.items():
+        session.initial_text += f" | {q}: {a}"
+    await SESSION_STORE.aput(case_id, session)
+
+    collected = session.initial_text
+
+    # Shortlist & complexity (one fused triage call)
+    if emit:
+        await progress_cb("🧠 Shortlisting symptoms...")
+    with TRACER.span("triage"):
+        summary = await router.triage.aanalyze(collected)
+    if emit:
+        await emit({"type": "symptoms", "symptoms": summary.get("symptoms", [])})
+        await progress_cb("✅ Shortlisting done")
+    complexity = summary["complexity"]
+    _count_route(complexity)
+    if complexity == "high":
+        LLM_SCHEDULER.escalate(EMERGENCY)
+    if emit:
+        await progress_cb(f"✅ Complexity: {complexity}")
+    if complexity == "high" and emergency_checklist:
+        return _emergency_checklist(summary)
 
     # Run route (calls low/medium/high agents inside pipeline)
-    final_res = await router.run_route(complexity, collected, summary, case_id)
+    final_res = await router.run_route(
+        complexity, collected, summary, case_id,
+        progress_callback=progress_cb if emit else None,
+        delta_callback=delta_cb if emit else None,
+        deadline=deadline,
+    )
 
     # Post-process: produce raw and simplified 5-section summaries (S2)
     try:
@@ -468,7 +858,8 @@ async def process_final_answers(payload: dict):
             if complexity == "low":
                 # we want to simplify PCP raw text and keep headings exact
                 pcp_raw_text = chosen_raw 
-                simplified_text = simplifier.simplify_text(pcp_raw_text, mode="pcp")
+                simplified_text = await _simplify(pcp_raw_text, mode="pcp", on_delta=simplify_delta(), deadline=deadline,
+                                                  on_reset=simplify_reset())
                 simplified_sections = split_into_sections(simplified_text)
                 final_summary_simplified.update(simplified_sections)
 
@@ -484,14 +875,16 @@ async def process_final_answers(payload: dict):
                     # fallback: attempt to reconstruct from discussion_text
                     mdt_input += discussion_text or chosen_raw or ""
 
-                simplified_text = simplifier.simplify_text(mdt_input, mode="mdt")
+                simplified_text = await _simplify(mdt_input, mode="mdt", on_delta=simplify_delta(), deadline=deadline,
+                                                  on_reset=simplify_reset())
                 simplified_sections = split_into_sections(simplified_text)
                 final_summary_simplified.update(simplified_sections)
 
             else:
                 # For high or unknown: attempt to simplify whatever we have in PCP mode
                 any_text = chosen_raw or "No detailed summary available."
-                simplified_text = simplifier.simplify_text(any_text, mode="pcp")
+                simplified_text = await _simplify(any_text, mode="pcp", on_delta=simplify_delta(), deadline=deadline,
+                                                  on_reset=simplify_reset())
                 simplified_sections = split_into_sections(simplified_text)
                 final_summary_simplified.update(simplified_sections)
         else:
@@ -526,233 +919,168 @@ async def process_final_answers(payload: dict):
         print("⚠️ Error during final post-processing:", e)
         traceback.print_exc()
 
-    session["mdt_done"] = True
+    session.mdt_done = True
+    await SESSION_STORE.aput(case_id, session)
 
     if final_res.get("patient_friendly_advice"):
         final_res["patient_friendly_advice"] = sanitize_medicine_output(
             final_res["patient_friendly_advice"]
         )
 
+    deadline.merge_into(final_res)
     final_res["status"] = (
-        "🧠 Specialists discussion completed."
+        "⚠️ AI assistant unavailable — standard safety checklist shown."
+        if "llm_unavailable" in (final_res.get("degradations") or [])
+        else "⏱️ Case processed in shortened form to stay within the time budget."
+        if deadline.applied
+        else "🧠 Specialists discussion completed."
         if complexity == "medium"
         else "✅ Case processed successfully."
     )
 
-    print("\n===== FINAL OUTPUT (REST API) =====")
+    print("\n===== FINAL OUTPUT =====")
     print(json.dumps(final_res, indent=2, ensure_ascii=False))
-    print("==================================\n")
+    print("========================\n")
 
 
     return final_res
 
 # -------------------------
-# WEBSOCKET MDT (progress + final)
+# Batch processing (NDJSON: one line per finished case, then a summary)
 # -------------------------
+@app.post("/api/batch_process")
+async def batch_process(payload: BatchInput):
+
+    if not router:
+        raise HTTPException(503, "AI unavailable")
+    if not payload.cases:
+        raise HTTPException(400, "No cases submitted")
+    if len(payload.cases) > BATCH_MAX_CASES:
+        raise HTTPException(413, f"At most {BATCH_MAX_CASES} cases per batch")
+    # Batches are background work; red-flag cases inside still get the emergency lane
+    _admit(BACKGROUND)
+
+    batch_id = str(uuid.uuid4())[:8].upper()
+    concurrency = max(1, min(payload.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+    limit = asyncio.Semaphore(concurrency)
+    queue: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+
+    async def run_one(index: int, case: BatchCase):
+        async with limit:
+            line = {"type": "case", "index": index, "ref": case.ref}
+            case_started = time.perf_counter()
+            try:
+                line.update(await _batch_case(batch_id, index, case))
+            except LLMOverloadedError as e:
+                line.update(type="error", message="⚠️ Server busy — case not processed.", retry_after=e.retry_after)
+            except HTTPException as e:
+                line.update(type="error", message=e.detail)
+            except Exception as e:
+                traceback.print_exc()
+                line.update(type="error", message=str(e))
+            line["elapsed_s"] = round(time.perf_counter() - case_started, 2)
+            BATCH_CASES.inc(outcome="ok" if line["type"] == "case" else "error")
+            await queue.put(line)
+
+    async def lines():
+        tasks = [asyncio.create_task(run_one(i, case)) for i, case in enumerate(payload.cases)]
+        durations, routes = [], {}
+        try:
+            for _ in tasks:
+                line = await queue.get()
+                if line["type"] == "case":
+                    durations.append(line["elapsed_s"])
+                    route = line["result"].get("route") or "unknown"
+                    routes[route] = routes.get(route, 0) + 1
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+        finally:
+            # client went away → stop spending LLM calls on the rest of the batch
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        elapsed = time.perf_counter() - started
+        durations.sort()
+        summary = {
+            "type": "summary",
+            "batch_id": batch_id,
+            "cases": len(tasks),
+            "succeeded": len(durations),
+            "failed": len(tasks) - len(durations),
+            "concurrency": concurrency,
+            "elapsed_s": round(elapsed, 2),
+            "cases_per_minute": round(60 * len(durations) / elapsed, 1) if elapsed else None,
+            "case_seconds": {
+                "p50": durations[len(durations) // 2],
+                "p95": durations[min(len(durations) - 1, int(0.95 * len(durations)))],
+                "max": durations[-1],
+            } if durations else None,
+            "routes": routes,
+        }
+        print(f"📦 Batch {batch_id}: {len(durations)}/{len(tasks)} cases in {elapsed:.1f}s "
+              f"({summary['cases_per_minute']}/min, concurrency {concurrency})")
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Batch-Id": batch_id})
+
+async def _batch_case(batch_id: str, index: int, case: BatchCase) -> dict:
+    """One batch entry: the start_case guardrail, then the final-answers path with its pre-answered follow-ups."""
+    patient_input = case.patient_input.strip()
+    case_id = f"{batch_id}-{index + 1}"
+
+    with TRACER.span("batch_intake", case_id=case_id, input_chars=len(patient_input)), \
+            LLM_SCHEDULER.case_lane(_case_lane(patient_input)):
+        guard = await check_first_input_with_gemini(patient_input)
+    if not guard.get("is_valid"):
+        raise HTTPException(400, f"⚠️ Invalid first input: {guard['reason']}")
+
+    session = SessionRecord(
+        initial_text=patient_input,
+        original_symptoms=extract_original_symptoms(patient_input),
+        max_rounds=5,
+    )
+    await SESSION_STORE.aput(case_id, session)
+    return {"case_id": case_id, "result": await _process_final_case(case_id, session, case.answers)}
+
 # -------------------------
 # WEBSOCKET MDT (progress + final)
 # -------------------------
 @app.websocket("/ws/process_case")
 async def process_case_websocket(websocket: WebSocket):
     await websocket.accept()
+    ACTIVE_WS_CASES.inc()
+    trace_scope = ExitStack()
     try:
         payload = await websocket.receive_json()
         case_id = payload.get("case_id")
         answers = payload.get("answers", {})
+        trace_scope.enter_context(TRACER.span("ws_process_case", case_id=case_id))
 
-        session = SESSION_STORE.get(case_id)
+        session = await SESSION_STORE.aget(case_id)
         if not session:
             await websocket.send_json({"type": "error", "message": "Invalid case_id"})
             return
 
-        for q, a in answers.items():
-            session["initial_text"] += f" | {q}: {a}"
-
-        collected = session["initial_text"]
-
-        # small helper to send dicts (NO RECURSION)
-        async def send(msg: dict):
-            await websocket.send_json(msg)
-
-        # -------------------------
-        # SHORTLISTING
-        # -------------------------
-        await send({"type": "progress", "message": "🧠 Shortlisting symptoms..."})
-
-        summary = router.shortlister.shortlist(collected)
-
-        # ⭐ NEW — Send symptoms immediately
-        await send({
-            "type": "symptoms",
-            "symptoms": summary.get("symptoms", [])
-        })
-
-        await send({"type": "progress", "message": "✅ Shortlisting done"})
-
-        # -------------------------
-        # COMPLEXITY
-        # -------------------------
-        complexity = router.complexity.assess(summary)
-        await send({"type": "progress", "message": f"✅ Complexity: {complexity}"})
-
-
-        # -------------------------
-        # EMERGENCY SHORT-CIRCUIT
-        # -------------------------
-        if complexity.lower().startswith("high"):
-            emergency_summary = {
-                "route": "high",
-                "status": "🚨 High-Risk Case Identified — Immediate Medical Attention Required",
-                "symptoms": summary.get("symptoms", []),
-                "specialists_involved": [],
-                "specialist_discussion": "",
-                "moderator_technical_summary": (
-                    "This case has been assessed as HIGH-RISK based on the symptom pattern. "
-                    "MDT processing is bypassed to avoid delay. Immediate escalation recommended."
-                ),
-                "final_summary_simplified": {
-                    "CONDITION SUMMARY": (
-                        "The patient's symptoms indicate a potentially serious or rapidly progressing condition "
-                        "that requires urgent medical evaluation."
-                    ),
-                    "POSSIBLE CAUSES": (
-                        "Severe infection, acute respiratory distress, systemic illness, or other emergencies. "
-                        "Exact diagnosis requires clinical examination."
-                    ),
-                    "NURSE ACTIONS": (
-                        "• Stay with the patient and ensure stability.\n"
-                        "• Assess airway, breathing, circulation (ABC).\n"
-                        "• Monitor vitals: temperature, SpO₂, BP, HR.\n"
-                        "• Prepare for urgent escalation to an emergency doctor or unit.\n"
-                        "• Keep the patient comfortable and supported."
-                    ),
-                    "ESCALATION CRITERIA": (
-                        "• Difficulty breathing or shortness of breath.\n"
-                        "• Chest pain or persistent pressure.\n"
-                        "• Confusion, drowsiness, or altered mental state.\n"
-                        "• Rapidly worsening symptoms.\n"
-                        "• Severe vomiting or dehydration.\n"
-                        "• Any major drop in vitals."
-                    ),
-                    "MEDICINES ADVISED": []
-                }
-            }
-
-            await websocket.send_json({"type": "final", "result": emergency_summary})
-            await websocket.close()
+        retry_after = LLM_SCHEDULER.overloaded(_final_case_lane(session, answers) or BACKGROUND)
+        if retry_after:
+            await websocket.send_json({"type": "error", "message": "⚠️ Server busy — please retry shortly.",
+                                       "retry_after": retry_after})
             return
 
-        # -------------------------
-        # MDT PIPELINE (ASYNC)
-        # -------------------------
-        async def progress_cb(m: str):
-            await websocket.send_json({"type": "progress", "message": m})
-
-        final_res = await router.run_route(
-            complexity,
-            collected,
-            summary,
-            case_id,
-            progress_callback=progress_cb,
-        )
-
-        # -------------------------
-        # POST-PROCESSING (same as REST)
-        # -------------------------
-        try:
-            raw_text_candidates = []
-            for k in ("advice", "advice_full", "pcp_full", "patient_friendly_advice",
-                      "final_text", "final_summary_raw", "mdt_summary_raw",
-                      "moderator_reply", "discussion_text"):
-                v = final_res.get(k)
-                if isinstance(v, str) and v.strip():
-                    raw_text_candidates.append(v.strip())
-
-            specialists = final_res.get("specialists") or final_res.get("specialists_involved") or []
-            # Correct: get the actual discussion from MDT engine
-            discussion_text = (
-                final_res.get("discussion_text")     # always present from MDTAgentGroup
-                or final_res.get("specialist_discussion")
-                or final_res.get("mdt_discussion")
-                or ""
-            )
-
-
-            raw_mdt = final_res.get("mdt_summary_raw") or final_res.get("moderator_technical_summary")
-            chosen_raw = raw_mdt or (raw_text_candidates[0] if raw_text_candidates else "")
-            if not chosen_raw and discussion_text:
-                chosen_raw = discussion_text
-
-            final_summary_raw = split_into_sections(chosen_raw)
-
-            raw_meds = final_res.get("medicines") or final_res.get("medicines_advised") or final_res.get("medicines_advised_list")
-            if raw_meds and isinstance(raw_meds, (list, tuple)):
-                final_summary_raw["MEDICINES ADVISED"] = "\n".join(raw_meds)
-
-            final_summary_simplified = {h: "" for h in HEADINGS}
-
-            if simplifier:
-                if complexity.lower().startswith("low"):
-                    simplified = simplifier.simplify_text(chosen_raw, mode="pcp")
-                    final_summary_simplified.update(split_into_sections(simplified))
-
-                elif complexity.lower().startswith("medium"):
-                    mdt_input = ""
-                    if specialists:
-                        mdt_input += f"Specialists involved: {', '.join(specialists)}\n\n"
-                    mdt_input += chosen_raw or discussion_text or ""
-                    simplified = simplifier.simplify_text(mdt_input, mode="mdt")
-                    final_summary_simplified.update(split_into_sections(simplified))
-
-                else:
-                    simplified = simplifier.simplify_text(chosen_raw or "No summary", mode="pcp")
-                    final_summary_simplified.update(split_into_sections(simplified))
-            else:
-                final_summary_simplified = final_summary_raw.copy()
-
-            meds_list = medicines_list_from_section(
-                final_summary_simplified.get("MEDICINES ADVISED", "") or
-                final_summary_raw.get("MEDICINES ADVISED", "")
-            )
-
-            final_res["final_summary_raw"] = final_summary_raw
-            final_res["final_summary_simplified"] = {
-                "CONDITION SUMMARY": final_summary_simplified.get("CONDITION SUMMARY", ""),
-                "POSSIBLE CAUSES": final_summary_simplified.get("POSSIBLE CAUSES", ""),
-                "NURSE ACTIONS": final_summary_simplified.get("NURSE ACTIONS", ""),
-                "ESCALATION CRITERIA": final_summary_simplified.get("ESCALATION CRITERIA", ""),
-                "MEDICINES ADVISED": meds_list
-            }
-
-            final_res["route"] = final_res.get("route") or complexity
-            final_res["specialists_involved"] = specialists
-            final_res["specialist_discussion"] = discussion_text or ""
-            final_res["moderator_technical_summary"] = (
-                final_res.get("moderator_technical_summary") or chosen_raw
-            )
-            final_res["patient_friendly_advice"] = final_res.get("patient_friendly_advice") or ""
-            final_res["symptoms"] = final_res.get("symptoms") or summary.get("symptoms") or []
-            final_res["possible_diseases"] = final_res.get("possible_diseases") or summary.get("possible_diseases") or []
-            final_res["medicines_advised"] = meds_list
-
-        except Exception as e:
-            print("⚠️ Error during websocket final post-processing:", e)
-            traceback.print_exc()
-
-        if final_res.get("patient_friendly_advice"):
-            final_res["patient_friendly_advice"] = sanitize_medicine_output(
-                final_res["patient_friendly_advice"]
-            )
-
-        print("\n===== FINAL OUTPUT (WEBSOCKET) =====")
-        print(json.dumps(final_res, indent=2, ensure_ascii=False))
-        print("====================================\n")
-
+        final_res = await _process_final_case(case_id, session, answers, emit=websocket.send_json,
+                                              emergency_checklist=True)
         await websocket.send_json({"type": "final", "result": final_res})
 
+    except LLMOverloadedError as e:
+        await websocket.send_json({"type": "error", "message": "⚠️ Server busy — please retry shortly.",
+                                   "retry_after": e.retry_after})
     except WebSocketDisconnect:
         print("⚠️ WebSocket disconnected")
+        TRACER.annotate(disconnected=True)
     finally:
+        trace_scope.close()
+        ACTIVE_WS_CASES.dec()
         try:
             await websocket.close()
         except:
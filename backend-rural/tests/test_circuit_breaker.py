@@ -0,0 +1,105 @@
+# tests/test_circuit_breaker.py
+"""
+CircuitBreaker state transitions on a controlled clock:
+closed → open → half-open → closed / re-open.
+
+    python -m pytest tests/test_circuit_breaker.py
+    python -m unittest tests.test_circuit_breaker
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_breaker import CircuitBreaker
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        patcher = mock.patch("circuit_breaker.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(window=10, min_calls=4, failure_rate=0.5, slow_seconds=5.0,
+                                      slow_rate=0.75, open_seconds=30.0, half_open_probes=1)
+
+    def _trip(self):
+        for _ in range(4):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_stays_closed_below_min_calls_and_failure_rate(self):
+        for _ in range(3):
+            self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)   # 3 < min_calls
+
+        breaker = CircuitBreaker(window=10, min_calls=4, failure_rate=0.5)
+        for ok in (True, True, True, False, True, False):
+            breaker.record(ok, 0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)        # 2/6 < 0.5
+
+    def test_failure_rate_opens_and_rejects_while_open(self):
+        self._trip()
+        self.assertEqual(self.breaker.times_opened, 1)
+        self.clock.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.rejected, 2)
+
+    def test_slow_calls_open_the_circuit(self):
+        for ok_seconds in (6.0, 7.0, 5.0, 0.1):
+            self.breaker.record(True, ok_seconds)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)      # 3/4 slow >= 0.75
+
+    def test_half_open_probe_success_closes(self):
+        self._trip()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())                         # only one probe at a time
+
+        self.breaker.record(True, 0.2)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.stats()["window_calls"], 0)
+        self.assertTrue(self.breaker.allow())
+
+    def test_half_open_probe_failure_or_slow_success_reopens(self):
+        self._trip()
+        for outcome in ((False, 0.2), (True, 9.0)):
+            with self.subTest(outcome=outcome):
+                self.clock.now += 30
+                self.assertTrue(self.breaker.allow())
+                self.breaker.record(*outcome)
+                self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+                self.assertFalse(self.breaker.allow())
+
+    def test_lost_probe_does_not_wedge_half_open(self):
+        self._trip()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())          # probe never reports back (cancelled)
+        self.clock.now += 10
+        self.assertFalse(self.breaker.allow())
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())          # a new probe after open_seconds
+
+    def test_disabled_breaker_always_allows(self):
+        breaker = CircuitBreaker(min_calls=1, enabled=False)
+        breaker.record(False, 0.1)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# tests/test_hedging.py
+"""
+RequestHedger: no hedge before enough latency samples, a backup after
+the call site's quantile delay, the hedge budget and the can_hedge veto.
+
+    python -m pytest tests/test_hedging.py
+    python -m unittest tests.test_hedging
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hedging import RequestHedger
+
+
+class _Calls:
+    """make_call(): the n-th call sleeps delays[n] and returns f"reply {n}" (or raises)."""
+
+    def __init__(self, *delays, fail=()):
+        self.delays = delays
+        self.fail = fail
+        self.started = 0
+
+    async def __call__(self):
+        n = self.started
+        self.started += 1
+        await asyncio.sleep(self.delays[min(n, len(self.delays) - 1)])
+        if n in self.fail:
+            raise RuntimeError(f"call {n} failed")
+        return f"reply {n}"
+
+
+def _hedger(**kwargs):
+    options = dict(sites="triage", min_samples=3, min_delay=0.02, max_ratio=1.0, burst=2.0)
+    options.update(kwargs)
+    return RequestHedger(**options)
+
+
+async def _warm_up(hedger, samples=3):
+    for _ in range(samples):
+        await hedger.run("triage", _Calls(0.001))
+
+
+class RequestHedgerTest(unittest.TestCase):
+    def test_slow_primary_is_beaten_by_the_backup(self):
+        async def scenario():
+            hedger = _hedger()
+            await _warm_up(hedger)
+            calls = _Calls(0.5, 0.001)
+            return hedger, calls, await hedger.run("triage", calls)
+
+        hedger, calls, result = asyncio.run(scenario())
+        self.assertEqual((result, calls.started), ("reply 1", 2))
+        site = hedger.stats()["per_site"]["triage"]
+        self.assertEqual((site["hedges"], site["hedge_wins"]), (1, 1))
+
+    def test_no_hedge_without_samples_other_sites_or_when_vetoed(self):
+        async def scenario():
+            hedger = _hedger()
+            cold = _Calls(0.05, 0.001)
+            cold_result = await hedger.run("triage", cold)
+            await _warm_up(hedger)
+            other = _Calls(0.05, 0.001)
+            other_result = await hedger.run("mdt_moderator", other)
+            vetoed = _Calls(0.05, 0.001)
+            vetoed_result = await hedger.run("triage", vetoed, can_hedge=lambda: False)
+            return (cold, cold_result), (other, other_result), (vetoed, vetoed_result)
+
+        for calls, result in asyncio.run(scenario()):
+            self.assertEqual((result, calls.started), ("reply 0", 1))
+
+    def test_budget_limits_hedges(self):
+        async def scenario():
+            hedger = _hedger(max_ratio=0.5, burst=1.0)
+            await _warm_up(hedger)
+            fired = []
+            for _ in range(3):
+                calls = _Calls(0.05, 0.001)
+                await hedger.run("triage", calls)
+                fired.append(calls.started == 2)
+            return fired
+
+        # every request earns 0.5 of a token (capped at 1); a hedge spends a whole one
+        self.assertEqual(asyncio.run(scenario()), [True, False, True])
+
+    def test_failed_backup_falls_back_to_primary(self):
+        async def scenario():
+            hedger = _hedger()
+            await _warm_up(hedger)
+            return await hedger.run("triage", _Calls(0.08, 0.001, fail=(1,)))
+
+        self.assertEqual(asyncio.run(scenario()), "reply 0")
+
+    def test_both_failing_raises(self):
+        async def scenario():
+            hedger = _hedger()
+            await _warm_up(hedger)
+            await hedger.run("triage", _Calls(0.05, 0.001, fail=(0, 1)))
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+# tests/test_llm_cache.py
+"""
+LLMResponseCache: key normalisation, per-call-site opt-in, LRU / TTL in
+memory and the SQLite tier shared across instances.
+
+    python -m pytest tests/test_llm_cache.py
+    python -m unittest tests.test_llm_cache
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_cache import LLMResponseCache, request_key
+
+
+MESSAGES = [{"role": "system", "content": "Classify complexity."},
+            {"role": "user", "content": "fever  and\ncough for 3 days"}]
+
+
+class CacheKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = LLMResponseCache(sites="triage,shortlist")
+
+    def test_whitespace_and_role_case_do_not_change_the_key(self):
+        same = [{"role": "System", "content": "  Classify   complexity. "},
+                {"role": "user", "content": "fever and cough for 3 days"},
+                {"role": "assistant", "content": "   "}]
+        self.assertEqual(LLMResponseCache.make_key("m", MESSAGES), LLMResponseCache.make_key("m", same))
+
+    def test_model_content_and_config_change_the_key(self):
+        base = LLMResponseCache.make_key("m", MESSAGES, {"temperature": 0.2})
+        other_text = [MESSAGES[0], {"role": "user", "content": "fever and cough for 4 days"}]
+        for variant in (LLMResponseCache.make_key("m2", MESSAGES, {"temperature": 0.2}),
+                        LLMResponseCache.make_key("m", other_text, {"temperature": 0.2}),
+                        LLMResponseCache.make_key("m", MESSAGES, {"temperature": 0.6}),
+                        LLMResponseCache.make_key("m", MESSAGES, {"temperature": 0.2, "profile": "terse"})):
+            self.assertNotEqual(base, variant)
+
+    def test_request_key_only_for_opted_in_call_sites(self):
+        self.assertIsNotNone(request_key(self.cache, "m", MESSAGES, "triage", temperature=0.2))
+        self.assertIsNone(request_key(self.cache, "m", MESSAGES, "followup", temperature=0.2))
+        self.assertIsNone(request_key(self.cache, "m", MESSAGES, None))
+        self.assertIsNone(request_key(None, "m", MESSAGES, "triage"))
+        self.assertEqual(self.cache.stats()["bypassed"], 2)
+        self.assertEqual(request_key(self.cache, "m", MESSAGES, "triage", temperature=0.2),
+                         LLMResponseCache.make_key("m", MESSAGES, {"temperature": 0.2}))
+
+    def test_star_opts_in_every_named_call_site(self):
+        cache = LLMResponseCache(sites="*")
+        self.assertTrue(cache.enabled_for("mdt_moderator"))
+        self.assertFalse(cache.enabled_for(None))
+
+
+class CacheStoreTest(unittest.TestCase):
+    def test_lru_eviction_and_recency(self):
+        cache = LLMResponseCache(max_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        self.assertEqual(cache.get("a"), "A")      # a is now most recent
+        cache.put("c", "C")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), ("A", "C"))
+        self.assertEqual(cache.evicted, 1)
+
+    def test_ttl_and_empty_replies(self):
+        cache = LLMResponseCache(ttl=0.05)
+        cache.put("k", "reply")
+        cache.put("blank", "   ")
+        self.assertEqual(cache.get("k"), "reply")
+        self.assertIsNone(cache.get("blank"))
+        time.sleep(0.08)
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_disk_tier_is_shared_and_promoted(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        path = os.path.join(tmp, "llm_cache.sqlite3")
+
+        LLMResponseCache(disk_path=path).put("k", "from worker 1")
+        other = LLMResponseCache(disk_path=path)
+        self.assertEqual(other.get("k"), "from worker 1")
+        self.assertEqual(other.get("k"), "from worker 1")
+        stats = other.stats()
+        self.assertEqual((stats["hits_disk"], stats["hits_memory"], stats["disk_entries"]), (1, 1, 1))
+
+        other.clear()
+        self.assertIsNone(LLMResponseCache(disk_path=path).get("k"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+# tests/test_llm_callables.py
+"""
+External LLM callables: a plain f(messages) callable must keep working
+even though every stage now passes call_site / output-limit kwargs.
+
+    python -m pytest tests/test_llm_callables.py
+    python -m unittest tests.test_llm_callables
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adapter import GeminiAdapter
+from modules.llm_async import drop_unknown_kwargs, collect_stream
+from modules.symptom_collector import SymptomCollector
+from modules.symptom_shortlister import SymptomShortlister
+from modules.complexity import ComplexityAssessor
+
+try:
+    from modules.routing_pipeline import RoutingPipeline
+except ImportError:          # dotenv / google-generativeai not installed
+    RoutingPipeline = None
+
+
+def plain(messages):
+    """The simplest external LLM: one positional argument, no kwargs."""
+    prompt = messages[-1]["content"]
+    if "comma-separated" in prompt:
+        return "fever, cough"
+    if "complexity" in prompt.lower():
+        return "medium"
+    return "How many days have you had the fever?"
+
+
+async def aplain(messages):
+    return plain(messages)
+
+
+async def stream_plain(messages):
+    for word in plain(messages).split(" "):
+        yield word + " "
+
+
+class DropUnknownKwargsTest(unittest.TestCase):
+    def test_sync_async_and_stream_callables_ignore_unknown_kwargs(self):
+        messages = [{"role": "user", "content": "x"}]
+        self.assertEqual(drop_unknown_kwargs(plain)(messages, call_site="followup", max_output_tokens=64),
+                         plain(messages))
+        self.assertEqual(asyncio.run(drop_unknown_kwargs(aplain)(messages, call_site="pcp")), plain(messages))
+        streamed = asyncio.run(collect_stream(drop_unknown_kwargs(stream_plain), messages, call_site="simplify"))
+        self.assertEqual(streamed.strip(), plain(messages))
+
+    def test_declared_kwargs_are_kept(self):
+        seen = {}
+
+        def with_site(messages, call_site=None):
+            seen["call_site"] = call_site
+            return ""
+
+        drop_unknown_kwargs(with_site)([], call_site="triage", temperature=0.1)
+        self.assertEqual(seen, {"call_site": "triage"})
+
+    def test_var_kwargs_callables_are_returned_unchanged(self):
+        def anything(messages, **kwargs):
+            return kwargs
+
+        self.assertIs(drop_unknown_kwargs(anything), anything)
+        self.assertIsNone(drop_unknown_kwargs(None))
+
+
+class PlainCallableStagesTest(unittest.TestCase):
+    def setUp(self):
+        self.llm = drop_unknown_kwargs(plain)
+
+    def test_follow_up_is_the_reply_not_a_type_error(self):
+        collector = SymptomCollector(self.llm)
+        messages = [{"role": "user", "content": "follow-up"}]
+        self.assertEqual(collector.gemini_reply_to_str(messages), "How many days have you had the fever?")
+        self.assertEqual(asyncio.run(collector.agemini_reply_to_str(messages)), "How many days have you had the fever?")
+
+    def test_shortlister_and_complexity_use_the_reply(self):
+        self.assertEqual(SymptomShortlister(self.llm).shortlist("fever and cough")["symptoms"], ["fever", "cough"])
+        self.assertEqual(asyncio.run(SymptomShortlister(self.llm).ashortlist("fever and cough"))["symptoms"],
+                         ["fever", "cough"])
+        self.assertEqual(ComplexityAssessor(self.llm).assess({"raw_text": "fever and cough"}), "medium")
+
+    def test_adapter_wraps_plain_callables(self):
+        adapter = GeminiAdapter(plain, aplain, stream_plain)
+        messages = [{"role": "user", "content": "follow-up"}]
+        self.assertEqual(adapter.generate_reply(messages, call_site="followup"), plain(messages))
+        self.assertEqual(asyncio.run(adapter.agenerate_reply(messages, call_site="followup")), plain(messages))
+        streamed = asyncio.run(collect_stream(adapter.agenerate_reply_stream, messages, call_site="simplify"))
+        self.assertEqual(streamed.strip(), plain(messages))
+
+    @unittest.skipIf(RoutingPipeline is None, "routing_pipeline dependencies not installed")
+    def test_routing_pipeline_accepts_a_plain_callable(self):
+        router = RoutingPipeline(external_llm_generate=plain)
+        summary = asyncio.run(router.shortlister.ashortlist("fever and cough"))
+        self.assertEqual(summary["symptoms"], ["fever", "cough"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+# tests/test_llm_scheduler.py
+"""
+LLMScheduler: lane priority, load shedding (queue full, max_wait,
+overloaded()), Retry-After, case lanes and the token bucket.
+
+    python -m pytest tests/test_llm_scheduler.py
+    python -m unittest tests.test_llm_scheduler
+"""
+
+import os
+import sys
+import time
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_breaker import LLMUnavailableError
+from llm_scheduler import LLMScheduler, LLMOverloadedError, EMERGENCY, INTERACTIVE, BACKGROUND
+
+
+async def _hold(scheduler, call_site, release: asyncio.Event, order: list = None):
+    async with scheduler.slot(call_site):
+        if order is not None:
+            order.append(call_site)
+        await release.wait()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class LaneTest(unittest.TestCase):
+    def test_call_site_lanes_and_case_escalation(self):
+        scheduler = LLMScheduler()
+        self.assertEqual(scheduler.lane_for("triage"), INTERACTIVE)
+        self.assertEqual(scheduler.lane_for("mdt_moderator"), BACKGROUND)
+        self.assertEqual(scheduler.lane_for(None), BACKGROUND)
+
+        with scheduler.case_lane(EMERGENCY):
+            self.assertEqual(scheduler.lane_for("mdt_moderator"), EMERGENCY)
+        with scheduler.case_lane(BACKGROUND):
+            self.assertEqual(scheduler.lane_for("triage"), INTERACTIVE)   # never lowered
+        with scheduler.case_lane(None):
+            scheduler.escalate(EMERGENCY)
+            self.assertEqual(scheduler.lane_for("simplify"), EMERGENCY)
+        self.assertEqual(scheduler.lane_for("simplify"), BACKGROUND)
+
+
+class SchedulerTest(unittest.TestCase):
+    def test_free_slot_goes_to_the_highest_priority_lane(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrency=1)
+            order, release = [], asyncio.Event()
+            first = asyncio.create_task(_hold(scheduler, "triage", release, order))
+            await _settle()
+            waiters = [asyncio.create_task(_hold(scheduler, site, release, order))
+                       for site in ("mdt_moderator", "followup", "mdt_moderator")]
+            await _settle()
+            with scheduler.case_lane(EMERGENCY):
+                waiters.append(asyncio.create_task(_hold(scheduler, "simplify", release, order)))
+            await _settle()
+            self.assertEqual(scheduler.stats()["queued"], {EMERGENCY: 1, INTERACTIVE: 1, BACKGROUND: 2})
+
+            release.set()
+            await asyncio.gather(first, *waiters)
+            return order, scheduler
+
+        order, scheduler = asyncio.run(scenario())
+        self.assertEqual(order, ["triage", "simplify", "followup", "mdt_moderator", "mdt_moderator"])
+        self.assertEqual(scheduler.active, 0)
+        self.assertEqual(scheduler.granted, {EMERGENCY: 1, INTERACTIVE: 2, BACKGROUND: 2})
+
+    def test_full_queue_sheds_all_but_emergency(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrency=1, max_queue=1)
+            release = asyncio.Event()
+            held = [asyncio.create_task(_hold(scheduler, "triage", release)),
+                    asyncio.create_task(_hold(scheduler, "followup", release))]
+            await _settle()
+            with self.assertRaises(LLMOverloadedError) as ctx:
+                async with scheduler.slot("mdt_moderator"):
+                    pass
+            with scheduler.case_lane(EMERGENCY):
+                held.append(asyncio.create_task(_hold(scheduler, "simplify", release)))
+            await _settle()
+            queued = scheduler.queued()
+            release.set()
+            await asyncio.gather(*held)
+            return scheduler, ctx.exception, queued
+
+        scheduler, error, queued = asyncio.run(scenario())
+        self.assertIsInstance(error, LLMUnavailableError)     # in-flight cases fall back locally
+        self.assertGreaterEqual(error.retry_after, 1)
+        self.assertEqual(scheduler.shed[BACKGROUND], 1)
+        self.assertEqual(queued, 2)                            # emergency queued past max_queue
+        self.assertEqual(scheduler.granted[EMERGENCY], 1)
+
+    def test_max_wait_sheds_and_leaves_no_waiter_behind(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrency=1, max_wait=0.05)
+            release = asyncio.Event()
+            held = asyncio.create_task(_hold(scheduler, "triage", release))
+            await _settle()
+            with self.assertRaises(LLMOverloadedError):
+                async with scheduler.slot("followup"):
+                    pass
+            queued = scheduler.queued()
+            release.set()
+            await held
+            return scheduler, queued
+
+        scheduler, queued = asyncio.run(scenario())
+        self.assertEqual(queued, 0)
+        self.assertEqual(scheduler.shed[INTERACTIVE], 1)
+        self.assertEqual(scheduler.active, 0)
+
+    def test_cancelled_waiter_does_not_leak_a_slot(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrency=1)
+            release = asyncio.Event()
+            held = asyncio.create_task(_hold(scheduler, "triage", release))
+            await _settle()
+            waiter = asyncio.create_task(_hold(scheduler, "followup", release))
+            await _settle()
+            waiter.cancel()
+            release.set()
+            await held
+            await asyncio.gather(waiter, return_exceptions=True)
+            return scheduler
+
+        scheduler = asyncio.run(scenario())
+        self.assertEqual((scheduler.active, scheduler.queued()), (0, 0))
+
+    def test_overloaded_sheds_background_first_and_never_emergency(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrency=1, max_queue=4)
+            release = asyncio.Event()
+            held = [asyncio.create_task(_hold(scheduler, "triage", release))]
+            await _settle()
+            verdicts = []
+            for _ in range(4):
+                verdicts.append({lane: scheduler.overloaded(lane) for lane in (EMERGENCY, INTERACTIVE, BACKGROUND)})
+                held.append(asyncio.create_task(_hold(scheduler, "followup", release)))
+                await _settle()
+            verdicts.append({lane: scheduler.overloaded(lane) for lane in (EMERGENCY, INTERACTIVE, BACKGROUND)})
+            release.set()
+            await asyncio.gather(*held)
+            return verdicts
+
+        verdicts = asyncio.run(scenario())   # verdicts[n] = with n calls queued
+        self.assertTrue(all(v[EMERGENCY] is None for v in verdicts))
+        self.assertEqual([v[BACKGROUND] is not None for v in verdicts], [False, False, True, True, True])
+        self.assertEqual([v[INTERACTIVE] is not None for v in verdicts], [False, False, False, False, True])
+        self.assertGreaterEqual(verdicts[-1][INTERACTIVE], 1)
+
+    def test_retry_after_grows_with_the_backlog(self):
+        scheduler = LLMScheduler(max_concurrency=2)
+        scheduler._hold_seconds = 3.0
+        self.assertEqual(scheduler.retry_after(), 1)
+        scheduler.active = 2
+        scheduler._queues[BACKGROUND].extend([object()] * 4)
+        self.assertEqual(scheduler.retry_after(), 9)            # 6 calls / 2 slots × 3 s
+
+    def test_token_bucket_spaces_calls_beyond_the_burst(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrency=4, rate_per_minute=1200, burst=1)   # one token / 50 ms
+            started = []
+
+            async def call():
+                async with scheduler.slot("triage"):
+                    started.append(time.monotonic())
+
+            t0 = time.monotonic()
+            await asyncio.gather(call(), call(), call())
+            return [s - t0 for s in started]
+
+        offsets = asyncio.run(scenario())
+        self.assertLess(offsets[0], 0.03)
+        self.assertGreaterEqual(offsets[2], 0.09)
+
+    def test_disabled_scheduler_never_sheds(self):
+        scheduler = LLMScheduler(max_queue=0, enabled=False)
+        self.assertIsNone(scheduler.overloaded(BACKGROUND))
+        self.assertTrue(scheduler.has_capacity())
+
+
+if __name__ == "__main__":
+    unittest.main()
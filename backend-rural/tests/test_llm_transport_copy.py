@@ -0,0 +1,27 @@
+# tests/test_llm_transport_copy.py
+"""
+sw-backend/python carries its own copy of llm_transport.py (the services
+deploy separately); the two files must not drift apart.
+
+    python -m pytest tests/test_llm_transport_copy.py
+"""
+
+import os
+import unittest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORIGINAL = os.path.join(BACKEND, "llm_transport.py")
+COPY = os.path.join(BACKEND, "..", "sw-backend", "python", "llm_transport.py")
+
+
+class LLMTransportCopyTest(unittest.TestCase):
+    @unittest.skipUnless(os.path.exists(COPY), "sw-backend is not checked out next to backend-rural")
+    def test_sw_backend_copy_is_identical(self):
+        with open(ORIGINAL, "rb") as a, open(COPY, "rb") as b:
+            self.assertEqual(a.read(), b.read(),
+                             "backend-rural/llm_transport.py and sw-backend/python/llm_transport.py differ — "
+                             "apply the change to both")
+
+
+if __name__ == "__main__":
+    unittest.main()
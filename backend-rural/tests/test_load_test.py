@@ -0,0 +1,86 @@
+# tests/test_load_test.py
+"""
+benchmarks/load_test.py harness pieces that do not need the real server:
+the in-process ASGI driver, one virtual-nurse session against a stub ASGI
+app, percentiles and --mix parsing.
+
+    python -m pytest tests/test_load_test.py
+    python -m unittest tests.test_load_test
+"""
+
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import AsgiClient, Stats, run_session, percentile, summarize, parse_mix
+
+
+async def _stub_app(scope, receive, send):
+    """start_case → one follow-up → done; /ws/process_case → progress + final."""
+    if scope["type"] == "http":
+        payload = json.loads((await receive())["body"])
+        if scope["path"] == "/api/start_case":
+            body = {"case_id": "C1", "first_follow_up_question": "Since when?"}
+        elif scope["path"] == "/api/next_question":
+            body = {"done": True} if payload["answers"] else {"next_question": "?"}
+        else:
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b'{"detail": "Not Found"}'})
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+        return
+
+    assert (await receive())["type"] == "websocket.connect"
+    await send({"type": "websocket.accept"})
+    payload = json.loads((await receive())["text"])
+    for msg in ({"type": "progress", "message": "🧠 Shortlisting symptoms..."},
+                {"type": "final", "result": {"case_id": payload["case_id"], "route": "low"}}):
+        await send({"type": "websocket.send", "text": json.dumps(msg)})
+    await send({"type": "websocket.close", "code": 1000})
+
+
+class LoadTestHarnessTest(unittest.TestCase):
+    def test_asgi_client_round_trips(self):
+        async def scenario():
+            client = AsgiClient(_stub_app)
+            status, body = await client.post("/api/start_case", {"patient_input": "fever"})
+            missing = await client.post("/api/nope", {})
+            received = []
+            await client.websocket("/ws/process_case", {"case_id": "C1", "answers": {}}, received.append)
+            return status, body, missing, received
+
+        status, body, missing, received = asyncio.run(scenario())
+        self.assertEqual((status, body["case_id"]), (200, "C1"))
+        self.assertEqual(missing[0], 404)
+        self.assertEqual([m["type"] for m in received], ["progress", "final"])
+
+    def test_session_records_every_step(self):
+        stats = Stats()
+        args = SimpleNamespace(rounds=3, think=0)
+        asyncio.run(run_session(AsgiClient(_stub_app), stats, random.Random(0), "low", args))
+
+        self.assertEqual(dict(stats.errors), {})
+        self.assertEqual(dict(stats.sessions), {"low": 1})
+        self.assertEqual({name: len(s) for name, s in stats.samples.items()},
+                         {"start_case": 1, "next_question": 1, "ws_first_progress": 1, "ws_process_case": 1})
+
+    def test_percentiles_and_mix(self):
+        samples = [i / 100 for i in range(1, 101)]
+        self.assertEqual(percentile(samples, 0.5), 0.51)
+        self.assertEqual(summarize(samples)["p99_ms"], 990.0)
+        self.assertEqual(summarize(samples)["max_ms"], 1000.0)
+        self.assertEqual(parse_mix("low=6,medium=3,high=1"), {"low": 6.0, "medium": 3.0, "high": 1.0})
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_mix("low=1,urgent=1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+# tests/test_red_flags.py
+"""
+RedFlagEngine examples: emergencies that must be classified "high"
+locally, and mentions that must be left to the LLM classifier.
+
+    python -m pytest tests/test_red_flags.py
+    python -m unittest tests.test_red_flags
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.red_flags import RedFlagEngine
+from modules.triage_analysis import TriageAnalyzer
+
+
+# text -> rule that must fire
+FIRES = {
+    "severe chest pain spreading to the left arm with sweating": "cardiac_radiating",
+    "chest tightness with cold sweat since 20 minutes": "cardiac_autonomic",
+    "face drooping on the left side and slurred speech": "stroke_fast",
+    "sudden stroke this morning, cannot lift right arm": "stroke_fast",
+    "family thinks he is having a stroke": "stroke_fast",
+    "history of stroke 5 years ago, now sudden slurred speech": "stroke_fast",
+    "patient had a seizure and is now unconscious": "altered_consciousness",
+    "child had a seizure today after high fever": "altered_consciousness",
+    "3 year old child convulsing for 5 minutes": "altered_consciousness",
+    "known epileptic, seizure since morning not stopping": "altered_consciousness",
+    "had a seizure 2 hours ago, drowsy since": "altered_consciousness",
+    "had a seizure 1 day ago and again today": "altered_consciousness",
+    "10 day old baby not feeding and floppy": "neonatal_danger",
+    "loose motions with sunken eyes and no urine since morning": "severe_dehydration",
+    "vomiting blood twice today": "haemorrhage",
+    "fever, spo2 88%": "hypoxia",
+    "dizzy, bp 80/50": "hypotension",
+}
+
+# stroke / seizure mentions that are history, controlled or not medical
+NO_FLAG = [
+    "history of stroke 5 years ago, now mild cough",
+    "heat stroke last summer, now fever and headache",
+    "it was a stroke of luck that the fever came down",
+    "seizures well controlled on medication, came for a cold",
+    "known case of seizures under control, mild fever for 2 days",
+    "previous stroke with residual facial droop, now knee pain",
+    "had a seizure 3 weeks ago, now fever and cough",
+    "had a seizure 2 days ago, now mild headache",
+    "stroke several months ago, came for knee pain",
+    "seizure last week, today mild cold",
+    "no chest pain, no seizure, mild headache",
+    "mild fever and runny nose since yesterday",
+]
+
+
+class RedFlagEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = RedFlagEngine()
+
+    def test_emergencies_fire(self):
+        for text, rule in FIRES.items():
+            with self.subTest(text=text):
+                self.assertIn(rule, [f["name"] for f in self.engine.detect(text)])
+
+    def test_history_and_non_acute_mentions_do_not_fire(self):
+        for text in NO_FLAG:
+            with self.subTest(text=text):
+                self.assertEqual(self.engine.detect(text), [])
+
+    def test_follow_up_questions_are_ignored(self):
+        collected = "fever and cough | Any seizure or stroke?: no | Any chest pain spreading to arm?: no"
+        self.assertEqual(self.engine.detect(collected), [])
+
+
+class RedFlagTriageTest(unittest.TestCase):
+    def test_symptoms_come_from_the_shortlist_and_evidence_stays_separate(self):
+        prompts = []
+
+        def llm(messages, **kwargs):
+            prompts.append(kwargs.get("call_site"))
+            return "chest pain radiating to left arm, sweating"
+
+        result = TriageAnalyzer(llm).analyze("severe chest pain spreading to the left arm with sweating")
+        self.assertEqual(result["complexity"], "high")
+        self.assertEqual(result["symptoms"], ["chest pain radiating to left arm", "sweating"])
+        self.assertIn("cardiac_radiating", result["red_flags"])
+        self.assertIn("chest pain", result["red_flag_evidence"]["cardiac_radiating"])
+        self.assertEqual(prompts, ["shortlist"])   # no classifier call
+
+
+if __name__ == "__main__":
+    unittest.main()
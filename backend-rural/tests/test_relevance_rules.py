@@ -0,0 +1,100 @@
+# tests/test_relevance_rules.py
+"""
+RelevancePreClassifier: short answers are accepted locally only when they
+answer what the follow-up question asked; mismatched pairs go to Gemini.
+
+    python -m pytest tests/test_relevance_rules.py
+    python -m unittest tests.test_relevance_rules
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.relevance_rules import RelevancePreClassifier, question_slots
+from modules.symptom_collector import SymptomCollector
+
+
+# (question, answer) -> local rule that accepts it
+ACCEPTED = {
+    ("How long have you had the cough?", "3 days"): "duration",
+    ("Since when do you have the fever?", "since yesterday"): "duration",
+    ("How severe is the pain?", "very severe"): "severity",
+    ("On a scale of 1 to 10, how bad is it?", "7/10"): "severity",
+    ("Is the pain mild, moderate or severe?", "moderate"): "severity",
+    ("Is it getting better or worse?", "getting worse"): "progression",
+    ("Does the pain get worse at night or in the morning?", "only at night"): "timing",
+    ("Is the pain constant or does it come and go?", "on and off"): "timing",
+    ("Where exactly is the pain? Does it radiate?", "radiating"): "location",
+    ("Do you have a fever?", "yes"): "yes_no",
+    ("Any vomiting?", "no never"): "yes_no",
+    ("How long has it lasted and how bad is it?", "3 days, severe"): "duration",
+}
+
+# Well-formed answers to a different question than the one asked
+MISMATCHED = [
+    ("How long have you had the cough?", "severe"),
+    ("Do you have a fever?", "severe"),
+    ("Do you have a fever?", "3 days"),
+    ("How severe is the pain?", "3 days"),
+    ("How severe is the pain?", "yes"),
+    ("How long have you had the cough?", "yes"),
+    ("How long have you had the cough?", "3 days, severe"),
+    ("Where exactly is the pain?", "getting worse"),
+    ("Is it getting better or worse?", "only at night"),
+    ("How long have you had the cough?", "same"),
+    ("What did you eat yesterday?", "mild"),         # no recognised slot → Gemini
+]
+
+
+class RelevancePreClassifierTest(unittest.TestCase):
+    def setUp(self):
+        collector = SymptomCollector(lambda messages, **kwargs: "")
+        self.rules = RelevancePreClassifier(collector.slot_keywords)
+
+    def test_matching_answers_are_accepted_locally(self):
+        for (question, answer), rule in ACCEPTED.items():
+            with self.subTest(question=question, answer=answer):
+                verdict = self.rules.classify(question, answer)
+                self.assertIsNotNone(verdict)
+                self.assertTrue(verdict["is_relevant"])
+                self.assertFalse(verdict["introduces_new_symptom"])
+                self.assertEqual(verdict["reason"], f"local rule: {rule}")
+
+    def test_answers_to_another_question_are_escalated(self):
+        for question, answer in MISMATCHED:
+            with self.subTest(question=question, answer=answer):
+                self.assertIsNone(self.rules.classify(question, answer))
+
+    def test_unsure_answers_are_escalated(self):
+        for answer in ("3 days with vomiting", "paracetamol 500 mg", "severe, also my knee hurts",
+                       "it started three days ago after I came back from the fields"):
+            with self.subTest(answer=answer):
+                self.assertIsNone(self.rules.classify("How long have you had the fever?", answer))
+
+    def test_slot_phrases_are_typed_and_question_words_dropped(self):
+        phrases = self.rules.answer_phrases
+        self.assertEqual(phrases["only at night"], "timing")
+        self.assertEqual(phrases["radiating"], "location")
+        self.assertEqual(phrases["started suddenly"], "progression")
+        for question_word in ("how long", "severity", "which side", "with fever"):
+            self.assertNotIn(question_word, phrases)
+
+    def test_question_slots(self):
+        self.assertEqual(question_slots("How long and how severe is the headache?"), {"duration", "severity"})
+        self.assertEqual(question_slots("Do you have a cough?"), {"yes_no"})
+        self.assertEqual(question_slots("What makes it worse?"), {"trigger"})
+        self.assertEqual(question_slots(""), set())
+
+    def test_stats_count_avoided_and_escalated_calls(self):
+        self.rules.classify("How long have you had the cough?", "3 days")
+        self.rules.classify("How long have you had the cough?", "severe")
+        stats = self.rules.stats()
+        self.assertEqual((stats["checked"], stats["llm_calls_avoided"], stats["escalated_to_llm"]), (2, 1, 1))
+        self.assertEqual(stats["by_rule"], {"duration": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,370 @@
+# tests/test_session_backends.py
+"""
+RedisSessionStore / _RespConnection against an in-process RESP2 stand-in
+(GET, SET PX, PEXPIRE, DEL, SCAN, plus dropped connections), and
+SQLiteSessionStore against a temp-file database.
+
+    python -m pytest tests/test_session_backends.py
+    python -m unittest tests.test_session_backends
+"""
+
+import os
+import sys
+import time
+import asyncio
+import fnmatch
+import threading
+import unittest
+import tempfile
+import socketserver
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.session_backends import RedisSessionStore, RedisProtocolError, SQLiteSessionStore, _RespConnection
+from modules.session_store import SessionRecord
+
+
+# -----------------------------------------------------------
+# Stand-in server
+# -----------------------------------------------------------
+class _RespHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.server.clients.append(self.connection)
+
+    def handle(self):
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, OSError, ValueError):
+                return
+            if args is None:
+                return
+            self.server.commands.append(args)
+            try:
+                self.wfile.write(self.server.dispatch(args))
+            except OSError:
+                return
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            raise ValueError(f"inline commands not supported: {line!r}")
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+
+class FakeRespServer(socketserver.ThreadingTCPServer):
+    """Dict-backed RESP2 server; SCAN returns SCAN_PAGE keys per call so the cursor loop is exercised."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    SCAN_PAGE = 2
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _RespHandler)
+        self.data = {}          # key -> (value, expires_at or None)
+        self.commands = []
+        self.clients = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"redis://{host}:{port}/0"
+
+    def drop_connections(self):
+        """Server side closes every client socket (restart / idle timeout)."""
+        for sock in self.clients:
+            try:
+                sock.shutdown(2)
+                sock.close()
+            except OSError:
+                pass
+        self.clients.clear()
+
+    def ttl_ms(self, key: bytes):
+        _, expires = self.data[key]
+        return None if expires is None else (expires - time.monotonic()) * 1000
+
+    # RESP encoding
+    @staticmethod
+    def _bulk(value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _array(self, items):
+        return b"*%d\r\n" % len(items) + b"".join(
+            self._array(i) if isinstance(i, list) else self._bulk(i) for i in items)
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def dispatch(self, args) -> bytes:
+        cmd = args[0].upper()
+        with self._lock:
+            if cmd == b"GET":
+                entry = self._live(args[1])
+                return self._bulk(entry[0] if entry else None)
+            if cmd == b"SET":
+                expires = None
+                if len(args) == 5 and args[3].upper() == b"PX":
+                    expires = time.monotonic() + int(args[4]) / 1000
+                self.data[args[1]] = (args[2], expires)
+                return b"+OK\r\n"
+            if cmd == b"PEXPIRE":
+                entry = self._live(args[1])
+                if not entry:
+                    return b":0\r\n"
+                self.data[args[1]] = (entry[0], time.monotonic() + int(args[2]) / 1000)
+                return b":1\r\n"
+            if cmd == b"DEL":
+                removed = sum(1 for k in args[1:] if self.data.pop(k, None) is not None)
+                return b":%d\r\n" % removed
+            if cmd == b"SCAN":
+                cursor = int(args[1])
+                pattern = args[args.index(b"MATCH") + 1].decode() if b"MATCH" in args else "*"
+                keys = sorted(k for k in self.data if self._live(k) and fnmatch.fnmatchcase(k.decode(), pattern))
+                page = keys[cursor:cursor + self.SCAN_PAGE]
+                nxt = cursor + self.SCAN_PAGE if cursor + self.SCAN_PAGE < len(keys) else 0
+                return self._array([str(nxt).encode(), page])
+        return b"-ERR unknown command '%s'\r\n" % cmd.lower()
+
+
+# -----------------------------------------------------------
+# Tests
+# -----------------------------------------------------------
+class RespConnectionTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRespServer()
+        host, port = self.server.server_address
+        self.conn = _RespConnection(host, port)
+
+    def tearDown(self):
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reply_types(self):
+        self.assertEqual(self.conn.execute("SET", "k", "v"), "OK")                 # simple string
+        self.assertEqual(self.conn.execute("GET", "k"), b"v")                      # bulk string
+        self.assertIsNone(self.conn.execute("GET", "missing"))                     # null bulk
+        self.assertEqual(self.conn.execute("DEL", "k", "missing"), 1)              # integer
+        cursor, keys = self.conn.execute("SCAN", "0", "MATCH", "none*")            # nested array
+        self.assertEqual((cursor, keys), (b"0", []))
+        with self.assertRaises(RedisProtocolError):                                # error reply
+            self.conn.execute("FLUSHALL")
+
+    def test_bulk_with_crlf_and_multi_chunk_value(self):
+        value = ("line one\r\nline two " + "x" * 200_000).encode()
+        self.conn.execute("SET", "big", value)
+        self.assertEqual(self.conn.execute("GET", "big"), value)
+        # the connection is still in sync after a large reply
+        self.assertEqual(self.conn.execute("SET", "after", "1"), "OK")
+
+    def test_reconnects_after_server_drops_connection(self):
+        self.conn.execute("SET", "k", "v")
+        self.server.drop_connections()
+        time.sleep(0.05)
+        self.assertEqual(self.conn.execute("GET", "k"), b"v")
+
+    def test_raises_when_server_is_gone(self):
+        self.conn.execute("SET", "k", "v")
+        self.server.shutdown()
+        self.server.server_close()
+        self.server.drop_connections()
+        with self.assertRaises((OSError, ConnectionError)):
+            self.conn.execute("GET", "k")
+
+
+def _record(text="fever\nand cough"):
+    record = SessionRecord(text, original_symptoms={"fever", "cough"})
+    record.questions.append("How many days?")
+    record.answers["How many days?"] = "3"
+    return record
+
+
+class SQLiteSessionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sessions.db")
+        self.store = SQLiteSessionStore(self.path, max_entries=3, idle_ttl=60)
+
+    def tearDown(self):
+        self.store._conn.close()
+        self.tmp.cleanup()
+
+    def _age(self, case_id, seconds):
+        self.store._conn.execute("UPDATE sessions SET last_access = last_access - ? WHERE case_id = ?",
+                                 (seconds, case_id))
+
+    def test_put_get_round_trip_in_wal_mode(self):
+        self.store.put("A1", _record())
+        got = self.store.get("A1")
+        self.assertEqual(got.initial_text, "fever\nand cough")
+        self.assertEqual(got.answers, {"How many days?": "3"})
+        self.assertEqual(got.original_symptoms, {"fever", "cough"})
+        self.assertEqual(self.store._conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual((self.store.hits, self.store.misses), (1, 0))
+
+    def test_put_replaces_the_record(self):
+        self.store.put("A1", _record())
+        record = self.store.get("A1")
+        record.mdt_done = True
+        self.store.put("A1", record)
+        self.assertTrue(self.store.get("A1").mdt_done)
+        self.assertEqual(len(self.store), 1)
+
+    def test_idle_ttl_expiry_on_read_and_on_write(self):
+        self.store.put("A1", _record())
+        self.store.put("A2", _record())
+        self._age("A1", 61)
+        self.assertIsNone(self.store.get("A1"))
+        self.assertEqual(self.store.evicted_ttl, 1)
+
+        self._age("A2", 61)
+        self.store.put("A3", _record())          # writes sweep idle rows too
+        self.assertEqual(len(self.store), 1)
+        self.assertEqual(self.store.evicted_ttl, 2)
+
+    def test_get_refreshes_last_access(self):
+        self.store.put("A1", _record())
+        self._age("A1", 50)
+        self.assertIsNotNone(self.store.get("A1"))
+        self._age("A1", 50)                      # 100s since put, 50s since the read
+        self.assertIsNotNone(self.store.get("A1"))
+
+    def test_delete_and_missing(self):
+        self.store.put("A1", _record())
+        self.store.delete("A1")
+        self.assertIsNone(self.store.get("A1"))
+        self.assertIsNone(self.store.get("nope"))
+        self.assertEqual(self.store.misses, 2)
+
+    def test_entry_cap_evicts_least_recently_used(self):
+        for i in range(3):
+            self.store.put(f"C{i}", _record())
+            self._age(f"C{i}", 10 - i)
+        self.store.get("C0")                     # C1 is now the oldest
+        self.store.put("C3", _record())
+        self.assertIsNone(self.store.get("C1"))
+        self.assertEqual(self.store.stats()["entries"], 3)
+        self.assertEqual(self.store.evicted_lru, 1)
+
+    def test_second_connection_and_reopen_see_the_same_rows(self):
+        self.store.put("A1", _record())
+        other = SQLiteSessionStore(self.path, max_entries=3, idle_ttl=60)   # another worker
+        try:
+            self.assertEqual(other.get("A1").questions, ["How many days?"])
+            other.put("B1", _record("cough"))
+            self.assertEqual(self.store.get("B1").initial_text, "cough")
+        finally:
+            other._conn.close()
+
+    def test_async_twins(self):
+        async def flow():
+            await self.store.aput("A1", _record())
+            record = await self.store.aget("A1")
+            await self.store.adelete("A1")
+            return record, await self.store.aget("A1"), await self.store.astats()
+
+        record, gone, stats = asyncio.run(flow())
+        self.assertEqual(record.initial_text, "fever\nand cough")
+        self.assertIsNone(gone)
+        self.assertEqual((stats["backend"], stats["entries"]), ("sqlite", 0))
+
+
+class RedisSessionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRespServer()
+        self.store = RedisSessionStore(self.server.url, idle_ttl=60, prefix="t:")
+
+    def tearDown(self):
+        self.store._conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _record(self, text="fever\nand cough"):
+        record = SessionRecord(text, original_symptoms={"fever", "cough"})
+        record.questions.append("How many days?")
+        record.answers["How many days?"] = "3"
+        return record
+
+    def test_put_sets_px_expiry_and_get_round_trips(self):
+        self.store.put("A1", self._record())
+        set_cmd = self.server.commands[-1]
+        self.assertEqual(set_cmd[0], b"SET")
+        self.assertEqual(set_cmd[3:], [b"PX", b"60000"])
+
+        got = self.store.get("A1")
+        self.assertEqual(got.initial_text, "fever\nand cough")
+        self.assertEqual(got.answers, {"How many days?": "3"})
+        self.assertEqual(got.original_symptoms, {"fever", "cough"})
+        self.assertEqual(self.store.hits, 1)
+
+    def test_get_refreshes_idle_ttl(self):
+        self.store.put("A1", self._record())
+        self.server.data[b"t:A1"] = (self.server.data[b"t:A1"][0], time.monotonic() + 1)
+        self.store.get("A1")
+        self.assertEqual(self.server.commands[-1][0], b"PEXPIRE")
+        self.assertGreater(self.server.ttl_ms(b"t:A1"), 50_000)
+
+    def test_expired_and_missing(self):
+        self.store.put("A1", self._record())
+        self.server.data[b"t:A1"] = (self.server.data[b"t:A1"][0], time.monotonic() - 1)
+        self.assertIsNone(self.store.get("A1"))
+        self.assertIsNone(self.store.get("nope"))
+        self.assertEqual(self.store.misses, 2)
+
+    def test_delete(self):
+        self.store.put("A1", self._record())
+        self.store.delete("A1")
+        self.assertEqual(self.server.commands[-1][0], b"DEL")
+        self.assertIsNone(self.store.get("A1"))
+
+    def test_scan_counts_only_prefixed_keys_across_pages(self):
+        for i in range(5):
+            self.store.put(f"C{i}", self._record())
+        self.server.data[b"other:key"] = (b"x", None)
+        self.assertEqual(self.store.stats()["entries"], 5)
+        self.assertGreater(sum(1 for c in self.server.commands if c[0] == b"SCAN"), 1)
+
+    def test_survives_dropped_connection(self):
+        self.store.put("A1", self._record())
+        self.server.drop_connections()
+        time.sleep(0.05)
+        self.assertEqual(self.store.get("A1").initial_text, "fever\nand cough")
+
+    def test_async_twins_run_off_the_event_loop(self):
+        async def flow():
+            loop_thread = threading.get_ident()
+            seen = []
+            original = self.store.get
+
+            def spy(case_id):
+                seen.append(threading.get_ident())
+                return original(case_id)
+
+            self.store.get = spy
+            await self.store.aput("A1", self._record())
+            record = await self.store.aget("A1")
+            stats = await self.store.astats()
+            return record, stats, seen, loop_thread
+
+        record, stats, seen, loop_thread = asyncio.run(flow())
+        self.assertEqual(record.questions, ["How many days?"])
+        self.assertEqual(stats["entries"], 1)
+        self.assertNotEqual(seen, [loop_thread])
+
+
+if __name__ == "__main__":
+    unittest.main()
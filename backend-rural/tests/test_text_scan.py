@@ -0,0 +1,61 @@
+# tests/test_text_scan.py
+"""
+KeywordScanner boundary modes and PatternSet.
+
+    python -m pytest tests/test_text_scan.py
+    python -m unittest tests.test_text_scan
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.text_scan import KeywordScanner, PatternSet, word_tokens
+
+
+LEXICON = ["pain", "cold", "chest pain", "sore  throat", "Fever", "", "  "]
+
+
+class KeywordScannerTest(unittest.TestCase):
+    def test_word_boundary(self):
+        scanner = KeywordScanner(LEXICON)
+        self.assertEqual(scanner.find_all("Chest-pain and FEVER, no painful joints"), {"pain", "fever"})
+        self.assertEqual(scanner.find_all("chest pain since morning; sore throat"),
+                         {"chest pain", "pain", "sore throat"})
+        self.assertEqual(scanner.find_all("he scolded the painful spain trip"), set())
+        self.assertTrue(scanner.contains_any("mild fever."))
+        self.assertFalse(scanner.contains_any("feverish"))
+
+    def test_start_boundary(self):
+        scanner = KeywordScanner(LEXICON, boundary="start")
+        self.assertEqual(scanner.find_all("painful, feverish and a cold"), {"pain", "fever", "cold"})
+        self.assertEqual(scanner.find_all("scolded in spain"), set())
+
+    def test_substring_boundary(self):
+        scanner = KeywordScanner(["pain"], boundary="none")
+        self.assertTrue(scanner.contains_any("spain"))
+
+    def test_keywords_are_normalised_and_validated(self):
+        self.assertEqual(KeywordScanner(LEXICON).keywords,
+                         {"pain", "cold", "chest pain", "sore throat", "fever"})
+        with self.assertRaises(ValueError):
+            KeywordScanner(LEXICON, boundary="prefix")
+        self.assertEqual(KeywordScanner(LEXICON).find_all(None), set())
+
+    def test_word_tokens(self):
+        self.assertEqual(word_tokens("Fever—3 days, “bad” cough!"), {"fever", "3", "days", "bad", "cough"})
+
+
+class PatternSetTest(unittest.TestCase):
+    def test_any_pattern_matches_case_insensitively(self):
+        patterns = PatternSet([r"\b\d+\s*mg\b", r"\btablets?\b"])
+        self.assertTrue(patterns.contains_any("Paracetamol 500 MG twice"))
+        self.assertTrue(patterns.contains_any("two Tablets"))
+        self.assertFalse(patterns.contains_any("fever for 2 days"))
+        self.assertIsNone(patterns.search(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,243 @@
+# tracing.py
+# Per-case span timeline (contextvars), exportable as OTLP/JSON
+
+import os
+import time
+import asyncio
+import functools
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import OrderedDict
+
+
+SERVICE_NAME = "ayu-backend-rural"
+
+# Innermost open span of the running task / thread (None = not tracing)
+_current_span = contextvars.ContextVar("ayu_current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace, name: str, parent_id: str = None, attributes: dict = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        self.error = str(error) or type(error).__name__
+
+
+class CaseTrace:
+    """All spans recorded for one case_id (one OTLP trace)."""
+
+    def __init__(self, case_id: str, max_spans: int):
+        self.case_id = case_id
+        self.trace_id = uuid.uuid4().hex
+        self.max_spans = max_spans
+        self.spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> bool:
+        with self._lock:
+            if len(self.spans) >= self.max_spans:
+                self.dropped += 1
+                return False
+            self.spans.append(span)
+            return True
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return list(self.spans)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+class Tracer:
+    """
+    span(name, case_id=None, **attrs) is a context manager usable from sync
+    and async code. Nesting follows the contextvar, so spans opened inside
+    asyncio tasks / to_thread workers started under a span become its
+    children. Without a case_id and outside any traced case it is a no-op,
+    so CLI runs and benchmarks pay nothing.
+
+    Keeps the last `max_cases` traces in memory (LRU).
+    """
+
+    def __init__(self, max_cases: int = 500, max_spans_per_case: int = 2000, enabled: bool = True):
+        self.max_cases = max_cases
+        self.max_spans_per_case = max_spans_per_case
+        self.enabled = enabled
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _trace_for(self, case_id: str) -> CaseTrace:
+        with self._lock:
+            trace = self._traces.get(case_id)
+            if trace is None:
+                trace = self._traces[case_id] = CaseTrace(case_id, self.max_spans_per_case)
+                while len(self._traces) > self.max_cases:
+                    self._traces.popitem(last=False)
+            else:
+                self._traces.move_to_end(case_id)
+            return trace
+
+    @contextmanager
+    def span(self, name: str, case_id: str = None, activate: bool = True, **attributes):
+        """
+        activate=False records the span without making it the parent of
+        spans opened meanwhile (needed inside async generators, which must
+        not leave a contextvar set across a yield).
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        if case_id is not None and (parent is None or parent.trace.case_id != case_id):
+            trace, parent_id = self._trace_for(case_id), None
+        elif parent is not None:
+            trace, parent_id = parent.trace, parent.span_id
+        else:
+            yield None
+            return
+
+        span = Span(trace, name, parent_id, attributes)
+        if not trace.add(span):
+            yield None
+            return
+
+        token = _current_span.set(span) if activate else None
+        try:
+            yield span
+        except GeneratorExit:
+            # consumer stopped reading a stream early — not a failure
+            raise
+        except BaseException as e:
+            span.fail(e)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            if token is not None:
+                _current_span.reset(token)
+
+    def current(self):
+        return _current_span.get()
+
+    def annotate(self, **attributes):
+        """Add attributes to the innermost open span (no-op when not tracing)."""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attributes)
+
+    def get(self, case_id: str):
+        with self._lock:
+            return self._traces.get(case_id)
+
+    # -------------------------------------------------------
+    # Export
+    # -------------------------------------------------------
+    def export_otlp(self, case_id: str):
+        """OTLP/JSON ExportTraceServiceRequest (can be POSTed to a collector's /v1/traces)."""
+        trace = self.get(case_id)
+        if trace is None:
+            return None
+
+        now = time.time_ns()
+        spans = []
+        for s in trace.snapshot():
+            attributes = dict(s.attributes, **{"case.id": case_id})
+            if s.end_ns is None:
+                attributes["in_progress"] = True
+            spans.append({
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or now),
+                "attributes": _otlp_attributes(attributes),
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            })
+
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": "ayu.tracing"}, "spans": spans}],
+        }]}
+
+    def timeline(self, case_id: str):
+        """Human-readable view: spans in start order with depth and ms offsets."""
+        trace = self.get(case_id)
+        if trace is None:
+            return None
+
+        spans = sorted(trace.snapshot(), key=lambda s: s.start_ns)
+        if not spans:
+            return {"case_id": case_id, "spans": [], "dropped_spans": trace.dropped}
+
+        t0, now = spans[0].start_ns, time.time_ns()
+        depth = {}
+        rows = []
+        for s in spans:
+            depth[s.span_id] = depth.get(s.parent_id, -1) + 1 if s.parent_id else 0
+            rows.append({
+                "name": s.name,
+                "depth": depth[s.span_id],
+                "start_ms": round((s.start_ns - t0) / 1e6, 1),
+                "duration_ms": round(((s.end_ns or now) - s.start_ns) / 1e6, 1),
+                "in_progress": s.end_ns is None,
+                "error": s.error,
+                "attributes": s.attributes,
+            })
+        return {"case_id": case_id, "trace_id": trace.trace_id, "spans": rows, "dropped_spans": trace.dropped}
+
+
+def traced_llm_call(method):
+    """
+    Wraps a wrapper's generate_reply / agenerate_reply in an "llm.call"
+    span labelled with its call_site; retries show up as "llm.attempt"
+    children opened by the wrapper itself.
+    """
+    if asyncio.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def awrapper(self, messages, *args, **kwargs):
+            with TRACER.span("llm.call", call_site=kwargs.get("call_site") or "unlabelled", model=self.model_name):
+                return await method(self, messages, *args, **kwargs)
+        return awrapper
+
+    @functools.wraps(method)
+    def wrapper(self, messages, *args, **kwargs):
+        with TRACER.span("llm.call", call_site=kwargs.get("call_site") or "unlabelled", model=self.model_name):
+            return method(self, messages, *args, **kwargs)
+    return wrapper
+
+
+TRACER = Tracer(
+    max_cases=int(os.getenv("TRACE_MAX_CASES", "500")),
+    max_spans_per_case=int(os.getenv("TRACE_MAX_SPANS", "2000")),
+    enabled=os.getenv("TRACING", "1") == "1",
+)
@@ -105,6 +105,19 @@ useEffect(() => {
     };
   };
 
+  // Streamed LLM tokens are appended as-is (no paragraph break between chunks)
+  const appendAgentDelta = (id, text) => {
+    if (!text) return;
+    setAgents((prev) =>
+      prev.map((a) =>
+        a.id === id
+          ? { ...a, status: "running", visible: true, output: `${a.output || ""}${text}` }
+          : a
+      )
+    );
+    ensureAgentPlaceholderInMessages(id);
+  };
+
   const ensureAgentPlaceholderInMessages = (agentId) => {
     setMessages((prev) => {
       const found = prev.find((m) => m.type === "agent" && m.agentId === agentId);
@@ -531,6 +544,23 @@ http.post("/save_case", highPayload)
     return;
   }
 
+  // ---------------------------------------------------------
+  // STREAMED TOKENS (PCP / MDT moderator / simplifier)
+  // ---------------------------------------------------------
+  if (data.type === "delta") {
+    appendAgentDelta("simplify", data.text);
+    return;
+  }
+
+  // Stream cut off (deadline / LLM unavailable): drop the partial text,
+  // the final event carries the unsimplified sections instead
+  if (data.type === "reset") {
+    setAgents((prev) =>
+      prev.map((a) => (a.id === "simplify" ? { ...a, output: "" } : a))
+    );
+    return;
+  }
+
   // ---------------------------------------------------------
   // PROGRESS EVENT
   // ---------------------------------------------------------
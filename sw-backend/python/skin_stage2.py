@@ -3,19 +3,21 @@
 # =========================================
 import sys, os, json
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+# LLM transport (LLM_TRANSPORT=record|replay|synthetic for offline runs)
+from llm_transport import configure, create_model, requires_api_key
 
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 sys.stdout.reconfigure(encoding='utf-8')
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and requires_api_key():
     print(json.dumps({"error": "Missing GEMINI_API_KEY"}))
     sys.exit(1)
 
-genai.configure(api_key=GEMINI_API_KEY)
-gemini = genai.GenerativeModel("gemini-2.0-flash-lite")
+configure(GEMINI_API_KEY)
+gemini = create_model("gemini-2.0-flash-lite")
 
 # ============= Expect JSON Input via Command-line =============
 if len(sys.argv) < 2:
@@ -68,8 +70,7 @@ Write a structured medical report including:
 try:
     final_report = gemini.generate_content(
         final_prompt,
-        generation_config=genai.types.GenerationConfig(
-            temperature=0.4, max_output_tokens=1000)
+        generation_config={"temperature": 0.4, "max_output_tokens": 1000}
     ).text.strip()
 except Exception as e:
     final_report = f"Error generating final report: {e}"
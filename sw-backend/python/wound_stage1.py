@@ -10,19 +10,21 @@ from tensorflow.keras.preprocessing.image import img_to_array  # type: ignore
 from PIL import Image
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+# LLM transport (LLM_TRANSPORT=record|replay|synthetic for offline runs)
+from llm_transport import configure, create_model, requires_api_key
 
 # Setup
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and requires_api_key():
     print(json.dumps({"error": "Missing GEMINI_API_KEY"}))
     sys.exit(1)
 
-genai.configure(api_key=GEMINI_API_KEY)
-gemini = genai.GenerativeModel("gemini-2.0-flash-lite")
+configure(GEMINI_API_KEY)
+gemini = create_model("gemini-2.0-flash-lite")
 
 # Check CLI args
 if len(sys.argv) < 2:
@@ -98,8 +100,7 @@ Number them (Q1, Q2, etc.) and exclude any extra commentary.
 
 try:
     raw_output = gemini.generate_content(
-        prompt, generation_config=genai.types.GenerationConfig(
-            temperature=0.5, max_output_tokens=600)
+        prompt, generation_config={"temperature": 0.5, "max_output_tokens": 600}
     ).text.strip()
 except Exception as e:
     raw_output = f"Error generating questions: {e}"
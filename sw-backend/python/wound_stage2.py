@@ -3,12 +3,14 @@
 # =========================================
 import sys, os, json
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+# LLM transport (LLM_TRANSPORT=record|replay|synthetic for offline runs)
+from llm_transport import configure, create_model
 
 sys.stdout.reconfigure(encoding='utf-8')
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-gemini = genai.GenerativeModel("gemini-2.0-flash-lite")
+configure(os.getenv("GEMINI_API_KEY"))
+gemini = create_model("gemini-2.0-flash-lite")
 
 if len(sys.argv) < 2:
     print(json.dumps({"error": "No JSON input provided"}))
@@ -57,8 +59,7 @@ Generate a structured wound-care report with:
 try:
     final_report = gemini.generate_content(
         prompt,
-        generation_config=genai.types.GenerationConfig(
-            temperature=0.4, max_output_tokens=900)
+        generation_config={"temperature": 0.4, "max_output_tokens": 900}
     ).text.strip()
 except Exception as e:
     final_report = f"Error generating final report: {e}"